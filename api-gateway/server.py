@@ -6,19 +6,35 @@ Routes requests to appropriate microservices
 
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+import asyncio
+import bisect
+import contextlib
+import contextvars
 import httpx
+import importlib.util
+import json
 import os
-from typing import Dict, Any, Optional
+import pathlib
+import random
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent / "services" / "common"))
+from fast_json import FastJSONResponse
+
 load_dotenv()
 
 app = FastAPI(
     title="Ad-Astra API Gateway",
     description="Unified API for AI agent advertising platform",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # CORS configuration
@@ -38,6 +54,395 @@ SERVICES = {
     "convex": os.getenv("CONVEX_URL", "https://your-deployment.convex.cloud"),
 }
 
+# "http" calls the standalone bandit service; "embedded" imports its selection
+# and reward logic and runs it in-process against the same store (REDIS_URL)
+BANDIT_MODE = os.getenv("BANDIT_MODE", "http").lower()
+BANDIT_APP_PATH = os.getenv(
+    "BANDIT_APP_PATH",
+    str(pathlib.Path(__file__).resolve().parent.parent / "services" / "bandit" / "app.py"),
+)
+
+
+def load_embedded_bandit(path: str) -> Any:
+    """Import services/bandit/app.py as a module without putting it on sys.path."""
+    spec = importlib.util.spec_from_file_location("adastra_bandit", path)
+    if spec is None or spec.loader is None:
+        raise RuntimeError(f"Cannot load bandit module from {path}")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module  # dataclasses resolve annotations via sys.modules
+    spec.loader.exec_module(module)
+    # The bandit falls back to per-process memory without redis; that would split arm state silently
+    if os.getenv("REDIS_URL") and module.redis is None:
+        raise RuntimeError("REDIS_URL is set but the redis package is not installed; embedded bandit cannot share arm state")
+    return module
+
+
+embedded_bandit = load_embedded_bandit(BANDIT_APP_PATH) if BANDIT_MODE == "embedded" else None
+
+# ============================================
+# Request Timing
+# ============================================
+
+# Fraction of requests that get upstream spans, a Server-Timing header and a
+# histogram observation. Requests sending X-Debug-Timing are always sampled.
+TIMING_SAMPLE_RATE = float(os.getenv("TIMING_SAMPLE_RATE", "0.1"))
+
+# (span, upstream, duration_ms) for the current request, or None when unsampled
+_request_spans: contextvars.ContextVar[Optional[List[Tuple[str, str, float]]]] = contextvars.ContextVar(
+    "request_spans", default=None
+)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram, exported in Prometheus format."""
+
+    BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.sum_ms = 0.0
+        self.count = 0
+
+    def observe(self, duration_ms: float) -> None:
+        self.counts[bisect.bisect_left(self.BUCKETS_MS, duration_ms)] += 1
+        self.sum_ms += duration_ms
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.BUCKETS_MS, self.counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{{{labels},le="{bound / 1000:g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum_ms / 1000:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+# route -> histogram of whole-request latency
+REQUEST_HISTOGRAMS: Dict[str, LatencyHistogram] = {}
+# (route, upstream, span) -> histogram of upstream call latency
+UPSTREAM_HISTOGRAMS: Dict[Tuple[str, str, str], LatencyHistogram] = {}
+
+
+@contextlib.contextmanager
+def timed_span(upstream: str, span: str):
+    """Record the wrapped block as a span when the current request is sampled."""
+    spans = _request_spans.get()
+    if spans is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.append((span, upstream, (time.perf_counter() - start) * 1000))
+
+
+@app.middleware("http")
+async def server_timing_middleware(request: Request, call_next):
+    if request.url.path == "/metrics" or (
+        "x-debug-timing" not in request.headers and random.random() >= TIMING_SAMPLE_RATE
+    ):
+        return await call_next(request)
+
+    spans: List[Tuple[str, str, float]] = []
+    token = _request_spans.set(spans)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        _request_spans.reset(token)
+    total_ms = (time.perf_counter() - start) * 1000
+
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    REQUEST_HISTOGRAMS.setdefault(route, LatencyHistogram()).observe(total_ms)
+    for span, upstream, duration_ms in spans:
+        UPSTREAM_HISTOGRAMS.setdefault((route, upstream, span), LatencyHistogram()).observe(duration_ms)
+
+    entries = [f"{span};dur={duration_ms:.1f}" for span, _, duration_ms in spans]
+    entries.append(f"total;dur={total_ms:.1f}")
+    response.headers["Server-Timing"] = ", ".join(entries)
+    return response
+
+
+# ============================================
+# Upstream Protection
+# ============================================
+
+UPSTREAM_MAX_CONCURRENCY = int(os.getenv("UPSTREAM_MAX_CONCURRENCY", "64"))
+UPSTREAM_QUEUE_TIMEOUT = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT", "0.25"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "15"))
+BREAKER_HALF_OPEN_PROBES = int(os.getenv("BREAKER_HALF_OPEN_PROBES", "1"))
+CATALOG_TTL_SECONDS = float(os.getenv("CATALOG_TTL_SECONDS", "300"))
+LOCAL_ARMS_MAX_KEYS = int(os.getenv("LOCAL_ARMS_MAX_KEYS", "10000"))
+
+
+class UpstreamUnavailable(Exception):
+    """Raised when an upstream is shed, tripped, or unreachable."""
+
+    def __init__(self, upstream: str, reason: str, retry_after: float = 1.0):
+        super().__init__(f"{upstream} unavailable: {reason}")
+        self.upstream = upstream
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+    closed -> open after N failures, open -> half_open after the reset window,
+    half_open lets a few probes through and closes on the first success.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float, half_open_probes: int):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.half_open_probes = half_open_probes
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probes = 0
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                return False
+            self.state = "half_open"
+            self._probes = 0
+        if self.state == "half_open":
+            if self._probes >= self.half_open_probes:
+                return False
+            self._probes += 1
+        return True
+
+    def release(self) -> None:
+        """Give back a probe slot for a call that never reached the upstream."""
+        if self.state == "half_open" and self._probes > 0:
+            self._probes -= 1
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._probes = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self._probes = 0
+
+    def retry_after(self) -> float:
+        if self.state != "open":
+            return 1.0
+        return max(1.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+
+class Upstream:
+    """Per-upstream bulkhead: bounded concurrency plus a circuit breaker."""
+
+    def __init__(self, name: str, max_concurrency: int):
+        self.name = name
+        self.breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS, BREAKER_HALF_OPEN_PROBES)
+        self.max_concurrency = max_concurrency
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.shed = 0
+        self.rejected = 0
+
+    async def request(
+        self,
+        client: httpx.AsyncClient,
+        method: str,
+        url: str,
+        span: Optional[str] = None,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise UpstreamUnavailable(self.name, "circuit open", self.breaker.retry_after())
+
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=UPSTREAM_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.breaker.release()
+            self.shed += 1
+            raise UpstreamUnavailable(self.name, "concurrency limit reached")
+        except BaseException:
+            # Cancelled while queued (e.g. client disconnect): the probe slot must not leak
+            self.breaker.release()
+            raise
+
+        self.in_flight += 1
+        try:
+            with timed_span(self.name, span or self.name):
+                response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as exc:
+            self.breaker.record_failure()
+            raise UpstreamUnavailable(self.name, type(exc).__name__, self.breaker.retry_after()) from exc
+        except BaseException:
+            # Cancellation or an unexpected error says nothing about the upstream; free the probe slot
+            self.breaker.release()
+            raise
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.breaker.state,
+            "failures": self.breaker.failures,
+            "inFlight": self.in_flight,
+            "maxConcurrency": self.max_concurrency,
+            "shed": self.shed,
+            "rejected": self.rejected,
+        }
+
+
+UPSTREAMS: Dict[str, Upstream] = {name: Upstream(name, UPSTREAM_MAX_CONCURRENCY) for name in SERVICES}
+
+
+async def upstream_request(
+    client: httpx.AsyncClient,
+    upstream: str,
+    method: str,
+    path: str,
+    span: Optional[str] = None,
+    **kwargs: Any,
+) -> httpx.Response:
+    """Send a request to a named upstream through its bulkhead and breaker."""
+    return await UPSTREAMS[upstream].request(client, method, f"{SERVICES[upstream]}{path}", span=span, **kwargs)
+
+
+@app.exception_handler(UpstreamUnavailable)
+async def upstream_unavailable_handler(request: Request, exc: UpstreamUnavailable) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Upstream '{exc.upstream}' unavailable", "reason": exc.reason},
+        headers={"Retry-After": str(int(exc.retry_after + 0.999))},
+    )
+
+
+# Degraded-mode state for /api/assign
+# (campaignId, segment) -> (fetched_at, variants)
+VARIANT_CATALOG: Dict[Tuple[str, str], Tuple[float, List[Dict[str, Any]]]] = {}
+# (campaignId, segment) -> {variantId: [alpha, beta]}: impressions add to beta,
+# the click/conversion rewards we forward add to alpha. Only filled while the
+# bandit's breaker is not closed, and capped at LOCAL_ARMS_MAX_KEYS segments (LRU).
+LOCAL_ARMS: "OrderedDict[Tuple[str, str], Dict[str, List[float]]]" = OrderedDict()
+
+
+def cached_variants(campaign_id: str, segment: str) -> Optional[List[Dict[str, Any]]]:
+    entry = VARIANT_CATALOG.get((campaign_id, segment))
+    if entry is None or time.monotonic() - entry[0] > CATALOG_TTL_SECONDS:
+        return None
+    return entry[1]
+
+
+def local_thompson_select(campaign_id: str, segment: str, arm_ids: List[str]) -> str:
+    """Thompson sample over locally observed rewards when the bandit is unreachable."""
+    arms = LOCAL_ARMS.get((campaign_id, segment), {})
+    best_arm, best_score = arm_ids[0], -1.0
+    for arm_id in arm_ids:
+        alpha, beta = arms.get(arm_id, (1.0, 1.0))
+        score = random.betavariate(alpha, beta)
+        if score > best_score:
+            best_arm, best_score = arm_id, score
+    return best_arm
+
+
+def bandit_degraded() -> bool:
+    """True while the remote bandit's breaker is tripped or probing."""
+    return embedded_bandit is None and UPSTREAMS["bandit"].breaker.state != "closed"
+
+
+def record_local_reward(campaign_id: str, segment: str, variant_id: str, reward: float) -> None:
+    """Feed the local fallback sampler; a no-op while the bandit is healthy."""
+    if not bandit_degraded():
+        return
+    key = (campaign_id, segment)
+    arms = LOCAL_ARMS.get(key)
+    if arms is None:
+        arms = LOCAL_ARMS[key] = {}
+        while len(LOCAL_ARMS) > LOCAL_ARMS_MAX_KEYS:
+            LOCAL_ARMS.popitem(last=False)
+    else:
+        LOCAL_ARMS.move_to_end(key)
+    arm = arms.setdefault(variant_id, [1.0, 1.0])
+    if reward > 0:
+        arm[0] += reward
+    else:
+        arm[1] += abs(reward)
+
+
+async def bandit_select(
+    client: httpx.AsyncClient,
+    campaign_id: str,
+    segment: str,
+    arm_ids: List[str],
+    context: Optional[Dict[str, Any]],
+) -> Optional[Dict[str, Any]]:
+    """Ask the bandit for an arm. Returns None when it cannot answer."""
+    if embedded_bandit is not None:
+        try:
+            with timed_span("bandit", "bandit_select"):
+                variant_id, explore = await embedded_bandit.thompson_select(campaign_id, segment, arm_ids)
+        except Exception:
+            return None
+        return {"variantId": variant_id, "explore": explore}
+
+    try:
+        response = await upstream_request(
+            client, "bandit", "POST", "/select", span="bandit_select",
+            json={
+                "campaignId": campaign_id,
+                "segment": segment,
+                "arms": arm_ids,
+                "context": context
+            }
+        )
+    except UpstreamUnavailable:
+        return None
+    return response.json() if response.status_code == 200 else None
+
+
+async def bandit_reward(
+    client: httpx.AsyncClient,
+    campaign_id: str,
+    segment: str,
+    variant_id: str,
+    reward: float,
+    assignment_id: str,
+) -> None:
+    """Forward a reward to the bandit, in-process or over HTTP."""
+    if embedded_bandit is not None:
+        try:
+            with timed_span("bandit", "bandit_reward"):
+                await embedded_bandit.apply_reward(campaign_id, segment, variant_id, reward)
+        except Exception as exc:
+            raise UpstreamUnavailable("bandit", type(exc).__name__) from exc
+        return
+
+    await upstream_request(
+        client, "bandit", "POST", "/reward", span="bandit_reward",
+        json={
+            "campaignId": campaign_id,
+            "segment": segment,
+            "variantId": variant_id,
+            "reward": reward,
+            "assignmentId": assignment_id
+        }
+    )
+
 # ============================================
 # Health & Status
 # ============================================
@@ -58,6 +463,8 @@ async def status():
                 if name == "convex":
                     # Convex doesn't have /health endpoint
                     statuses[name] = {"status": "configured", "url": url}
+                elif name == "bandit" and embedded_bandit is not None:
+                    statuses[name] = {"status": "embedded", "path": BANDIT_APP_PATH}
                 else:
                     response = await client.get(f"{url}/health")
                     statuses[name] = {
@@ -69,19 +476,183 @@ async def status():
 
     return {
         "gateway": "healthy",
-        "services": statuses
+        "services": statuses,
+        "upstreams": {name: upstream.snapshot() for name, upstream in UPSTREAMS.items()}
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Per-route request and per-upstream span latency histograms (Prometheus text format)"""
+    lines = [
+        "# HELP gateway_request_duration_seconds Sampled gateway request latency by route",
+        "# TYPE gateway_request_duration_seconds histogram",
+    ]
+    for route, histogram in sorted(REQUEST_HISTOGRAMS.items()):
+        lines.extend(histogram.render("gateway_request_duration_seconds", f'route="{route}"'))
+
+    lines.extend([
+        "# HELP gateway_upstream_duration_seconds Sampled upstream call latency by route, upstream and span",
+        "# TYPE gateway_upstream_duration_seconds histogram",
+    ])
+    for (route, upstream, span), histogram in sorted(UPSTREAM_HISTOGRAMS.items()):
+        labels = f'route="{route}",upstream="{upstream}",span="{span}"'
+        lines.extend(histogram.render("gateway_upstream_duration_seconds", labels))
+
+    lines.extend([
+        "# HELP gateway_upstream_shed_total Calls rejected by the per-upstream concurrency limit",
+        "# TYPE gateway_upstream_shed_total counter",
+    ])
+    lines.extend(f'gateway_upstream_shed_total{{upstream="{name}"}} {u.shed}' for name, u in UPSTREAMS.items())
+    lines.extend([
+        "# HELP gateway_upstream_rejected_total Calls rejected by an open circuit breaker",
+        "# TYPE gateway_upstream_rejected_total counter",
+    ])
+    lines.extend(f'gateway_upstream_rejected_total{{upstream="{name}"}} {u.rejected}' for name, u in UPSTREAMS.items())
+    return "\n".join(lines) + "\n"
+
 # ============================================
 # Campaign Management
 # ============================================
 
+AGENT_TYPES = ["landing_page", "social_media", "placement", "visual", "ai_context"]
+CAMPAIGN_FANOUT_CONCURRENCY = int(os.getenv("CAMPAIGN_FANOUT_CONCURRENCY", "8"))
+CAMPAIGN_FANOUT_BATCH_SIZE = int(os.getenv("CAMPAIGN_FANOUT_BATCH_SIZE", "10"))
+JOB_TTL_SECONDS = float(os.getenv("JOB_TTL_SECONDS", "3600"))
+
+
 class CreateCampaignRequest(BaseModel):
     name: str
     description: Optional[str] = None
     goal_type: str = "conversions"  # or "revenue"
     goal_target: float = 1000
     segments: list[str] = ["human", "agent"]
+    agents_per_type: int = 10
+
+
+class CampaignJob:
+    """Progress of one campaign's agent fan-out, observable while it runs."""
+
+    def __init__(self, campaign_id: str, batches: List[Dict[str, Any]]):
+        self.id = f"job_{uuid.uuid4().hex[:12]}"
+        self.campaign_id = campaign_id
+        self.batches = batches
+        self.status = "running"
+        self.agents_requested = sum(b["count"] for b in batches)
+        self.agents_created = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._changed = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    def changed(self) -> asyncio.Event:
+        """Event set on the next progress update."""
+        return self._changed
+
+    def update(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def finish(self) -> None:
+        if not self.errors:
+            self.status = "completed"
+        elif self.agents_created:
+            self.status = "partial"
+        else:
+            self.status = "failed"
+        self.finished_at = time.time()
+        self.update()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "jobId": self.id,
+            "campaignId": self.campaign_id,
+            "status": self.status,
+            "agentsRequested": self.agents_requested,
+            "agentsCreated": self.agents_created,
+            "batches": [
+                {k: b[k] for k in ("agentType", "segment", "count", "status", "created")}
+                for b in self.batches
+            ],
+            "errors": self.errors,
+            "createdAt": int(self.created_at * 1000),
+            "finishedAt": int(self.finished_at * 1000) if self.finished_at else None,
+        }
+
+
+CAMPAIGN_JOBS: Dict[str, CampaignJob] = {}
+# Strong references so running jobs aren't garbage collected
+_background_tasks: set = set()
+
+
+def plan_agent_batches(req: CreateCampaignRequest) -> List[Dict[str, Any]]:
+    """Split the swarm into (agentType, segment) batches of at most CAMPAIGN_FANOUT_BATCH_SIZE."""
+    batches = []
+    for segment in req.segments:
+        for agent_type in AGENT_TYPES:
+            remaining = req.agents_per_type
+            while remaining > 0:
+                count = min(remaining, CAMPAIGN_FANOUT_BATCH_SIZE)
+                batches.append({
+                    "agentType": agent_type,
+                    "segment": segment,
+                    "count": count,
+                    "status": "pending",
+                    "created": 0,
+                })
+                remaining -= count
+    return batches
+
+
+async def run_campaign_job(job: CampaignJob, req: CreateCampaignRequest) -> None:
+    """Create every agent batch concurrently, bounded by CAMPAIGN_FANOUT_CONCURRENCY."""
+    _request_spans.set(None)  # don't attribute background calls to the creating request
+    semaphore = asyncio.Semaphore(CAMPAIGN_FANOUT_CONCURRENCY)
+    product_info = {"name": req.name, "description": req.description or ""}
+    goal = {"type": req.goal_type, "target": req.goal_target}
+
+    async def run_batch(client: httpx.AsyncClient, batch: Dict[str, Any]) -> None:
+        async with semaphore:
+            batch["status"] = "running"
+            job.update()
+            try:
+                response = await upstream_request(
+                    client, "orchestrator", "POST", "/create-agents", span="orchestrator_agents",
+                    json={
+                        "campaignId": job.campaign_id,
+                        "agentType": batch["agentType"],
+                        "segment": batch["segment"],
+                        "assets": [],
+                        "productInfo": product_info,
+                        "goal": goal,
+                        "count": batch["count"]
+                    }
+                )
+                if response.status_code != 200:
+                    raise RuntimeError(f"orchestrator returned {response.status_code}")
+                batch["created"] = len(response.json().get("agents", []))
+                batch["status"] = "completed"
+                job.agents_created += batch["created"]
+            except Exception as exc:
+                batch["status"] = "failed"
+                job.errors.append({"agentType": batch["agentType"], "segment": batch["segment"], "error": str(exc)})
+            job.update()
+
+    try:
+        async with httpx.AsyncClient(timeout=60.0) as client:
+            await asyncio.gather(*(run_batch(client, batch) for batch in job.batches))
+    finally:
+        job.finish()
+
+
+def prune_campaign_jobs() -> None:
+    cutoff = time.time() - JOB_TTL_SECONDS
+    for job_id in [j.id for j in CAMPAIGN_JOBS.values() if j.done and j.finished_at < cutoff]:
+        del CAMPAIGN_JOBS[job_id]
+
 
 @app.post("/api/campaigns")
 async def create_campaign(req: CreateCampaignRequest):
@@ -90,13 +661,16 @@ async def create_campaign(req: CreateCampaignRequest):
 
     This will:
     1. Create campaign in Convex
-    2. Generate 50+ agent variants via orchestrator
-    3. Initialize bandit state
+    2. Start a background job that generates the agent swarm via the orchestrator,
+       one concurrent batch per agent type and segment
+
+    Returns as soon as the campaign exists; follow agent creation on
+    /api/jobs/{jobId} or stream it from /api/jobs/{jobId}/events.
     """
-    async with httpx.AsyncClient(timeout=60.0) as client:
+    async with httpx.AsyncClient(timeout=10.0) as client:
         # Step 1: Create campaign in Convex
-        campaign_response = await client.post(
-            f"{SERVICES['convex']}/api/campaigns",
+        campaign_response = await upstream_request(
+            client, "convex", "POST", "/api/campaigns", span="convex_campaign",
             json={
                 "goal": {"type": req.goal_type, "target": req.goal_target},
                 "segments": req.segments,
@@ -110,41 +684,70 @@ async def create_campaign(req: CreateCampaignRequest):
 
         campaign_id = campaign_response.json()["campaignId"]
 
-        # Step 2: Generate agent swarm
-        agents_response = await client.post(
-            f"{SERVICES['orchestrator']}/create-agents",
-            json={
-                "campaignId": campaign_id,
-                "count": 50,  # 10 per agent type * 5 types
-                "segments": req.segments
-            }
-        )
+    # Step 2: Generate agent swarm in the background
+    prune_campaign_jobs()
+    job = CampaignJob(campaign_id, plan_agent_batches(req))
+    CAMPAIGN_JOBS[job.id] = job
+    task = asyncio.create_task(run_campaign_job(job, req))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
 
-        if agents_response.status_code != 200:
-            raise HTTPException(status_code=500, detail="Failed to create agents")
+    return {
+        "campaignId": campaign_id,
+        "jobId": job.id,
+        "agentsRequested": job.agents_requested,
+        "status": "creating_agents",
+        "statusUrl": f"/api/jobs/{job.id}",
+        "eventsUrl": f"/api/jobs/{job.id}/events",
+        "message": "Campaign created; AI agent swarm is being generated"
+    }
 
-        agents = agents_response.json()
 
-        return {
-            "campaignId": campaign_id,
-            "agentsCreated": len(agents.get("agents", [])),
-            "status": "running",
-            "message": "Campaign created with AI agent swarm"
-        }
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Current progress of a campaign creation job"""
+    job = CAMPAIGN_JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.snapshot()
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job(job_id: str):
+    """Stream job progress as server-sent events until the job finishes"""
+    job = CAMPAIGN_JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream():
+        while True:
+            changed = job.changed()
+            # Read done once: the job may finish while this event is being sent
+            done = job.done
+            snapshot = job.snapshot()
+            yield f"event: {'done' if done else 'progress'}\ndata: {json.dumps(snapshot)}\n\n"
+            if done:
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=15.0)
+            except asyncio.TimeoutError:
+                pass
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 @app.get("/api/campaigns")
 async def list_campaigns():
     """List all campaigns"""
     async with httpx.AsyncClient(timeout=10.0) as client:
-        response = await client.get(f"{SERVICES['convex']}/api/campaigns")
-        return response.json()
+        response = await upstream_request(client, "convex", "GET", "/api/campaigns")
+        return FastJSONResponse(response.json())
 
 @app.get("/api/campaigns/{campaign_id}")
 async def get_campaign(campaign_id: str):
     """Get campaign details including metrics"""
     async with httpx.AsyncClient(timeout=10.0) as client:
-        response = await client.get(f"{SERVICES['convex']}/api/campaigns/{campaign_id}")
-        return response.json()
+        response = await upstream_request(client, "convex", "GET", f"/api/campaigns/{campaign_id}")
+        return FastJSONResponse(response.json())
 
 # ============================================
 # Traffic Assignment (Bandit)
@@ -160,18 +763,36 @@ async def assign_variant(req: AssignVariantRequest):
     """
     Assign a visitor to the best-performing agent variant
     Uses Thompson Sampling multi-armed bandit
+
+    Degrades instead of failing: the last good variant catalog is served when
+    Convex is unavailable, and a local Thompson sample is used when the bandit is.
+    If the assignment cannot be recorded the response has no assignmentId, since
+    /api/events could not resolve it; such visitors are served but not tracked.
     """
+    degraded = False
+
     async with httpx.AsyncClient(timeout=10.0) as client:
         # Get available variants for this campaign
-        variants_response = await client.get(
-            f"{SERVICES['convex']}/api/campaigns/{req.campaignId}/variants",
-            params={"segment": req.segment, "active": True}
-        )
-
-        if variants_response.status_code != 200:
-            raise HTTPException(status_code=404, detail="Campaign not found")
-
-        variants = variants_response.json().get("variants", [])
+        variants: Optional[List[Dict[str, Any]]] = None
+        try:
+            variants_response = await upstream_request(
+                client, "convex", "GET", f"/api/campaigns/{req.campaignId}/variants", span="convex_variants",
+                params={"segment": req.segment, "active": True}
+            )
+        except UpstreamUnavailable:
+            variants = cached_variants(req.campaignId, req.segment)
+            if variants is None:
+                raise
+            degraded = True
+        else:
+            if variants_response.status_code >= 500:
+                variants = cached_variants(req.campaignId, req.segment)
+                degraded = variants is not None
+            if variants is None:
+                if variants_response.status_code != 200:
+                    raise HTTPException(status_code=404, detail="Campaign not found")
+                variants = variants_response.json().get("variants", [])
+                VARIANT_CATALOG[(req.campaignId, req.segment)] = (time.monotonic(), variants)
 
         if not variants:
             raise HTTPException(status_code=404, detail="No active variants")
@@ -179,49 +800,49 @@ async def assign_variant(req: AssignVariantRequest):
         arm_ids = [v["_id"] for v in variants]
 
         # Get assignment from bandit
-        bandit_response = await client.post(
-            f"{SERVICES['bandit']}/select",
-            json={
-                "campaignId": req.campaignId,
-                "segment": req.segment,
-                "arms": arm_ids,
-                "context": req.context
+        selection = await bandit_select(client, req.campaignId, req.segment, arm_ids, req.context)
+        if selection is None:
+            degraded = True
+            selection = {
+                "variantId": local_thompson_select(req.campaignId, req.segment, arm_ids),
+                "explore": True,
             }
-        )
-
-        if bandit_response.status_code != 200:
-            raise HTTPException(status_code=500, detail="Bandit selection failed")
 
-        selection = bandit_response.json()
         variant_id = selection["variantId"]
 
         # Record assignment in Convex
-        import time
-        import uuid
-
-        assignment_response = await client.post(
-            f"{SERVICES['convex']}/api/assignments",
-            json={
-                "campaignId": req.campaignId,
-                "segment": req.segment,
-                "variantId": variant_id,
-                "reqId": str(uuid.uuid4()),
-                "ts": int(time.time() * 1000),
-                "meta": req.context
-            }
-        )
-
-        assignment_id = assignment_response.json().get("assignmentId")
+        assignment_id = None
+        try:
+            assignment_response = await upstream_request(
+                client, "convex", "POST", "/api/assignments", span="convex_assignment",
+                json={
+                    "campaignId": req.campaignId,
+                    "segment": req.segment,
+                    "variantId": variant_id,
+                    "reqId": str(uuid.uuid4()),
+                    "ts": int(time.time() * 1000),
+                    "meta": req.context
+                }
+            )
+            if assignment_response.status_code == 200:
+                assignment_id = assignment_response.json().get("assignmentId")
+            else:
+                degraded = True
+        except UpstreamUnavailable:
+            degraded = True
 
         # Get variant payload
         variant = next((v for v in variants if v["_id"] == variant_id), None)
 
-        return {
-            "assignmentId": assignment_id,
+        body: Dict[str, Any] = {
             "variantId": variant_id,
             "variant": variant,
-            "explore": selection.get("explore", False)
+            "explore": selection.get("explore", False),
+            "degraded": degraded
         }
+        if assignment_id is not None:
+            body = {"assignmentId": assignment_id, **body}
+        return FastJSONResponse(body)
 
 # ============================================
 # Event Tracking
@@ -240,8 +861,8 @@ async def track_event(req: TrackEventRequest):
     """
     async with httpx.AsyncClient(timeout=10.0) as client:
         # Get assignment details
-        assignment_response = await client.get(
-            f"{SERVICES['convex']}/api/assignments/{req.assignmentId}"
+        assignment_response = await upstream_request(
+            client, "convex", "GET", f"/api/assignments/{req.assignmentId}", span="convex_assignment"
         )
 
         if assignment_response.status_code != 200:
@@ -250,10 +871,8 @@ async def track_event(req: TrackEventRequest):
         assignment = assignment_response.json()
 
         # Record event in Convex
-        import time
-
-        event_response = await client.post(
-            f"{SERVICES['convex']}/api/events",
+        event_response = await upstream_request(
+            client, "convex", "POST", "/api/events", span="convex_event",
             json={
                 "type": req.eventType,
                 "campaignId": assignment["campaignId"],
@@ -272,17 +891,25 @@ async def track_event(req: TrackEventRequest):
         elif req.eventType == "convert":
             reward_value = 10.0  # Higher reward for conversions
 
+        if req.eventType == "impression":
+            # Each assignment's impression is one trial: a failure until a click or conversion
+            # rewards it, so arms with more traffic do not look better just for having more successes
+            record_local_reward(assignment["campaignId"], assignment["segment"], assignment["variantId"], -1.0)
+
         if reward_value > 0:
-            await client.post(
-                f"{SERVICES['bandit']}/reward",
-                json={
-                    "campaignId": assignment["campaignId"],
-                    "segment": assignment["segment"],
-                    "variantId": assignment["variantId"],
-                    "reward": reward_value,
-                    "assignmentId": req.assignmentId
-                }
-            )
+            record_local_reward(assignment["campaignId"], assignment["segment"], assignment["variantId"], reward_value)
+            try:
+                await bandit_reward(
+                    client,
+                    assignment["campaignId"],
+                    assignment["segment"],
+                    assignment["variantId"],
+                    reward_value,
+                    req.assignmentId,
+                )
+            except UpstreamUnavailable:
+                # The event is recorded in Convex; a dropped reward only slows bandit learning
+                pass
 
         return {"ok": True, "eventRecorded": req.eventType}
 
@@ -297,24 +924,24 @@ async def trigger_evolution(campaign_id: str):
     Normally runs automatically every 48 hours
     """
     async with httpx.AsyncClient(timeout=120.0) as client:
-        response = await client.post(
-            f"{SERVICES['evolution']}/evolve",
+        response = await upstream_request(
+            client, "evolution", "POST", "/evolve",
             json={"campaignId": campaign_id}
         )
 
         if response.status_code != 200:
             raise HTTPException(status_code=500, detail="Evolution failed")
 
-        return response.json()
+        return FastJSONResponse(response.json())
 
 @app.get("/api/campaigns/{campaign_id}/evolution-history")
 async def get_evolution_history(campaign_id: str):
     """Get evolution history for a campaign"""
     async with httpx.AsyncClient(timeout=10.0) as client:
-        response = await client.get(
-            f"{SERVICES['convex']}/api/campaigns/{campaign_id}/evolution-history"
+        response = await upstream_request(
+            client, "convex", "GET", f"/api/campaigns/{campaign_id}/evolution-history"
         )
-        return response.json()
+        return FastJSONResponse(response.json())
 
 # ============================================
 # Metrics & Analytics
@@ -324,10 +951,10 @@ async def get_evolution_history(campaign_id: str):
 async def get_campaign_metrics(campaign_id: str):
     """Get aggregated metrics for a campaign"""
     async with httpx.AsyncClient(timeout=10.0) as client:
-        response = await client.get(
-            f"{SERVICES['convex']}/api/campaigns/{campaign_id}/metrics"
+        response = await upstream_request(
+            client, "convex", "GET", f"/api/campaigns/{campaign_id}/metrics"
         )
-        return response.json()
+        return FastJSONResponse(response.json())
 
 @app.get("/api/campaigns/{campaign_id}/agents")
 async def get_agent_performance(campaign_id: str, segment: Optional[str] = None):
@@ -337,11 +964,11 @@ async def get_agent_performance(campaign_id: str, segment: Optional[str] = None)
         if segment:
             params["segment"] = segment
 
-        response = await client.get(
-            f"{SERVICES['convex']}/api/campaigns/{campaign_id}/agent-metrics",
+        response = await upstream_request(
+            client, "convex", "GET", f"/api/campaigns/{campaign_id}/agent-metrics",
             params=params
         )
-        return response.json()
+        return FastJSONResponse(response.json())
 
 # ============================================
 # Main
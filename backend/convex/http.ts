@@ -74,6 +74,57 @@ export const POST = httpAction(async (ctx, req) => {
 			headers: { "content-type": "application/json" },
 		});
 	}
+	if (url.pathname.endsWith("/admin/createVariants")) {
+		const admin = req.headers.get("x-admin-key");
+		if (!process.env.ADMIN_SECRET || admin !== process.env.ADMIN_SECRET) {
+			return new Response("Unauthorized", { status: 401 });
+		}
+		const body = (await req.json()) as {
+			variants: Array<{
+				campaignId: string;
+				segment: Segment;
+				agentType: string;
+				payload: any;
+				agentConfig?: any;
+				name?: string;
+				active?: boolean;
+			}>;
+		};
+		const ids = await ctx.runMutation("mutations:createVariants", body as any);
+		return new Response(JSON.stringify({ ids }), {
+			status: 200,
+			headers: { "content-type": "application/json" },
+		});
+	}
+	if (url.pathname.endsWith("/admin/upsertPrompts")) {
+		const admin = req.headers.get("x-admin-key");
+		if (!process.env.ADMIN_SECRET || admin !== process.env.ADMIN_SECRET) {
+			return new Response("Unauthorized", { status: 401 });
+		}
+		const body = (await req.json()) as {
+			prompts: Array<{ ref: string; text: string }>;
+		};
+		const result = await ctx.runMutation("mutations:upsertPrompts", body as any);
+		return new Response(JSON.stringify(result), {
+			status: 200,
+			headers: { "content-type": "application/json" },
+		});
+	}
+	if (url.pathname.endsWith("/admin/recordLlmUsage")) {
+		const admin = req.headers.get("x-admin-key");
+		if (!process.env.ADMIN_SECRET || admin !== process.env.ADMIN_SECRET) {
+			return new Response("Unauthorized", { status: 401 });
+		}
+		const body = (await req.json()) as {
+			batchId: string;
+			rows: Array<Record<string, unknown>>;
+		};
+		const result = await ctx.runMutation("mutations:recordLlmUsage", body as any);
+		return new Response(JSON.stringify(result), {
+			status: 200,
+			headers: { "content-type": "application/json" },
+		});
+	}
 	if (url.pathname.endsWith("/admin/recalculateMetrics")) {
 		const admin = req.headers.get("x-admin-key");
 		if (!process.env.ADMIN_SECRET || admin !== process.env.ADMIN_SECRET) {
@@ -222,6 +273,24 @@ http.route({
 	handler: POST,
 });
 
+http.route({
+	path: "/admin/createVariants",
+	method: "POST",
+	handler: POST,
+});
+
+http.route({
+	path: "/admin/upsertPrompts",
+	method: "POST",
+	handler: POST,
+});
+
+http.route({
+	path: "/admin/recordLlmUsage",
+	method: "POST",
+	handler: POST,
+});
+
 http.route({
 	path: "/admin/recalculateMetrics",
 	method: "POST",
@@ -94,6 +94,141 @@ export const createVariant = mutation({
 	},
 });
 
+const variantInput = v.object({
+	campaignId: v.id("campaigns"),
+	segment: v.union(v.literal("human"), v.literal("agent")),
+	agentType: v.union(
+		v.literal("landing_page"),
+		v.literal("social_media"),
+		v.literal("placement"),
+		v.literal("visual"),
+		v.literal("ai_context")
+	),
+	payload: v.any(),
+	agentConfig: v.optional(v.any()),
+	name: v.optional(v.string()),
+	active: v.optional(v.boolean()),
+});
+
+// Bulk insert: one transaction for a whole batch of variants
+export const createVariants = mutation({
+	args: {
+		variants: v.array(variantInput),
+	},
+	handler: async (ctx, args) => {
+		const now = Date.now();
+		const ids = [];
+		for (const variant of args.variants) {
+			const id = await ctx.db.insert("variants", {
+				campaignId: variant.campaignId,
+				segment: variant.segment,
+				agentType: variant.agentType,
+				payload: variant.payload,
+				agentConfig: variant.agentConfig,
+				active: variant.active ?? true,
+				createdAt: now,
+				name: variant.name,
+			});
+			ids.push(id);
+		}
+		return ids;
+	},
+});
+
+// Store shared system prompts; refs are content hashes, so existing rows are left as-is
+export const upsertPrompts = mutation({
+	args: {
+		prompts: v.array(v.object({ ref: v.string(), text: v.string() })),
+	},
+	handler: async (ctx, args) => {
+		const now = Date.now();
+		let inserted = 0;
+		for (const prompt of args.prompts) {
+			const existing = await ctx.db
+				.query("prompts")
+				.withIndex("by_ref", (q) => q.eq("ref", prompt.ref))
+				.first();
+			if (existing) continue;
+			await ctx.db.insert("prompts", { ref: prompt.ref, text: prompt.text, createdAt: now });
+			inserted++;
+		}
+		return { inserted };
+	},
+});
+
+// Adds orchestrator usage deltas to each variant's llm_usage row.
+// Idempotent per batchId: the orchestrator retries a failed flush with the same id.
+export const recordLlmUsage = mutation({
+	args: {
+		batchId: v.string(),
+		rows: v.array(
+			v.object({
+				variantId: v.string(),
+				campaignId: v.optional(v.union(v.string(), v.null())),
+				agentType: v.optional(v.union(v.string(), v.null())),
+				requests: v.number(),
+				errors: v.number(),
+				cacheHits: v.number(),
+				promptTokens: v.number(),
+				completionTokens: v.number(),
+				totalTokens: v.number(),
+				latencySamples: v.number(),
+				latencyMsTotal: v.number(),
+				latencyMsMax: v.number(),
+				latencyBuckets: v.array(v.number()),
+			}),
+		),
+	},
+	handler: async (ctx, args) => {
+		const applied = await ctx.db
+			.query("llm_usage_batches")
+			.withIndex("by_batch", (q) => q.eq("batchId", args.batchId))
+			.first();
+		if (applied) {
+			return { updated: 0, inserted: 0, duplicate: true };
+		}
+		const now = Date.now();
+		await ctx.db.insert("llm_usage_batches", { batchId: args.batchId, appliedAt: now });
+		let inserted = 0;
+		for (const row of args.rows) {
+			const { campaignId, agentType, ...counters } = row;
+			const existing = await ctx.db
+				.query("llm_usage")
+				.withIndex("by_variant", (q) => q.eq("variantId", row.variantId))
+				.first();
+			if (!existing) {
+				await ctx.db.insert("llm_usage", {
+					...counters,
+					campaignId: campaignId ?? undefined,
+					agentType: agentType ?? undefined,
+					updatedAt: now,
+				});
+				inserted++;
+				continue;
+			}
+			const buckets = existing.latencyBuckets.length >= row.latencyBuckets.length
+				? existing.latencyBuckets.map((count, i) => count + (row.latencyBuckets[i] ?? 0))
+				: row.latencyBuckets.map((count, i) => count + (existing.latencyBuckets[i] ?? 0));
+			await ctx.db.patch(existing._id, {
+				campaignId: campaignId ?? existing.campaignId,
+				agentType: agentType ?? existing.agentType,
+				requests: existing.requests + row.requests,
+				errors: existing.errors + row.errors,
+				cacheHits: existing.cacheHits + row.cacheHits,
+				promptTokens: existing.promptTokens + row.promptTokens,
+				completionTokens: existing.completionTokens + row.completionTokens,
+				totalTokens: existing.totalTokens + row.totalTokens,
+				latencySamples: existing.latencySamples + row.latencySamples,
+				latencyMsTotal: existing.latencyMsTotal + row.latencyMsTotal,
+				latencyMsMax: Math.max(existing.latencyMsMax, row.latencyMsMax),
+				latencyBuckets: buckets,
+				updatedAt: now,
+			});
+		}
+		return { updated: args.rows.length - inserted, inserted };
+	},
+});
+
 // Agent metrics mutations
 export const upsertAgentMetrics = mutation({
 	args: {
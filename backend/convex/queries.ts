@@ -27,6 +27,21 @@ export const getVariantById = query({
 	},
 });
 
+// Batch lookup; `ids` is comma-separated. Returns one entry per id, in
+// order, with null for ids that are malformed or not found.
+export const getVariantsByIds = query({
+	args: { ids: v.string() },
+	handler: async (ctx, args) => {
+		const ids = args.ids.split(",").filter(Boolean);
+		return await Promise.all(
+			ids.map((id) => {
+				const variantId = ctx.db.normalizeId("variants", id);
+				return variantId ? ctx.db.get(variantId) : null;
+			}),
+		);
+	},
+});
+
 // Get agent metrics for a specific variant
 export const getAgentMetrics = query({
 	args: { variantId: v.id("variants") },
@@ -165,3 +180,69 @@ export const getCampaignStats = query({
 });
 
 
+// Get running campaigns
+export const getRunningCampaigns = query({
+	args: {},
+	handler: async (ctx) => {
+		return await ctx.db
+			.query("campaigns")
+			.withIndex("by_status", (q) => q.eq("status", "running"))
+			.collect();
+	},
+});
+
+// Get the most-served active agent variants of a campaign with their traffic share
+export const getTopVariantsByTraffic = query({
+	args: {
+		campaignId: v.id("campaigns"),
+		limit: v.optional(v.number()),
+	},
+	handler: async (ctx, args) => {
+		const limit = args.limit ?? 5;
+		const metrics = await ctx.db
+			.query("agent_metrics")
+			.withIndex("by_campaign", (q) => q.eq("campaignId", args.campaignId))
+			.collect();
+
+		const impressionsByVariant = new Map<any, number>();
+		for (const m of metrics) {
+			impressionsByVariant.set(m.variantId, (impressionsByVariant.get(m.variantId) ?? 0) + m.impressions);
+		}
+		const totalImpressions = metrics.reduce((sum, m) => sum + m.impressions, 0);
+		const ranked = [...impressionsByVariant.entries()]
+			.filter(([, impressions]) => impressions > 0)
+			.sort((a, b) => b[1] - a[1]);
+
+		const top = [];
+		for (const [variantId, impressions] of ranked) {
+			if (top.length >= limit) break;
+			const variant = await ctx.db.get(variantId);
+			if (!variant || !variant.active || !variant.agentConfig) continue;
+			top.push({
+				...variant,
+				impressions,
+				trafficShare: totalImpressions > 0 ? impressions / totalImpressions : 0,
+			});
+		}
+		return top;
+	},
+});
+
+// Get shared system prompts by ref (comma-separated refs)
+export const getPromptsByRefs = query({
+	args: { refs: v.string() },
+	handler: async (ctx, args) => {
+		const refs = [...new Set(args.refs.split(",").filter(Boolean))];
+		const prompts = await Promise.all(
+			refs.map((ref) =>
+				ctx.db
+					.query("prompts")
+					.withIndex("by_ref", (q) => q.eq("ref", ref))
+					.first(),
+			),
+		);
+		return prompts
+			.filter((p) => p !== null)
+			.map((p) => ({ ref: p.ref, text: p.text }));
+	},
+});
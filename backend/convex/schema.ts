@@ -80,7 +80,8 @@ export default defineSchema({
 				// LLM configuration
 				llmConfig: v.object({
 					model: v.string(), // e.g., "gpt-4-turbo-preview"
-					systemPrompt: v.string(), // Base instructions
+					systemPrompt: v.optional(v.string()), // Base instructions (inline)
+					promptRef: v.optional(v.string()), // Or a content hash into prompts
 					temperature: v.number(),
 					maxTokens: v.number(),
 				}),
@@ -225,6 +226,13 @@ export default defineSchema({
 		.index("by_generation", ["generation"])
 		.index("by_child", ["childId"]),
 
+	// Shared system prompts, keyed by content hash (llmConfig.promptRef)
+	prompts: defineTable({
+		ref: v.string(),
+		text: v.string(),
+		createdAt: v.number(),
+	}).index("by_ref", ["ref"]),
+
 	// NEW: Agent performance metrics (for fitness scoring)
 	agent_metrics: defineTable({
 		variantId: v.id("variants"),
@@ -250,6 +258,33 @@ export default defineSchema({
 		.index("by_campaign", ["campaignId"])
 		.index("by_fitness", ["fitnessScore"])
 		.index("by_updated", ["updatedAt"]),
+
+	// LLM usage per variant, accumulated from orchestrator flushes.
+	// Ids are plain strings: the orchestrator also serves variants it only knows by id.
+	llm_usage: defineTable({
+		variantId: v.string(),
+		campaignId: v.optional(v.string()),
+		agentType: v.optional(v.string()),
+		requests: v.number(),
+		errors: v.number(),
+		cacheHits: v.number(),
+		promptTokens: v.number(),
+		completionTokens: v.number(),
+		totalTokens: v.number(),
+		latencySamples: v.number(),
+		latencyMsTotal: v.number(),
+		latencyMsMax: v.number(),
+		latencyBuckets: v.array(v.number()), // Histogram, bounds set by the orchestrator
+		updatedAt: v.number(),
+	})
+		.index("by_variant", ["variantId"])
+		.index("by_campaign", ["campaignId"]),
+
+	// Batch ids of applied llm_usage flushes, so a retried flush is not added twice
+	llm_usage_batches: defineTable({
+		batchId: v.string(),
+		appliedAt: v.number(),
+	}).index("by_batch", ["batchId"]),
 });
 
 
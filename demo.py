@@ -47,7 +47,13 @@ async def demo():
         campaign_id = campaign["campaignId"]
 
         console.print(f"[green]✅ Campaign Created: {campaign_id}[/green]")
-        console.print(f"   Agents Created: {campaign['agentsCreated']}\n")
+
+        # Agent swarm is created in the background; wait for the job to finish
+        job = {"status": "running", "agentsCreated": 0}
+        while job["status"] == "running":
+            await asyncio.sleep(0.5)
+            job = (await client.get(f"{BASE_URL}{campaign['statusUrl']}")).json()
+        console.print(f"   Agents Created: {job['agentsCreated']}\n")
 
         time.sleep(1)
 
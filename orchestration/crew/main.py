@@ -1,12 +1,24 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import logging
 import os
 from dataclasses import dataclass
-from typing import Any, Dict, List
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Set, Union
 
 import httpx
 
+logger = logging.getLogger("crew.main")
+
+# enrich(offer, variant) -> variant; e.g. an LLM rewrite of the template copy
+Enrich = Callable[["Offer", Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+_DONE = object()
+
+# Transport errors raised before the request reached the server
+_UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
 
 @dataclass
 class Offer:
@@ -16,10 +28,13 @@ class Offer:
     tone: str = "enterprise"
 
 
-def make_human_variant(offer: Offer) -> Dict[str, Any]:
-    headline = f"{offer.product}: {offer.value_props[0]}"
-    subhead = " ".join(offer.value_props[1:])[:140]
-    bullets = offer.value_props[:3]
+def make_human_variant(offer: Offer, index: int = 0) -> Dict[str, Any]:
+    # Each variant of an offer leads with a different value prop
+    shift = index % len(offer.value_props)
+    value_props = offer.value_props[shift:] + offer.value_props[:shift]
+    headline = f"{offer.product}: {value_props[0]}"
+    subhead = " ".join(value_props[1:])[:140]
+    bullets = value_props[:3]
     return {
         "headline": headline,
         "subhead": subhead,
@@ -40,42 +55,300 @@ def make_agent_payload(offer: Offer) -> Dict[str, Any]:
     }
 
 
-async def create_variant_in_convex(campaign_id: str, segment: str, payload: Dict[str, Any]) -> str:
-    # Placeholder: In a real setup, call a Convex mutation; for now, we call the /assign path indirectly by ensuring variant exists.
-    # This function should be replaced with a dedicated Convex mutation to insert a variant.
-    return "var_temp"
+def make_variant(campaign_id: str, offer: Offer, index: int, segment: str) -> Dict[str, Any]:
+    """A variant in the shape the createVariants mutation takes."""
+    if segment == "human":
+        payload, agent_type = {"human": make_human_variant(offer, index)}, "landing_page"
+    else:
+        payload, agent_type = {"agent": make_agent_payload(offer)}, "ai_context"
+    return {
+        "campaignId": campaign_id,
+        "segment": segment,
+        "agentType": agent_type,
+        "payload": payload,
+        "name": f"{offer.product} {segment} #{index + 1}",
+        "active": True,
+    }
+
+
+async def generate_variants(
+    campaign_id: str,
+    offers: Union[Iterable[Offer], AsyncIterable[Offer]],
+    *,
+    variants_per_offer: int = 3,
+    concurrency: int = 8,
+    enrich: Optional[Enrich] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yield human and agent variants for each offer as they are produced.
+
+    Offers are pulled lazily and a fixed pool of workers builds (and, with
+    enrich, rewrites) up to `concurrency` variants at a time. Both queues are
+    bounded, so memory stays constant however large the catalog is and a slow
+    consumer slows generation down. Variants arrive in completion order. An
+    offer whose template fails is skipped; a failed enrich keeps the template.
+    """
+    jobs: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    results: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    async def produce() -> None:
+        error: Optional[Exception] = None
+        try:
+            async for offer in _aiter(offers):
+                for index in range(variants_per_offer):
+                    for segment in ("human", "agent"):
+                        await jobs.put((offer, index, segment))
+        except Exception as exc:
+            error = exc
+        # Workers drain what was queued, then stop
+        for _ in range(concurrency):
+            await jobs.put(None)
+        if error is not None:
+            raise error
+
+    async def work() -> None:
+        while (job := await jobs.get()) is not None:
+            offer, index, segment = job
+            try:
+                variant = make_variant(campaign_id, offer, index, segment)
+            except Exception as exc:
+                logger.warning("Skipping %s variant for %r: %s", segment, offer.product, exc)
+                continue
+            if enrich is not None:
+                try:
+                    variant = await enrich(offer, variant)
+                except Exception as exc:
+                    logger.warning("Enrich failed for %s, keeping template: %s", variant["name"], exc)
+            await results.put(variant)
+        await results.put(_DONE)
+
+    producer = asyncio.create_task(produce())
+    workers = [asyncio.create_task(work()) for _ in range(concurrency)]
+    try:
+        finished = 0
+        while finished < concurrency:
+            item = await results.get()
+            if item is _DONE:
+                finished += 1
+                continue
+            yield item
+        # Surfaces errors from the offers iterator
+        await producer
+    finally:
+        for task in (producer, *workers):
+            task.cancel()
+        await asyncio.gather(producer, *workers, return_exceptions=True)
+
+
+class ConvexVariantWriter:
+    """
+    Buffers variants and writes them with one createVariants mutation per
+    batch, keeping up to `max_in_flight` batches in flight; add() waits when
+    that many are pending. A batch that was rejected or never sent is retried
+    as single createVariant calls; one whose outcome is unknown (timeout, 5xx,
+    wrong id count) may have been written, so it is counted as failed instead
+    of being written twice. A deployment without createVariants (404) only
+    gets single calls.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        base_url: str,
+        admin_key: Optional[str] = None,
+        *,
+        batch_size: int = 50,
+        max_in_flight: int = 4,
+    ) -> None:
+        self.client = client
+        self.base_url = base_url.rstrip("/")
+        self.headers = {"x-admin-key": admin_key} if admin_key else {}
+        self.batch_size = batch_size
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self._buffer: List[Dict[str, Any]] = []
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._tasks: Set[asyncio.Task] = set()
+        self._bulk_supported = True
+
+    async def add(self, variant: Dict[str, Any]) -> None:
+        self._buffer.append(variant)
+        if len(self._buffer) >= self.batch_size:
+            await self._submit()
+
+    async def flush(self) -> None:
+        """Write whatever is buffered and wait for every pending batch."""
+        if self._buffer:
+            await self._submit()
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
+
+    def stats(self) -> Dict[str, int]:
+        return {"written": self.written, "failed": self.failed, "batches": self.batches}
+
+    async def _submit(self) -> None:
+        batch, self._buffer = self._buffer, []
+        await self._slots.acquire()
+        task = asyncio.create_task(self._write(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            self.batches += 1
+            if self._bulk_supported:
+                try:
+                    response = await self._post("createVariants", {"variants": batch})
+                    ids = response.get("ids") or []
+                    if len(ids) != len(batch):
+                        raise ValueError(f"createVariants returned {len(ids)} ids for {len(batch)} variants")
+                    self.written += len(ids)
+                    return
+                except Exception as exc:
+                    if isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code == 404:
+                        self._bulk_supported = False
+                    if not _write_not_applied(exc):
+                        logger.error("Bulk write of %d variants has an unknown outcome: %s", len(batch), exc)
+                        self.failed += len(batch)
+                        return
+                    logger.warning("Bulk variant write failed, falling back to single writes: %s", exc)
+            results = await asyncio.gather(
+                *(create_variant_in_convex(self.client, self.base_url, v, self.headers) for v in batch),
+                return_exceptions=True,
+            )
+            failed = sum(1 for result in results if isinstance(result, Exception))
+            self.failed += failed
+            self.written += len(batch) - failed
+        finally:
+            self._slots.release()
+
+    async def _post(self, endpoint: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        response = await self.client.post(f"{self.base_url}/admin/{endpoint}", json=body, headers=self.headers)
+        response.raise_for_status()
+        return response.json()
+
+
+def _write_not_applied(exc: Exception) -> bool:
+    """True when a failed write committed nothing: never sent, or rejected with a 4xx."""
+    if isinstance(exc, _UNSENT_ERRORS):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        return 400 <= exc.response.status_code < 500 and exc.response.status_code != 408
+    return False
+
+
+async def create_variant_in_convex(
+    client: httpx.AsyncClient, base_url: str, variant: Dict[str, Any], headers: Optional[Dict[str, str]] = None
+) -> str:
+    response = await client.post(f"{base_url.rstrip('/')}/admin/createVariant", json=variant, headers=headers or {})
+    response.raise_for_status()
+    return response.json()["id"]
+
+
+def llm_headline_enricher(client: httpx.AsyncClient, api_key: str, model: str = "gpt-4o-mini") -> Enrich:
+    """Enrich hook that rewrites human headlines with an OpenAI-compatible chat API."""
+    base_url = os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+
+    async def enrich(offer: Offer, variant: Dict[str, Any]) -> Dict[str, Any]:
+        human = variant["payload"].get("human")
+        if not human:
+            return variant
+        response = await client.post(
+            f"{base_url}/chat/completions",
+            headers={"Authorization": f"Bearer {api_key}"},
+            json={
+                "model": model,
+                "temperature": 0.7,
+                "max_tokens": 40,
+                "messages": [
+                    {"role": "system", "content": f"You write {offer.tone} ad headlines. Reply with the headline only."},
+                    {"role": "user", "content": f"Rewrite this headline, under 70 characters: {human['headline']}"},
+                ],
+            },
+        )
+        response.raise_for_status()
+        headline = response.json()["choices"][0]["message"]["content"].strip().strip('"')
+        if not headline:
+            return variant
+        return {**variant, "payload": {**variant["payload"], "human": {**human, "headline": headline}}}
+
+    return enrich
+
+
+async def push_variants(
+    campaign_id: str,
+    offers: Union[Iterable[Offer], AsyncIterable[Offer]],
+    writer: ConvexVariantWriter,
+    **options: Any,
+) -> Dict[str, int]:
+    """Stream generated variants into Convex; returns the writer's counts."""
+    async for variant in generate_variants(campaign_id, offers, **options):
+        await writer.add(variant)
+    await writer.flush()
+    return writer.stats()
 
 
 async def trigger_generation(campaign_id: str, offer: Offer) -> List[Dict[str, Any]]:
-    variants: List[Dict[str, Any]] = []
-    # Generate 3 human + 3 agent variants (simple templates for MVP)
-    for i in range(3):
-        human = make_human_variant(offer)
-        agent = make_agent_payload(offer)
-        variants.append({"segment": "human", "payload": {"human": human}})
-        variants.append({"segment": "agent", "payload": {"agent": agent}})
-    return variants
+    # 3 human + 3 agent variants from templates
+    return [variant async for variant in generate_variants(campaign_id, [offer])]
+
+
+def read_offers(path: str) -> Iterator[Offer]:
+    """Offers from a JSONL file (one Offer object per line), read lazily."""
+    with open(path, "r", encoding="utf-8") as handle:
+        for line in handle:
+            if line.strip():
+                yield Offer(**json.loads(line))
+
+
+async def _aiter(items: Union[Iterable[Any], AsyncIterable[Any]]) -> AsyncIterator[Any]:
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
 
 
 async def main() -> None:
     # Example usage: generate variants for a campaign
     campaign_id = os.environ.get("CAMPAIGN_ID", "camp_123")
-    offer = Offer(
-        product=os.environ.get("PRODUCT", "Acme API Monitoring"),
-        value_props=[
-            "Detect incidents <5s",
-            "99.99% SLA",
-            "Edge probes in 20 regions",
-        ],
-        pricing={"starter": "$29/mo", "pro": "$99/mo"},
-    )
-    variants = await trigger_generation(campaign_id, offer)
-    print(json.dumps({"campaignId": campaign_id, "generated": len(variants)}, indent=2))
+    offers_file = os.environ.get("OFFERS_FILE")
+    if offers_file:
+        offers: Iterable[Offer] = read_offers(offers_file)
+    else:
+        offers = [Offer(
+            product=os.environ.get("PRODUCT", "Acme API Monitoring"),
+            value_props=[
+                "Detect incidents <5s",
+                "99.99% SLA",
+                "Edge probes in 20 regions",
+            ],
+            pricing={"starter": "$29/mo", "pro": "$99/mo"},
+        )]
+    concurrency = int(os.environ.get("GENERATION_CONCURRENCY", "8"))
 
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        api_key = os.environ.get("OPENAI_API_KEY")
+        enrich = llm_headline_enricher(client, api_key) if api_key and os.environ.get("LLM_REWRITE") == "1" else None
+        convex_base = os.environ.get("CONVEX_HTTP_BASE")
+        if convex_base:
+            writer = ConvexVariantWriter(
+                client,
+                convex_base,
+                os.environ.get("ADMIN_SECRET"),
+                batch_size=int(os.environ.get("CONVEX_BULK_CHUNK_SIZE", "50")),
+            )
+            counts = await push_variants(campaign_id, offers, writer, concurrency=concurrency, enrich=enrich)
+        else:
+            # No Convex configured: dry run, count only
+            generated = 0
+            async for _ in generate_variants(campaign_id, offers, concurrency=concurrency, enrich=enrich):
+                generated += 1
+            counts = {"generated": generated}
+    print(json.dumps({"campaignId": campaign_id, **counts}, indent=2))
 
-if __name__ == "__main__":
-    import asyncio
 
+if __name__ == "__main__":
     asyncio.run(main())
-
-
@@ -1,12 +1,70 @@
 from __future__ import annotations
 
-from typing import Dict, List
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+
+Step = Tuple[str, object]
+
+
+@dataclass(frozen=True)
+class EditPlan:
+    """
+    An edit list compiled once for reuse across many texts: ops are parsed
+    up front, no-ops dropped, and strengthen_claim becomes a plain replace,
+    with consecutive replaces grouped into one step.
+    """
+
+    steps: Tuple[Step, ...]
+
+    def apply(self, text: str) -> str:
+        result = text
+        for op, arg in self.steps:
+            if op == "replace":
+                for target, value in arg:
+                    result = result.replace(target, value)
+            elif op == "prepend":
+                result = f"{arg} {result}".strip()
+            else:
+                result = f"{result} {arg}".strip()
+        return result
+
+    def apply_many(self, texts: Iterable[str]) -> List[str]:
+        apply = self.apply
+        return [apply(text) for text in texts]
+
+
+def compile_edits(edits: List[Dict]) -> EditPlan:
+    """Compile structured edits (see apply_edits) into a reusable EditPlan."""
+    steps: List[Step] = []
+    for e in edits:
+        op = e.get("op")
+        if op == "replace":
+            pair = (str(e.get("target", "")), str(e.get("value", "")))
+        elif op == "strengthen_claim":
+            target = str(e.get("target", ""))
+            if not target:
+                continue
+            # Replacing an absent target is a no-op, so no containment check is needed
+            pair = (target, f"{target} ({e.get('constraint', '')})")
+        elif op in ("prepend", "append"):
+            steps.append((op, str(e.get("value", ""))))
+            continue
+        else:
+            continue
+        if pair[0] == pair[1]:
+            continue
+        if steps and steps[-1][0] == "replace":
+            steps[-1] = ("replace", steps[-1][1] + (pair,))
+        else:
+            steps.append(("replace", (pair,)))
+    return EditPlan(steps=tuple(steps))
 
 
 def apply_edits(text: str, edits: List[Dict]) -> str:
     """
     Apply simple structured edits to ad copy.
     Supported ops: replace, prepend, append, strengthen_claim (naive boost).
+    To apply the same edits to many texts, compile them once with compile_edits.
     """
     result = text
     for e in edits:
@@ -29,3 +87,6 @@ def apply_edits(text: str, edits: List[Dict]) -> str:
     return result
 
 
+def apply_edits_batch(texts: Iterable[str], edits: List[Dict]) -> List[str]:
+    """apply_edits over many texts, compiling the edit list once."""
+    return compile_edits(edits).apply_many(texts)
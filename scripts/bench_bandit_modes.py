@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Bandit latency comparison: embedded (in-process) vs standalone HTTP service.
+
+Usage:
+    # start the standalone bandit first: cd services/bandit && uvicorn app:app --port 8000
+    python scripts/bench_bandit_modes.py --requests 2000 --arms 50
+
+Both modes use the same store backend (set REDIS_URL to benchmark against Redis).
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import os
+import pathlib
+import statistics
+import sys
+import time
+from typing import List
+
+import httpx
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+BANDIT_URL = os.getenv("BANDIT_SERVICE_URL", "http://localhost:8000")
+
+
+def load_bandit():
+    spec = importlib.util.spec_from_file_location("adastra_bandit", PROJECT_ROOT / "services" / "bandit" / "app.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module  # dataclasses resolve annotations via sys.modules
+    spec.loader.exec_module(module)
+    return module
+
+
+def summarize(name: str, samples: List[float]) -> None:
+    samples = sorted(samples)
+    p50 = samples[len(samples) // 2]
+    p95 = samples[int(len(samples) * 0.95)]
+    p99 = samples[int(len(samples) * 0.99)]
+    print(
+        f"{name:<10} n={len(samples):<6} mean={statistics.mean(samples):8.3f}ms "
+        f"p50={p50:8.3f}ms p95={p95:8.3f}ms p99={p99:8.3f}ms"
+    )
+
+
+async def bench_embedded(bandit, n: int, arms: List[str]) -> List[float]:
+    samples = []
+    for i in range(n):
+        start = time.perf_counter()
+        variant_id, _ = await bandit.thompson_select("bench_campaign", "human", arms)
+        await bandit.apply_reward("bench_campaign", "human", variant_id, 1.0 if i % 10 == 0 else 0.0)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+async def bench_http(n: int, arms: List[str]) -> List[float]:
+    samples = []
+    async with httpx.AsyncClient(base_url=BANDIT_URL, timeout=5.0) as client:
+        for i in range(n):
+            start = time.perf_counter()
+            response = await client.post("/select", json={"campaignId": "bench_campaign", "segment": "human", "arms": arms})
+            variant_id = response.json()["variantId"]
+            await client.post("/reward", json={
+                "campaignId": "bench_campaign",
+                "segment": "human",
+                "variantId": variant_id,
+                "reward": 1.0 if i % 10 == 0 else 0.0,
+            })
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--arms", type=int, default=50)
+    args = parser.parse_args()
+
+    arms = [f"var_{i}" for i in range(args.arms)]
+    print(f"select+reward round trips, {args.arms} arms\n")
+
+    summarize("embedded", await bench_embedded(load_bandit(), args.requests, arms))
+    try:
+        summarize("http", await bench_http(args.requests, arms))
+    except httpx.HTTPError as exc:
+        print(f"http       skipped ({BANDIT_URL} unreachable: {exc})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Convex traffic of one evolution/breeding cycle: per-attempt clients vs the pooled client.
+
+Replays the request sequence of evolve_campaign (recalculate metrics, fetch metrics,
+one fitness update per variant, parent fetches, evolution history writes) against a
+local stub Convex server, first with a fresh httpx.AsyncClient per request (the old
+_request_with_retry) and then with the evolution engine's pooled request_with_retry.
+
+Usage:
+    python scripts/bench_breeding_cycle_traffic.py --variants 50 --parents 10 --tls
+"""
+
+import argparse
+import asyncio
+import os
+import pathlib
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "services" / "evolution-engine"))
+
+stub = FastAPI()
+
+
+@stub.get("/{endpoint}")
+async def stub_query(endpoint: str, request: Request):
+    return {"_id": request.query_params.get("id", "k17variant"), "agentConfig": {}}
+
+
+@stub.post("/admin/{endpoint}")
+async def stub_mutation(endpoint: str):
+    return {"ok": True}
+
+
+def start_stub(port: int, tls_dir: str = None) -> uvicorn.Server:
+    kwargs = {}
+    if tls_dir:
+        kwargs = {"ssl_keyfile": f"{tls_dir}/key.pem", "ssl_certfile": f"{tls_dir}/cert.pem"}
+    server = uvicorn.Server(uvicorn.Config(stub, host="127.0.0.1", port=port, log_level="error", **kwargs))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def make_cert() -> str:
+    if shutil.which("openssl") is None:
+        raise SystemExit("--tls needs the openssl CLI")
+    tls_dir = tempfile.mkdtemp()
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=127.0.0.1",
+         "-addext", "subjectAltName=IP:127.0.0.1",
+         "-keyout", f"{tls_dir}/key.pem", "-out", f"{tls_dir}/cert.pem"],
+        check=True, capture_output=True,
+    )
+    return tls_dir
+
+
+async def legacy_request(method: str, url: str, **kwargs) -> httpx.Response:
+    """The previous behaviour: a brand-new client (and connection) per attempt."""
+    async with httpx.AsyncClient(timeout=15.0) as client:
+        response = await client.request(method, url, **kwargs)
+        response.raise_for_status()
+        return response
+
+
+async def breeding_cycle(request, base: str, variants: int, parents: int) -> int:
+    calls = [("POST", f"{base}/admin/recalculateMetrics", {"json": {"campaignId": "c"}}),
+             ("GET", f"{base}/queries:getCampaignMetrics", {"params": {"campaignId": "c"}})]
+    calls += [("POST", f"{base}/admin/mutations:updateVariantFitness", {"json": {"variantId": f"v{i}", "fitnessScore": 0.5}})
+              for i in range(variants)]
+    calls += [("GET", f"{base}/queries:getVariantById", {"params": {"id": f"v{i}"}}) for i in range(parents)]
+    calls += [("POST", f"{base}/admin/mutations:insertEvolutionHistory", {"json": {"campaignId": "c"}})
+              for _ in range(parents)]
+    for method, url, kwargs in calls:
+        await request(method, url, **kwargs)
+    return len(calls)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--variants", type=int, default=50)
+    parser.add_argument("--parents", type=int, default=10)
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--tls", action="store_true", help="serve the stub over HTTPS, like a real Convex deployment")
+    args = parser.parse_args()
+
+    tls_dir = make_cert() if args.tls else None
+    if tls_dir:
+        os.environ["SSL_CERT_FILE"] = f"{tls_dir}/cert.pem"
+    start_stub(args.port, tls_dir)
+    base = f"{'https' if tls_dir else 'http'}://127.0.0.1:{args.port}"
+
+    import app as evolution  # noqa: E402  (imported after SSL_CERT_FILE is set)
+
+    for name, request in (("per-attempt client", legacy_request), ("pooled client", evolution.request_with_retry)):
+        timings = []
+        for _ in range(args.cycles):
+            start = time.perf_counter()
+            count = await breeding_cycle(request, base, args.variants, args.parents)
+            timings.append((time.perf_counter() - start) * 1000)
+        best, mean = min(timings), sum(timings) / len(timings)
+        print(f"{name:<20} {count} requests/cycle  mean={mean:8.1f}ms  best={best:8.1f}ms  per-request={mean / count:6.2f}ms")
+
+    await evolution.close_http_clients()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
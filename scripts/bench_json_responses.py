@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+JSON response encoding benchmark: FastAPI's default JSONResponse vs the
+shared FastJSONResponse (services/common/fast_json.py).
+
+Payloads mirror what the services actually return:
+  - variants:  gateway /api/assign catalog, 50 variants with full agentConfig and system prompts
+  - stats:     orchestrator campaign stats with per-variant metrics
+  - creative:  /creatives/generate response with a ~1.5 MB base64 data URL
+
+Usage:
+    python scripts/bench_json_responses.py --iterations 200
+"""
+
+import argparse
+import base64
+import os
+import pathlib
+import random
+import sys
+import time
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT / "services" / "common"))
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from fast_json import FastJSONResponse, encoder_name  # noqa: E402
+
+SYSTEM_PROMPT = (
+    "You are an AI advertising agent for Midnight Essence.\n\nPERSONALITY:\n- Tone: sophisticated\n"
+    "- Style: storytelling\n- Key Traits: empathetic, creative, confident\n\n"
+    + "PRODUCT INFO:\n" + "\n".join(f"- feature_{i}: long-lasting notes of oud and amber" for i in range(40))
+    + "\n\nYOUR ROLE: Generate compelling landing page content that adapts to visitor behavior.\n"
+)
+
+
+def variant(i: int) -> dict:
+    return {
+        "_id": f"k17{i:08d}variant",
+        "campaignId": "k17campaign",
+        "segment": "human",
+        "agentType": "landing_page",
+        "name": f"Landing_Page Agent Gen0-{i}",
+        "active": True,
+        "createdAt": 1730000000000 + i,
+        "payload": {"human": {
+            "headline": f"Midnight Essence - Variant {i}",
+            "subhead": "An evening fragrance for the bold",
+            "bullets": ["Oud", "Amber", "Vanilla"],
+            "cta": {"label": "Learn More", "url": "https://example.com"},
+        }},
+        "agentConfig": {
+            "personality": {"tone": "sophisticated", "style": "storytelling", "traits": ["empathetic", "creative"]},
+            "strategy": {"objective": "build_trust", "tactics": ["social_proof", "storytelling"], "adaptationRate": 0.31},
+            "llmConfig": {"model": "gpt-4-turbo-preview", "systemPrompt": SYSTEM_PROMPT, "temperature": 0.74, "maxTokens": 2000},
+            "evolution": {"generation": 2, "parentIds": ["k17a", "k17b"], "mutationRate": 0.15, "fitnessScore": random.random()},
+        },
+    }
+
+
+def payloads() -> dict:
+    variants = [variant(i) for i in range(50)]
+    stats = {
+        "campaign": {"_id": "k17campaign", "name": "Midnight Essence", "goal": {"type": "conversions", "target": 1000}},
+        "totalVariants": 250,
+        "metrics": [
+            {"variantId": f"k17{i:08d}", "impressions": random.randint(0, 10**6), "clicks": random.randint(0, 10**4),
+             "conversions": random.randint(0, 500), "revenue": random.random() * 10**4, "ctr": random.random(),
+             "cvr": random.random(), "fitnessScore": random.random()}
+            for i in range(250)
+        ],
+    }
+    image = base64.b64encode(os.urandom(1_100_000)).decode()
+    creative = {
+        "id": "creative_1", "type": "image",
+        "url": f"data:image/png;base64,{image}", "thumbnail": f"data:image/png;base64,{image}",
+        "title": "Nano Banana: perfume bottle at midnight", "status": "ready", "segment": "human",
+    }
+    return {"variants": {"variants": variants}, "stats": stats, "creative": creative}
+
+
+def bench_render(response_class, content, iterations: int) -> float:
+    response = response_class(content)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        response.render(content)
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def bench_route(app: FastAPI, path: str, iterations: int) -> float:
+    client = TestClient(app)
+    client.get(path)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        client.get(path)
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def build_apps(content: dict) -> tuple:
+    """Before: default class, plain dict return (jsonable_encoder + json.dumps).
+    After: FastJSONResponse returned directly, as the services now do for pass-through payloads."""
+    before = FastAPI()
+    after = FastAPI(default_response_class=FastJSONResponse)
+
+    @before.get("/{name}")
+    async def before_route(name: str):
+        return content[name]
+
+    @after.get("/{name}")
+    async def after_route(name: str):
+        return FastJSONResponse(content[name])
+
+    return before, after
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    content = payloads()
+    before, after = build_apps(content)
+
+    print(f"fast encoder: {encoder_name()}\n")
+    print(f"{'payload':<10} {'size':>8}  {'encode before':>13} {'encode after':>13}  {'route before':>13} {'route after':>12} {'speedup':>8}")
+    for name, payload in content.items():
+        size = len(JSONResponse(payload).body)
+        encode_before = bench_render(JSONResponse, payload, args.iterations)
+        encode_after = bench_render(FastJSONResponse, payload, args.iterations)
+        route_before = bench_route(before, f"/{name}", args.iterations)
+        route_after = bench_route(after, f"/{name}", args.iterations)
+        print(
+            f"{name:<10} {size / 1024:>6.0f}KB  {encode_before:>11.3f}ms {encode_after:>11.3f}ms"
+            f"  {route_before:>11.3f}ms {route_after:>10.3f}ms {route_before / route_after:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Orchestrator cold-start time and resident memory.
+
+Each run starts a fresh interpreter that imports services/agent-orchestrator/app.py
+and serves it with uvicorn, then polls /health until it answers. Reports the
+import time, time until /health is ready, and RSS once ready, as medians over
+--runs. --preload imports the given modules before the app, which reproduces
+the cost of importing them eagerly at module load (e.g. --preload openai crewai).
+
+Usage:
+    python scripts/bench_orchestrator_startup.py --runs 5
+    python scripts/bench_orchestrator_startup.py --runs 5 --preload openai crewai
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+ORCHESTRATOR_DIR = PROJECT_ROOT / "services" / "agent-orchestrator"
+
+# Runs in the child interpreter; reports timings on stdout as one JSON line
+CHILD = """
+import sys, time, threading, json
+started = time.perf_counter()
+for name in {preload!r}:
+    __import__(name)
+preloaded = time.perf_counter()
+import app
+imported = time.perf_counter()
+import uvicorn
+server = uvicorn.Server(uvicorn.Config(app.app, host="127.0.0.1", port={port}, log_level="error"))
+threading.Thread(target=server.run, daemon=True).start()
+print(json.dumps({{"preloadMs": (preloaded - started) * 1000, "importMs": (imported - preloaded) * 1000,
+                   "modules": len(sys.modules)}}), flush=True)
+while True:
+    time.sleep(1)
+"""
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def one_run(preload: list, port: int, env: dict) -> dict:
+    started = time.perf_counter()
+    child = subprocess.Popen(
+        [sys.executable, "-c", CHILD.format(preload=preload, port=port)],
+        cwd=ORCHESTRATOR_DIR,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    try:
+        timings = json.loads(child.stdout.readline())
+        while True:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if child.poll() is not None:
+                raise RuntimeError("orchestrator exited before becoming ready")
+            time.sleep(0.01)
+        timings["readyMs"] = (time.perf_counter() - started) * 1000
+        timings["rssMb"] = rss_mb(child.pid)
+        return timings
+    finally:
+        child.kill()
+        child.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--preload", nargs="*", default=[], help="modules to import before the app")
+    parser.add_argument("--provider", default="openai", choices=["openai", "stub"])
+    parser.add_argument("--port", type=int, default=18002)
+    args = parser.parse_args()
+
+    missing = [name for name in args.preload if importlib.util.find_spec(name) is None]
+    if missing:
+        print(f"skipping --preload modules that are not installed: {', '.join(missing)}")
+    preload = [name for name in args.preload if name not in missing]
+
+    env = {
+        **os.environ,
+        "LLM_PROVIDER": args.provider,
+        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "sk-bench"),
+        "CONVEX_HTTP_BASE": os.getenv("CONVEX_HTTP_BASE", "http://127.0.0.1:9"),
+        "LOG_LEVEL": "ERROR",
+    }
+    rows = [one_run(preload, args.port, env) for _ in range(args.runs)]
+
+    median = lambda key: statistics.median(row[key] for row in rows)
+    print(f"orchestrator startup, provider={args.provider}, preload={preload or 'none'}, {args.runs} runs (medians)")
+    print(f"{'preload ms':>11} {'import ms':>10} {'ready ms':>9} {'rss MB':>7} {'modules':>8}")
+    print(f"{median('preloadMs'):>11.1f} {median('importMs'):>10.1f} {median('readyMs'):>9.1f} "
+          f"{median('rssMb'):>7.1f} {median('modules'):>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Orchestrator throughput against the stub LLM provider.
+
+Serves services/agent-orchestrator/app.py with LLM_PROVIDER=stub on a local
+uvicorn port and drives /generate-content (or /generate-content/stream) at
+each concurrency level, reporting throughput, latency and time-to-first-byte
+percentiles, errors and the LLM governor's concurrency limit afterwards.
+Nothing leaves the machine.
+
+Usage:
+    python scripts/bench_orchestrator_throughput.py --concurrency 1 8 32 128 --requests 400
+    python scripts/bench_orchestrator_throughput.py --stream --stub-max-concurrency 16
+"""
+
+import argparse
+import asyncio
+import os
+import pathlib
+import statistics
+import sys
+import threading
+import time
+
+import httpx
+import uvicorn
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+ORCHESTRATOR_DIR = PROJECT_ROOT / "services" / "agent-orchestrator"
+
+AGENT_CONFIG = {
+    "personality": {"tone": "friendly", "style": "storytelling", "traits": ["empathetic"]},
+    "strategy": {"objective": "maximize_conversions", "tactics": ["social_proof"], "adaptationRate": 0.3},
+    "llmConfig": {"model": "gpt-4o", "systemPrompt": "You are a landing page agent.", "temperature": 0.7, "maxTokens": 400},
+    "evolution": {"generation": 0, "parentIds": [], "mutationRate": 0.15, "fitnessScore": 0.0},
+}
+
+
+def load_app(args: argparse.Namespace):
+    os.environ.update({
+        "LLM_PROVIDER": "stub",
+        "STUB_LATENCY_MS": str(args.latency_ms),
+        "STUB_LATENCY_DISTRIBUTION": args.distribution,
+        "STUB_FIRST_TOKEN_MS": str(args.first_token_ms),
+        "STUB_COMPLETION_TOKENS": str(args.completion_tokens),
+        "STUB_ERROR_RATE": str(args.error_rate),
+        "STUB_RATE_LIMIT_RATE": str(args.rate_limit_rate),
+        "STUB_MAX_CONCURRENCY": str(args.stub_max_concurrency),
+        "LLM_MAX_CONCURRENCY": str(args.llm_max_concurrency),
+        "LOG_LEVEL": "ERROR",
+    })
+    os.chdir(ORCHESTRATOR_DIR)
+    sys.path.insert(0, str(ORCHESTRATOR_DIR))
+    import app as orchestrator
+
+    return orchestrator
+
+
+def serve(orchestrator, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(orchestrator.app, host="127.0.0.1", port=port, log_level="error"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def one_request(client: httpx.AsyncClient, index: int, stream: bool) -> tuple:
+    body = {
+        "variantId": f"v{index % 50}",
+        "agentConfig": AGENT_CONFIG,
+        # Distinct contexts so every request reaches the provider
+        "context": {"visitor": index},
+        "contentType": "headline",
+        "useCache": False,
+    }
+    started = time.perf_counter()
+    if not stream:
+        response = await client.post("/generate-content", json=body)
+        elapsed = (time.perf_counter() - started) * 1000
+        return response.status_code == 200, elapsed, elapsed
+    first_byte = None
+    ok = False
+    async with client.stream("POST", "/generate-content/stream", json=body) as response:
+        async for line in response.aiter_lines():
+            if line.startswith("event: delta") and first_byte is None:
+                first_byte = (time.perf_counter() - started) * 1000
+            if line.startswith("event: done"):
+                ok = True
+    elapsed = (time.perf_counter() - started) * 1000
+    return ok, elapsed, first_byte if first_byte is not None else elapsed
+
+
+async def run_level(orchestrator, base_url: str, concurrency: int, requests: int, stream: bool) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        async def bounded(i: int):
+            async with semaphore:
+                return await one_request(client, i, stream)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(bounded(i) for i in range(requests)))
+        wall = time.perf_counter() - started
+
+    latencies = sorted(r[1] for r in results if r[0])
+    first = sorted(r[2] for r in results if r[0])
+    pct = lambda values, p: values[min(len(values) - 1, int(p / 100 * len(values)))] if values else 0.0
+    return {
+        "concurrency": concurrency,
+        "rps": requests / wall,
+        "p50": statistics.median(latencies) if latencies else 0.0,
+        "p95": pct(latencies, 95),
+        "ttfb_p50": statistics.median(first) if first else 0.0,
+        "ttfb_p95": pct(first, 95),
+        "errors": sum(1 for r in results if not r[0]),
+        "limit": orchestrator.llm_governor.limit,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--stream", action="store_true", help="benchmark /generate-content/stream")
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--distribution", default="lognormal", choices=["fixed", "uniform", "normal", "lognormal"])
+    parser.add_argument("--first-token-ms", type=float, default=250)
+    parser.add_argument("--completion-tokens", type=int, default=120)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--stub-max-concurrency", type=int, default=0, help="stub 429s above this many in-flight calls")
+    parser.add_argument("--llm-max-concurrency", type=int, default=64)
+    parser.add_argument("--port", type=int, default=18001)
+    args = parser.parse_args()
+
+    orchestrator = load_app(args)
+    serve(orchestrator, args.port)
+    base_url = f"http://127.0.0.1:{args.port}"
+    route = "/generate-content/stream" if args.stream else "/generate-content"
+    print(f"{route} with stub provider (latency {args.latency_ms}ms {args.distribution}, "
+          f"errors {args.error_rate:.0%}, 429s {args.rate_limit_rate:.0%}, quota {args.stub_max_concurrency or 'none'})")
+    print(f"{'conc':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'ttfb p50':>9} {'ttfb p95':>9} {'errors':>7} {'llm limit':>10}")
+    for concurrency in args.concurrency:
+        row = await run_level(orchestrator, base_url, concurrency, args.requests, args.stream)
+        print(f"{row['concurrency']:>5} {row['rps']:>8.1f} {row['p50']:>9.1f} {row['p95']:>9.1f} "
+              f"{row['ttfb_p50']:>9.1f} {row['ttfb_p95']:>9.1f} {row['errors']:>7} {row['limit']:>10}", flush=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
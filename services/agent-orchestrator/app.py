@@ -8,41 +8,175 @@ from __future__ import annotations
 
 import asyncio
 import copy
+import json
 import logging
 import os
 import random
-from collections import defaultdict
-from typing import Any, Dict, List, Optional
+import re
+import time
+import uuid
+from collections import OrderedDict, defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
 
 import httpx
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
-from openai import AsyncOpenAI
 from dotenv import load_dotenv
 
-# CrewAI imports
-from crewai import Agent, Crew, Task, Process
+# Heavy SDKs (crewai, openai) are not imported here: none of the request paths
+# use crewai, and the OpenAI client is created on first use by llm_providers.
 
 # Load environment variables from project root
 import pathlib
+import sys
 project_root = pathlib.Path(__file__).parent.parent.parent
 load_dotenv(project_root / ".env")
 
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent / "common"))
+from fast_json import FastJSONResponse
+from http_pool import UNSENT_ERRORS, close_http_clients, get_http_client, request_with_retry
+
+from campaign_store import CampaignStore, InvalidCursor
+from content_cache import ContentCache, normalize_context
+from creative_jobs import CreativeJobQueue, QueueFullError
+from creative_store import CreativeStore
+from guardrails import DEFAULT_BANNED_TERMS, GuardrailEngine, has_errors
+from image_cache import ImageDedupCache
+from pregeneration import PregenerationWorker
+from llm_accounting import LLMAccounting, SORT_KEYS
+from llm_governor import LLMGovernor, PRIORITY_INTERACTIVE, PRIORITY_PREGENERATION
+from llm_providers import StubProvider, create_provider, usage_dict
+from metrics_cache import CampaignMetricsCache
+from near_duplicates import NearDuplicateIndex, text_features
+from prompt_templates import PromptStore, prompt_ref
+
 logger = logging.getLogger("agent_orchestrator")
 logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
 
-# Initialize OpenAI client
-openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# LLM provider: "openai", or "stub" for load tests without a live API.
+# Rate-limit retries are coordinated by the LLM governor, so client-level
+# retries are off by default.
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
+llm_provider = create_provider(
+    LLM_PROVIDER,
+    openai_api_key=os.getenv("OPENAI_API_KEY"),
+    openai_max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "0")),
+)
+
+
+def _retry_after_seconds(exc: Exception) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+# Adaptive concurrency, priority queues and dedup in front of the LLM client
+llm_governor = LLMGovernor(
+    initial_concurrency=int(os.getenv("LLM_INITIAL_CONCURRENCY", "8")),
+    min_concurrency=int(os.getenv("LLM_MIN_CONCURRENCY", "1")),
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "64")),
+    cooldown_seconds=float(os.getenv("LLM_RATE_LIMIT_COOLDOWN_SECONDS", "1.0")),
+    max_retries=int(os.getenv("LLM_RATE_LIMIT_RETRIES", "2")),
+    retry_after=_retry_after_seconds,
+)
 
 # Initialize Google API key for Nano Banana
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
+# Guardrails for generated and bred copy. "flag" annotates responses with
+# issues, "block" also withholds copy with errors, "off" skips validation.
+GUARDRAIL_MODE = os.getenv("GUARDRAIL_MODE", "flag").lower()
+guardrails = GuardrailEngine(
+    [t for t in os.getenv("GUARDRAIL_BANNED_TERMS", ",".join(DEFAULT_BANNED_TERMS)).split(",")],
+    headline_min_length=int(os.getenv("GUARDRAIL_HEADLINE_MIN_LENGTH", "4")),
+    subhead_max_length=int(os.getenv("GUARDRAIL_SUBHEAD_MAX_LENGTH", "160")),
+)
+
+
+def check_content(content: str) -> Dict[str, Any]:
+    """Guardrail verdict for generated content: {"passed", "issues"}."""
+    issues = guardrails.validate_text(content, field="content") if GUARDRAIL_MODE != "off" else []
+    return {"passed": not has_errors(issues), "issues": issues}
+
+
+# Near-duplicate screening of new variants against the arms of their campaign
+# segment. "reject" drops candidates that match an existing arm (or an earlier
+# candidate in the same request), "flag" only reports them, "off" skips it.
+NEAR_DUP_MODE = os.getenv("NEAR_DUP_MODE", "reject").lower()
+near_duplicates = NearDuplicateIndex(
+    threshold=float(os.getenv("NEAR_DUP_THRESHOLD", "0.8")),
+    max_scopes=int(os.getenv("NEAR_DUP_MAX_SCOPES", "1000")),
+)
+
+# Generated-content cache (memory LRU, optional disk tier)
+CONTENT_CACHE_ENABLED = os.getenv("CONTENT_CACHE_ENABLED", "true").lower() == "true"
+content_cache = ContentCache(
+    max_entries=int(os.getenv("CONTENT_CACHE_MAX_ENTRIES", "10000")),
+    max_alternatives=int(os.getenv("CONTENT_CACHE_ALTERNATIVES", "3")),
+    ttl_seconds=float(os.getenv("CONTENT_CACHE_TTL_SECONDS", "21600")),
+    temperature_step=float(os.getenv("CONTENT_CACHE_TEMPERATURE_STEP", "0.1")),
+    disk_dir=os.getenv("CONTENT_CACHE_DIR") or None,
+    sweep_interval_seconds=float(os.getenv("CONTENT_CACHE_SWEEP_SECONDS", "3600")),
+)
+
+# Content-addressed creative store; assets are served from /creatives/assets
+creative_store = CreativeStore(
+    os.getenv("CREATIVE_STORE_DIR") or str(project_root / "data" / "creatives"),
+    thumbnail_size=int(os.getenv("CREATIVE_THUMBNAIL_SIZE", "400")),
+)
+# Public origin for asset URLs; defaults to the origin the request came in on
+CREATIVE_PUBLIC_BASE_URL = os.getenv("CREATIVE_PUBLIC_BASE_URL", "").rstrip("/")
+
+# Repeat image prompts are served from stored images (LRU + byte budget on disk)
+IMAGE_CACHE_ENABLED = os.getenv("IMAGE_CACHE_ENABLED", "true").lower() == "true"
+image_cache = ImageDedupCache(
+    creative_store,
+    max_variants=int(os.getenv("IMAGE_CACHE_VARIANTS", "1")),
+    max_entries=int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "5000")),
+    max_bytes=int(float(os.getenv("IMAGE_CACHE_MAX_MB", "2048")) * 1024 * 1024),
+    index_path=os.path.join(creative_store.root, "image-cache-index.json"),
+    enabled=IMAGE_CACHE_ENABLED,
+)
+
+# Campaign stats for dashboards: served from memory for CAMPAIGN_METRICS_TTL_SECONDS,
+# then stale for up to CAMPAIGN_METRICS_STALE_SECONDS while one refresh runs.
+# A TTL of 0 turns caching off; concurrent polls still share one query.
+campaign_metrics_cache = CampaignMetricsCache(
+    ttl_seconds=float(os.getenv("CAMPAIGN_METRICS_TTL_SECONDS", "30")),
+    stale_seconds=float(os.getenv("CAMPAIGN_METRICS_STALE_SECONDS", "300")),
+    max_entries=int(os.getenv("CAMPAIGN_METRICS_CACHE_SIZE", "1000")),
+)
+
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    """Background workers run for the app's lifetime; see startup_event and shutdown_event."""
+    await startup_event()
+    try:
+        yield
+    finally:
+        await shutdown_event()
+
+
 # FastAPI app
-app = FastAPI(title="Ad-Astra Agent Orchestrator", version="0.2.0")
+app = FastAPI(
+    title="Ad-Astra Agent Orchestrator",
+    version="0.2.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan,
+)
 
-# In-memory storage for demo (replace with Convex in production)
-CAMPAIGNS_STORE: Dict[str, Dict[str, Any]] = {}
-VARIANTS_STORE: Dict[str, List[Dict[str, Any]]] = {}
+# Campaigns and variants created through this service, in SQLite (WAL) so
+# they survive restarts and are shared by all workers on the host
+campaign_store = CampaignStore(
+    os.getenv("ORCHESTRATOR_DB_PATH") or str(project_root / "data" / "orchestrator.db")
+)
 
 
 # ============================================
@@ -63,7 +197,9 @@ class StrategyConfig(BaseModel):
 
 class LLMConfig(BaseModel):
     model: str = "gpt-4-turbo-preview"
-    systemPrompt: str
+    # Full prompt text, or a promptRef into the shared prompts table (at least one is set)
+    systemPrompt: Optional[str] = None
+    promptRef: Optional[str] = None
     temperature: float = Field(ge=0, le=2, default=0.7)
     maxTokens: int = Field(ge=100, le=4000, default=2000)
 
@@ -97,7 +233,7 @@ class CreateAgentRequest(BaseModel):
     assets: List[CampaignAsset]
     productInfo: Dict[str, Any]
     goal: Dict[str, Any]  # type: conversions/revenue, target: number
-    count: int = 10  # How many seed agents to create
+    count: int = Field(default=10, ge=1, le=500)  # How many seed agents to create
 
 
 class GenerateContentRequest(BaseModel):
@@ -105,6 +241,10 @@ class GenerateContentRequest(BaseModel):
     agentConfig: AgentConfigModel
     context: Dict[str, Any]  # User behavior, page context, etc.
     contentType: str  # headline, subhead, full_page, social_post, etc.
+    useCache: bool = True  # Serve/store cached alternatives for equivalent requests
+    # Attribution for LLM usage accounting; looked up from the variant when omitted
+    campaignId: Optional[str] = None
+    agentType: Optional[str] = None
 
 
 class BreedAgentsRequest(BaseModel):
@@ -125,36 +265,30 @@ PERSONALITY_POOLS = {
 }
 
 
-async def _request_with_retry(
-    method: str,
-    url: str,
-    *,
-    json: Optional[Dict[str, Any]] = None,
-    params: Optional[Dict[str, Any]] = None,
-    headers: Optional[Dict[str, str]] = None,
-    attempts: int = 3,
-    timeout: float = 15.0,
-) -> httpx.Response:
-    last_error: Optional[Exception] = None
-    for attempt in range(1, attempts + 1):
-        try:
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                response = await client.request(method, url, json=json, params=params, headers=headers)
-                response.raise_for_status()
-                return response
-        except Exception as exc:
-            last_error = exc
-            if attempt == attempts:
-                break
-            await asyncio.sleep(min(2 ** attempt, 5))
-    assert last_error is not None
-    raise last_error
-
-
 # ============================================
 # Helper Functions
 # ============================================
 
+def render_system_prompt(
+    agent_type: str,
+    personality: PersonalityConfig,
+    strategy: StrategyConfig,
+    product_info: Dict[str, Any],
+    goal: Dict[str, Any]
+) -> Tuple[str, str]:
+    """Render the agent's system prompt from its compiled template; returns (promptRef, text)."""
+    return prompt_store.render(agent_type, {
+        "product_name": str(product_info.get('name', 'our product')),
+        "tone": personality.tone,
+        "style": personality.style,
+        "traits": ', '.join(personality.traits),
+        "goal": f"{goal['type']} with target of {goal['target']}",
+        "objective": strategy.objective,
+        "tactics": ', '.join(strategy.tactics),
+        "product_info": format_product_info(product_info),
+    })
+
+
 def generate_system_prompt(
     agent_type: str,
     personality: PersonalityConfig,
@@ -163,69 +297,17 @@ def generate_system_prompt(
     goal: Dict[str, Any]
 ) -> str:
     """Generate a system prompt for the agent based on its configuration."""
+    return render_system_prompt(agent_type, personality, strategy, product_info, goal)[1]
 
-    goal_desc = f"{goal['type']} with target of {goal['target']}"
-
-    base_prompt = f"""You are an AI advertising agent for {product_info.get('name', 'our product')}.
 
-PERSONALITY:
-- Tone: {personality.tone}
-- Style: {personality.style}
-- Key Traits: {', '.join(personality.traits)}
-
-GOAL: {goal_desc}
-
-STRATEGY:
-- Objective: {strategy.objective}
-- Tactics: {', '.join(strategy.tactics)}
-
-PRODUCT INFO:
-{format_product_info(product_info)}
-
-"""
-
-    # Add agent-type specific instructions
-    if agent_type == "landing_page":
-        base_prompt += """
-YOUR ROLE: Generate compelling landing page content that adapts to visitor behavior.
-- Create headlines that grab attention
-- Write persuasive copy that drives action
-- Adapt content based on how users interact with the page
-- Focus on conversion optimization
-"""
-    elif agent_type == "social_media":
-        base_prompt += """
-YOUR ROLE: Create engaging social media ad content.
-- Craft attention-grabbing hooks
-- Write concise, shareable copy
-- Include strong CTAs
-- Optimize for platform-specific best practices
-"""
-    elif agent_type == "placement":
-        base_prompt += """
-YOUR ROLE: Decide optimal ad placement timing and targeting.
-- Analyze user context (time, location, device, behavior)
-- Recommend when and where to show ads
-- Maximize ROI through smart placement
-"""
-    elif agent_type == "visual":
-        base_prompt += """
-YOUR ROLE: Generate specifications for visual content.
-- Describe compelling image/video concepts
-- Specify visual elements that align with brand
-- Optimize for emotional impact
-"""
-    elif agent_type == "ai_context":
-        base_prompt += """
-YOUR ROLE: Optimize structured data for AI agents and scrapers.
-- Create semantic, machine-readable content
-- Structure data for AI decision-making
-- Highlight key differentiators for AI comparison
-"""
-
-    base_prompt += "\nALWAYS stay in character and apply your tactics strategically."
-
-    return base_prompt
+def build_llm_config(prompt: Tuple[str, str], **kwargs: Any) -> LLMConfig:
+    """LLMConfig that stores the prompt by reference when STORE_PROMPT_REFS is on."""
+    ref, text = prompt
+    if STORE_PROMPT_REFS and _prompt_refs_supported:
+        # Held in memory until persist_prompts has written it
+        prompt_store.pin(ref, text)
+        return LLMConfig(promptRef=ref, **kwargs)
+    return LLMConfig(systemPrompt=text, **kwargs)
 
 
 def format_product_info(product_info: Dict[str, Any]) -> str:
@@ -384,8 +466,8 @@ def normalize_variant_id(raw_id: Any) -> str:
     return str(raw_id)
 
 
-async def call_convex_mutation(endpoint: str, data: Dict[str, Any]) -> Any:
-    """Call Convex mutation endpoint."""
+async def call_convex_mutation(endpoint: str, data: Dict[str, Any], *, retry: bool = False) -> Any:
+    """Call Convex mutation endpoint. Pass retry=True only for mutations that are safe to repeat."""
     convex_base = os.getenv("CONVEX_HTTP_BASE")
     if not convex_base:
         raise HTTPException(status_code=500, detail="CONVEX_HTTP_BASE not configured")
@@ -393,11 +475,12 @@ async def call_convex_mutation(endpoint: str, data: Dict[str, Any]) -> Any:
     admin_secret = os.getenv("ADMIN_SECRET")
     headers = {"x-admin-key": admin_secret} if admin_secret else {}
 
-    response = await _request_with_retry(
+    response = await request_with_retry(
         "POST",
         f"{convex_base}/admin/{endpoint}",
         json=data,
         headers=headers,
+        retry=retry,
     )
     return response.json()
 
@@ -408,7 +491,7 @@ async def call_convex_query(endpoint: str, params: Dict[str, Any]) -> Any:
     if not convex_base:
         raise HTTPException(status_code=500, detail="CONVEX_HTTP_BASE not configured")
 
-    response = await _request_with_retry(
+    response = await request_with_retry(
         "GET",
         f"{convex_base}/{endpoint}",
         params=params,
@@ -416,6 +499,299 @@ async def call_convex_query(endpoint: str, params: Dict[str, Any]) -> Any:
     return response.json()
 
 
+CONVEX_BULK_CHUNK_SIZE = int(os.getenv("CONVEX_BULK_CHUNK_SIZE", "50"))
+CONVEX_WRITE_CONCURRENCY = int(os.getenv("CONVEX_WRITE_CONCURRENCY", "8"))
+
+# Turned off once the Convex deployment answers 404 for /admin/createVariants
+_bulk_variants_supported = True
+
+
+def write_not_applied(exc: Exception) -> bool:
+    """
+    True when a failed Convex write provably committed nothing: it was never
+    sent, or Convex rejected it with a 4xx (mutations are transactional).
+    Timeouts, 5xx and malformed replies may follow a commit.
+    """
+    if isinstance(exc, HTTPException):
+        # Raised before sending, e.g. CONVEX_HTTP_BASE not configured
+        return True
+    if isinstance(exc, UNSENT_ERRORS):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        return 400 <= exc.response.status_code < 500 and exc.response.status_code != 408
+    return False
+
+
+async def persist_variants(variants: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Persist variants with one createVariants mutation per chunk.
+
+    A chunk whose bulk write was rejected (or never sent) is retried as bounded
+    concurrent createVariant calls, so one bad variant only fails itself. A chunk
+    whose outcome is unknown (timeout, 5xx, wrong id count) may have been written,
+    so it is reported as failed rather than written again as duplicate arms.
+    Returns one result per input, in order: {"id": ...} on success or
+    {"error": ...} on failure.
+    """
+    global _bulk_variants_supported
+
+    results: List[Dict[str, Any]] = [{} for _ in variants]
+    semaphore = asyncio.Semaphore(CONVEX_WRITE_CONCURRENCY)
+    fallback: List[int] = []
+
+    async def create_chunk(indices: List[int]) -> None:
+        global _bulk_variants_supported
+        if not _bulk_variants_supported:
+            fallback.extend(indices)
+            return
+        async with semaphore:
+            try:
+                response = await call_convex_mutation("createVariants", {"variants": [variants[i] for i in indices]})
+                ids = (response or {}).get("ids") or []
+                if len(ids) != len(indices):
+                    raise ValueError(f"createVariants returned {len(ids)} ids for {len(indices)} variants")
+            except Exception as exc:
+                if isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code == 404:
+                    _bulk_variants_supported = False
+                if not write_not_applied(exc):
+                    logger.error("Bulk variant write of %d variants has an unknown outcome: %s", len(indices), exc)
+                    for index in indices:
+                        results[index] = {"error": f"Bulk write outcome unknown: {exc}"}
+                    return
+                logger.warning("Bulk variant write failed, falling back to single writes: %s", exc)
+                fallback.extend(indices)
+                return
+        for index, variant_id in zip(indices, ids):
+            results[index] = {"id": normalize_variant_id(variant_id)}
+
+    async def create_one(index: int) -> None:
+        async with semaphore:
+            try:
+                result = await call_convex_mutation("createVariant", variants[index])
+                results[index] = {"id": normalize_variant_id(result)}
+            except Exception as exc:
+                detail = exc.detail if isinstance(exc, HTTPException) else str(exc)
+                results[index] = {"error": detail or type(exc).__name__}
+
+    chunks = [
+        list(range(start, min(start + CONVEX_BULK_CHUNK_SIZE, len(variants))))
+        for start in range(0, len(variants), CONVEX_BULK_CHUNK_SIZE)
+    ]
+    await asyncio.gather(*(create_chunk(chunk) for chunk in chunks))
+    await asyncio.gather(*(create_one(index) for index in sorted(fallback)))
+    return results
+
+
+# Turned off once the Convex deployment answers 404 for queries:getVariantsByIds
+_bulk_variant_reads_supported = True
+
+
+async def fetch_variants(variant_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Load variants with one getVariantsByIds query; falls back to concurrent
+    getVariantById calls. Returns one entry per id, in order, None if missing.
+    """
+    global _bulk_variant_reads_supported
+
+    if _bulk_variant_reads_supported:
+        try:
+            variants = await call_convex_query("queries:getVariantsByIds", {"ids": ",".join(variant_ids)})
+            if isinstance(variants, list) and len(variants) == len(variant_ids):
+                return variants
+            raise ValueError(f"getVariantsByIds returned {len(variants or [])} rows for {len(variant_ids)} ids")
+        except Exception as exc:
+            if isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code == 404:
+                _bulk_variant_reads_supported = False
+            logger.warning("Bulk variant read failed, falling back to single reads: %s", exc)
+
+    semaphore = asyncio.Semaphore(CONVEX_WRITE_CONCURRENCY)
+
+    async def fetch_one(variant_id: str) -> Optional[Dict[str, Any]]:
+        async with semaphore:
+            return await call_convex_query("queries:getVariantById", {"id": variant_id})
+
+    return list(await asyncio.gather(*(fetch_one(variant_id) for variant_id in variant_ids)))
+
+
+# ============================================
+# Prompt Store
+# ============================================
+
+STORE_PROMPT_REFS = os.getenv("STORE_PROMPT_REFS", "true").lower() == "true"
+PROMPT_CACHE_SIZE = int(os.getenv("PROMPT_CACHE_SIZE", "4096"))
+
+# Turned off once the Convex deployment answers 404 for /admin/upsertPrompts
+_prompt_refs_supported = True
+
+
+async def _fetch_prompts(refs: List[str]) -> Dict[str, str]:
+    rows = await call_convex_query("queries:getPromptsByRefs", {"refs": ",".join(refs)})
+    return {row["ref"]: row["text"] for row in rows or []}
+
+
+prompt_store = PromptStore(max_entries=PROMPT_CACHE_SIZE, fetch=_fetch_prompts)
+
+
+async def persist_prompts(variants: List[Dict[str, Any]]) -> None:
+    """
+    Write the prompts referenced by these variants to Convex ahead of the
+    variants themselves. If that fails the prompt text is inlined instead, so a
+    variant never points at a prompt that was not stored. Prompts left pinned
+    by an earlier failed write go out with the next one.
+    """
+    global _prompt_refs_supported
+
+    if not any(v["agentConfig"]["llmConfig"].get("promptRef") for v in variants):
+        return
+    pending = prompt_store.unpersisted()
+    if not pending:
+        return
+    try:
+        # Upserting by content hash is idempotent, so retries are safe
+        await call_convex_mutation("upsertPrompts", {"prompts": pending}, retry=True)
+        prompt_store.mark_persisted(p["ref"] for p in pending)
+        return
+    except Exception as exc:
+        if isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code == 404:
+            _prompt_refs_supported = False
+        logger.warning("Failed to persist %d prompts, inlining prompt text: %s", len(pending), exc)
+
+    texts = {p["ref"]: p["text"] for p in pending}
+    for variant in variants:
+        llm = variant["agentConfig"]["llmConfig"]
+        if llm.get("promptRef") in texts:
+            llm["systemPrompt"] = texts[llm["promptRef"]]
+
+
+async def resolve_system_prompt(llm: LLMConfig) -> str:
+    """The prompt text for an LLMConfig that carries either the text or a promptRef."""
+    if llm.systemPrompt:
+        return llm.systemPrompt
+    if llm.promptRef:
+        text = await prompt_store.resolve(llm.promptRef)
+        if text is None:
+            raise HTTPException(status_code=404, detail=f"Unknown promptRef {llm.promptRef}")
+        return text
+    raise HTTPException(status_code=422, detail="llmConfig needs a systemPrompt or promptRef")
+
+
+# ============================================
+# Near-Duplicate Screening
+# ============================================
+
+_GENERATION_TAG = re.compile(r"\s*·?\s*\bGen\d+\b")
+
+
+def variant_features(variant: Dict[str, Any]) -> Tuple[Set[str], Set[str]]:
+    """(prompt features, copy features) of a variant for near-duplicate detection."""
+    config = variant.get("agentConfig") or {}
+    personality = config.get("personality") or {}
+    strategy = config.get("strategy") or {}
+    if personality or strategy:
+        # What the prompt is rendered from; the template text is shared by every
+        # variant and would swamp the similarity
+        prompt = {
+            f"tone:{personality.get('tone')}",
+            f"style:{personality.get('style')}",
+            f"objective:{strategy.get('objective')}",
+        }
+        prompt.update(f"trait:{trait}" for trait in personality.get("traits") or [])
+        prompt.update(f"tactic:{tactic}" for tactic in strategy.get("tactics") or [])
+    else:
+        prompt = text_features((config.get("llmConfig") or {}).get("systemPrompt") or "")
+
+    payload = variant.get("payload") or {}
+    human = payload.get("human") or {}
+    texts = [human.get("headline"), human.get("subhead"), *(human.get("bullets") or [])]
+    texts.append((human.get("cta") or {}).get("label"))
+    agent = payload.get("agent")
+    if isinstance(agent, dict) and agent.get("jsonld"):
+        texts.append(json.dumps(agent["jsonld"], sort_keys=True))
+    # Breeding tags copy with its generation ("· Gen3"); that alone is no difference
+    copy_text = _GENERATION_TAG.sub("", " ".join(t for t in texts if isinstance(t, str)))
+    return prompt, text_features(copy_text)
+
+
+async def _near_duplicate_scope(campaign_id: str, segment: str) -> str:
+    """Index scope for a campaign segment, seeded from its active variants on first use."""
+    scope = f"{campaign_id}:{segment}"
+    if near_duplicates.has_scope(scope):
+        return scope
+    try:
+        existing = await call_convex_query(
+            "queries:getActiveVariantsByCampaignSegment", {"campaignId": campaign_id, "segment": segment}
+        ) or []
+    except Exception as exc:
+        logger.warning("Near-duplicate index for %s starts empty: %s", scope, exc)
+        existing = []
+    signatures = await asyncio.to_thread(
+        lambda: [(normalize_variant_id(v["_id"]), near_duplicates.signature(variant_features(v))) for v in existing]
+    )
+    # Another request may have seeded the scope meanwhile
+    if not near_duplicates.has_scope(scope):
+        near_duplicates.add_scope(scope)
+        for variant_id, signature in signatures:
+            near_duplicates.add(scope, variant_id, signature)
+    return scope
+
+
+async def screen_near_duplicates(variants: List[Dict[str, Any]]) -> Tuple[List[Optional[Dict[str, Any]]], List[str]]:
+    """
+    Check new variants, in order, against their campaign segment and each other.
+
+    Returns (verdicts, keys): a verdict per variant, None when it is distinct or
+    {"duplicateOf": variant id | "duplicateOfIndex": earlier index, "similarity"};
+    and the provisional index key each kept variant was added under ("" if
+    none), to be settled with settle_near_duplicates once persisted.
+    """
+    verdicts: List[Optional[Dict[str, Any]]] = [None] * len(variants)
+    keys = [""] * len(variants)
+    if NEAR_DUP_MODE == "off":
+        return verdicts, keys
+    scopes = {}
+    for scope_args in {(v["campaignId"], v["segment"]) for v in variants}:
+        scopes[scope_args] = await _near_duplicate_scope(*scope_args)
+    signatures = await asyncio.to_thread(lambda: [near_duplicates.signature(variant_features(v)) for v in variants])
+
+    batch = uuid.uuid4().hex[:8]
+    pending: Dict[str, int] = {}
+    for index, (variant, signature) in enumerate(zip(variants, signatures)):
+        scope = scopes[(variant["campaignId"], variant["segment"])]
+        match = near_duplicates.find(scope, signature)
+        if match is not None:
+            match_id, score = match
+            verdicts[index] = (
+                {"duplicateOfIndex": pending[match_id]} if match_id in pending else {"duplicateOf": match_id}
+            )
+            verdicts[index]["similarity"] = round(score, 3)
+            if NEAR_DUP_MODE == "reject":
+                continue
+        keys[index] = f"pending:{batch}:{index}"
+        pending[keys[index]] = index
+        near_duplicates.add(scope, keys[index], signature)
+    return verdicts, keys
+
+
+def settle_near_duplicates(
+    variants: List[Dict[str, Any]], keys: List[str], results: Optional[List[Dict[str, Any]]]
+) -> None:
+    """
+    Re-key persisted variants by their Convex id and forget the ones that failed.
+
+    results is None when persisting never finished (an error or a cancelled
+    request); every provisional key is then forgotten.
+    """
+    for index, (variant, key) in enumerate(zip(variants, keys)):
+        if not key:
+            continue
+        scope = f"{variant['campaignId']}:{variant['segment']}"
+        result = results[index] if results is not None else {}
+        if "id" in result:
+            near_duplicates.rename(scope, key, result["id"])
+        else:
+            near_duplicates.remove(scope, key)
+
+
 # ============================================
 # API Endpoints
 # ============================================
@@ -425,16 +801,22 @@ async def create_agents(req: CreateAgentRequest) -> Dict[str, Any]:
     """
     Create seed agents for a campaign.
     Generates multiple agents with diverse personalities and strategies.
+    Variants are persisted in bulk; agents that fail to persist are reported in
+    "failed" instead of aborting the whole request. Near-duplicates of existing
+    arms are reported in "duplicates" (and not created when NEAR_DUP_MODE=reject).
     """
-    created_agents = []
+    if not os.getenv("CONVEX_HTTP_BASE"):
+        raise HTTPException(status_code=500, detail="CONVEX_HTTP_BASE not configured")
+
+    variants: List[Dict[str, Any]] = []
 
     for i in range(req.count):
         # Generate random personality and strategy
         personality = random_personality()
         strategy = random_strategy(req.goal)
 
-        # Generate system prompt
-        system_prompt = generate_system_prompt(
+        # Generate system prompt (rendered once per distinct input, stored by reference)
+        system_prompt = render_system_prompt(
             agent_type=req.agentType,
             personality=personality,
             strategy=strategy,
@@ -443,9 +825,9 @@ async def create_agents(req: CreateAgentRequest) -> Dict[str, Any]:
         )
 
         # Create LLM config
-        llm_config = LLMConfig(
+        llm_config = build_llm_config(
+            system_prompt,
             model=os.getenv("OPENAI_MODEL", "gpt-4-turbo-preview"),
-            systemPrompt=system_prompt,
             temperature=random.uniform(0.6, 0.9),
             maxTokens=int(os.getenv("OPENAI_MAX_TOKENS", "2000"))
         )
@@ -484,40 +866,72 @@ async def create_agents(req: CreateAgentRequest) -> Dict[str, Any]:
                 }
             }
 
-        # Create variant in Convex
-        variant_data = {
+        variants.append({
             "campaignId": req.campaignId,
             "segment": req.segment,
             "agentType": req.agentType,
             "payload": payload,
-            "agentConfig": agent_config.model_dump(),
+            "agentConfig": agent_config.model_dump(exclude_none=True),
             "name": f"{req.agentType.title()} Agent Gen0-{i+1}",
             "active": True
-        }
+        })
 
-        result = await call_convex_mutation("createVariant", variant_data)
-        created_agents.append(result)
+    # Random configs often collide; near-duplicate arms would only split traffic
+    verdicts, dedup_keys = await screen_near_duplicates(variants)
+    duplicate_agents = [
+        {"index": index, "name": variants[index]["name"], **verdict}
+        for index, verdict in enumerate(verdicts) if verdict is not None
+    ]
+    keep = [index for index, verdict in enumerate(verdicts) if verdict is None or NEAR_DUP_MODE != "reject"]
+    to_persist = [variants[index] for index in keep]
+
+    # Store shared prompts first, then create variants in Convex
+    results: Optional[List[Dict[str, Any]]] = None
+    try:
+        await persist_prompts(to_persist)
+        results = await persist_variants(to_persist)
+    finally:
+        # Provisional index keys must not outlive a failed or cancelled request
+        settle_near_duplicates(to_persist, [dedup_keys[index] for index in keep], results)
+
+    created_agents = []
+    failed_agents = []
+    for index, variant, result in zip(keep, to_persist, results):
+        if "id" in result:
+            created_agents.append({"id": result["id"], "name": variant["name"]})
+        else:
+            failed_agents.append({"index": index, "name": variant["name"], "error": result.get("error")})
+
+    if duplicate_agents:
+        logger.info("Near-duplicate screening (%s) matched %d/%d agents for %s",
+                    NEAR_DUP_MODE, len(duplicate_agents), len(variants), req.campaignId)
+    if failed_agents:
+        logger.warning("Failed to persist %d/%d agents for %s", len(failed_agents), len(to_persist), req.campaignId)
+    if to_persist and not created_agents:
+        raise HTTPException(status_code=502, detail={"message": "Failed to persist agents", "failed": failed_agents})
 
     return {
         "campaignId": req.campaignId,
         "agentType": req.agentType,
         "count": len(created_agents),
-        "agents": created_agents
+        "agents": created_agents,
+        "failed": failed_agents,
+        "duplicates": duplicate_agents
     }
 
 
-@app.post("/generate-content")
-async def generate_content(req: GenerateContentRequest) -> Dict[str, Any]:
-    """
-    Generate content using an agent's LLM configuration.
-    This is called dynamically when a user interacts with an ad.
-    """
-    config = req.agentConfig
+def _content_cache_key(req: GenerateContentRequest) -> str:
+    llm = req.agentConfig.llmConfig
+    # Key on the content hash so inline and referenced copies of a prompt share entries
+    prompt_key = llm.promptRef or prompt_ref(llm.systemPrompt or "")
+    return content_cache.make_key(prompt_key, req.contentType, req.context, llm.temperature, llm.model)
+
 
-    # Build prompt based on content type and context
+def _content_messages(req: GenerateContentRequest, system_prompt: str) -> List[Dict[str, str]]:
+    # Prompt with the context as the cache key sees it, so cached copy fits every request sharing the key
     user_prompt = f"""Generate {req.contentType} based on the following context:
 
-Context: {req.context}
+Context: {normalize_context(req.context or {})}
 
 Requirements:
 - Stay true to your personality and strategy
@@ -525,37 +939,471 @@ Requirements:
 - Adapt to the user's behavior shown in context
 - Keep it concise and impactful
 """
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+async def _complete_content(
+    req: GenerateContentRequest,
+    priority: int = PRIORITY_INTERACTIVE,
+    dedup: bool = True
+) -> Tuple[str, Dict[str, int]]:
+    """Call the LLM for one piece of content through the governor; returns (content, usage)."""
+    llm = req.agentConfig.llmConfig
+    messages = _content_messages(req, await resolve_system_prompt(llm))
+
+    async def call() -> Tuple[str, Dict[str, int]]:
+        # Accounted per upstream call, so deduplicated callers are not counted twice
+        started = time.perf_counter()
+        try:
+            completion = await llm_provider.complete(
+                model=llm.model,
+                messages=messages,
+                temperature=llm.temperature,
+                max_tokens=llm.maxTokens
+            )
+        except Exception:
+            account_llm_call(req, error=True)
+            raise
+        account_llm_call(req, usage=completion.usage, latency_ms=(time.perf_counter() - started) * 1000)
+        return completion.content, completion.usage
+
+    # Identical concurrent prompts share one upstream call
+    dedup_key = None
+    if dedup:
+        dedup_key = (llm.model, llm.temperature, llm.maxTokens, tuple((m["role"], m["content"]) for m in messages))
+    return await llm_governor.run(call, priority=priority, dedup_key=dedup_key)
+
+
+async def _refill_content(req: GenerateContentRequest) -> Optional[Tuple[str, Dict[str, int]]]:
+    """One more alternative for a cache key that was served short; runs behind live traffic."""
+    # Alternatives for one key must be distinct generations, so no dedup here
+    content, usage = await _complete_content(req, priority=PRIORITY_PREGENERATION, dedup=False)
+    if content and check_content(content)["passed"]:
+        return content, usage
+    return None
+
+
+@app.post("/generate-content")
+async def generate_content(req: GenerateContentRequest) -> Dict[str, Any]:
+    """
+    Generate content using an agent's LLM configuration.
+    This is called dynamically when a user interacts with an ad.
+    Equivalent requests are served from the content cache as soon as it
+    holds an alternative for them; missing alternatives are generated in the
+    background.
+    """
+    pregeneration_worker.observe(req.contentType, req.context)
+    use_cache = CONTENT_CACHE_ENABLED and req.useCache
+    cache_key = _content_cache_key(req)
+    if use_cache:
+        cached = await content_cache.lookup(cache_key, refill=lambda: _refill_content(req))
+        if cached is not None:
+            account_cache_hit(req)
+            return {
+                "variantId": req.variantId,
+                "contentType": req.contentType,
+                "content": cached["content"],
+                "usage": usage_dict(),
+                "cached": True,
+                "guardrail": check_content(cached["content"])
+            }
 
     try:
-        # Call OpenAI API
-        response = await openai_client.chat.completions.create(
-            model=config.llmConfig.model,
-            messages=[
-                {"role": "system", "content": config.llmConfig.systemPrompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=config.llmConfig.temperature,
-            max_tokens=config.llmConfig.maxTokens
-        )
+        generated_content, usage = await _complete_content(req)
+        guardrail = check_content(generated_content)
+
+        if not guardrail["passed"] and GUARDRAIL_MODE == "block":
+            raise HTTPException(status_code=422, detail={"message": "Generated content failed guardrails", **guardrail})
 
-        generated_content = response.choices[0].message.content
+        # Only clean content is reused
+        if use_cache and generated_content and guardrail["passed"]:
+            await content_cache.add(cache_key, generated_content, usage)
 
         return {
             "variantId": req.variantId,
             "contentType": req.contentType,
             "content": generated_content,
-            "usage": {
-                "promptTokens": response.usage.prompt_tokens,
-                "completionTokens": response.usage.completion_tokens,
-                "totalTokens": response.usage.total_tokens
-            }
+            "usage": usage,
+            "cached": False,
+            "guardrail": guardrail
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Content generation failed: {str(e)}")
 
 
+# ============================================
+# Streaming Content Generation
+# ============================================
+
+# Rolling window of recent streamed generations (time to first token and
+# total time, in ms). Time to first token is what a landing page waits on.
+STREAM_TIMING_WINDOW = int(os.getenv("STREAM_TIMING_WINDOW", "1000"))
+stream_timings: deque = deque(maxlen=STREAM_TIMING_WINDOW)
+
+
+def _sse(event: str, payload: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 2)
+
+
+@app.post("/generate-content/stream")
+async def generate_content_stream(req: GenerateContentRequest) -> StreamingResponse:
+    """
+    Streaming variant of /generate-content.
+
+    Relays tokens as server-sent events as the model produces them:
+    ``meta`` once, ``delta`` per chunk (``{"text": ...}``), then ``done``
+    with the full content, usage and timing, or ``error`` if the model
+    call fails mid-stream. Cache hits are replayed as a single delta.
+    """
+    config = req.agentConfig
+    pregeneration_worker.observe(req.contentType, req.context)
+    use_cache = CONTENT_CACHE_ENABLED and req.useCache
+    cache_key = _content_cache_key(req)
+    cached = await content_cache.lookup(cache_key, refill=lambda: _refill_content(req)) if use_cache else None
+    system_prompt = await resolve_system_prompt(config.llmConfig) if cached is None else ""
+
+    async def event_stream():
+        started = time.perf_counter()
+        meta = {"variantId": req.variantId, "contentType": req.contentType, "cached": cached is not None}
+        yield _sse("meta", meta)
+
+        if cached is not None:
+            account_cache_hit(req)
+            elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+            yield _sse("delta", {"text": cached["content"]})
+            yield _sse("done", {
+                **meta,
+                "content": cached["content"],
+                "usage": usage_dict(),
+                "timing": {"firstTokenMs": elapsed_ms, "totalMs": elapsed_ms},
+                "guardrail": check_content(cached["content"])
+            })
+            return
+
+        parts: List[str] = []
+        usage = None
+        first_token_ms: Optional[float] = None
+        attempt = 0
+        while True:
+            try:
+                # A stream holds its governor slot until the last chunk
+                async with llm_governor.slot(PRIORITY_INTERACTIVE):
+                    stream = llm_provider.stream(
+                        model=config.llmConfig.model,
+                        messages=_content_messages(req, system_prompt),
+                        temperature=config.llmConfig.temperature,
+                        max_tokens=config.llmConfig.maxTokens
+                    )
+                    async for event in stream:
+                        if event.usage is not None:
+                            usage = event.usage
+                        if not event.text:
+                            continue
+                        if first_token_ms is None:
+                            first_token_ms = round((time.perf_counter() - started) * 1000, 2)
+                        parts.append(event.text)
+                        yield _sse("delta", {"text": event.text})
+                break
+            except Exception as e:
+                account_llm_call(req, error=True)
+                # Nothing sent yet, so a rate-limited stream can wait its turn and start over
+                if not parts and llm_governor.is_rate_limited(e) and attempt < llm_governor.max_retries:
+                    attempt += 1
+                    continue
+                logger.exception("Streaming content generation failed for %s: %s", req.variantId, e)
+                yield _sse("error", {**meta, "detail": f"Content generation failed: {str(e)}"})
+                return
+
+        generated_content = "".join(parts)
+        usage_payload = usage or usage_dict()
+        total_ms = round((time.perf_counter() - started) * 1000, 2)
+        if first_token_ms is None:
+            first_token_ms = total_ms
+        stream_timings.append((first_token_ms, total_ms))
+        account_llm_call(req, usage=usage_payload, latency_ms=total_ms)
+
+        guardrail = check_content(generated_content)
+        if not guardrail["passed"] and GUARDRAIL_MODE == "block":
+            # Deltas are already out; the client must discard them
+            yield _sse("error", {**meta, "detail": "Generated content failed guardrails", "guardrail": guardrail})
+            return
+
+        if use_cache and generated_content and guardrail["passed"]:
+            await content_cache.add(cache_key, generated_content, usage_payload)
+
+        yield _sse("done", {
+            **meta,
+            "content": generated_content,
+            "usage": usage_payload,
+            "timing": {"firstTokenMs": first_token_ms, "totalMs": total_ms},
+            "guardrail": guardrail
+        })
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/generate-content/stream/stats")
+async def generate_content_stream_stats() -> Dict[str, Any]:
+    """Time-to-first-token and total latency percentiles for recent streams."""
+    first_token = [t[0] for t in stream_timings]
+    total = [t[1] for t in stream_timings]
+    return {
+        "samples": len(stream_timings),
+        "firstTokenMs": {"p50": _percentile(first_token, 50), "p95": _percentile(first_token, 95), "p99": _percentile(first_token, 99)},
+        "totalMs": {"p50": _percentile(total, 50), "p95": _percentile(total, 95), "p99": _percentile(total, 99)}
+    }
+
+
+# ============================================
+# LLM Usage Accounting
+# ============================================
+
+# Tokens, latency, cache hits and errors per variant, rolled up per campaign
+# and agentType; deltas are flushed to Convex's llm_usage table
+LLM_USAGE_ENABLED = os.getenv("LLM_USAGE_ENABLED", "true").lower() == "true"
+LLM_USAGE_FLUSH_SECONDS = float(os.getenv("LLM_USAGE_FLUSH_SECONDS", "60"))
+LLM_USAGE_MAX_VARIANTS = int(os.getenv("LLM_USAGE_MAX_VARIANTS", "50000"))
+
+# Turned off once the Convex deployment answers 404 for /admin/recordLlmUsage
+_llm_usage_supported = True
+
+
+async def persist_llm_usage(batch_id: str, rows: List[Dict[str, Any]]) -> None:
+    """Add usage deltas to the llm_usage table; Convex skips batch ids it has applied, so retries are safe."""
+    global _llm_usage_supported
+    if not _llm_usage_supported:
+        return
+    try:
+        await call_convex_mutation("recordLlmUsage", {"batchId": batch_id, "rows": rows}, retry=True)
+    except httpx.HTTPStatusError as exc:
+        if exc.response.status_code != 404:
+            raise
+        _llm_usage_supported = False
+        logger.warning("Convex has no recordLlmUsage mutation; LLM usage is kept in memory only")
+
+
+async def resolve_llm_usage_variants(variant_ids: List[str]) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+    variants = await fetch_variants(variant_ids)
+    return {
+        variant_id: (variant.get("campaignId"), variant.get("agentType"))
+        for variant_id, variant in zip(variant_ids, variants)
+        if variant
+    }
+
+
+llm_usage = LLMAccounting(
+    persist=persist_llm_usage if os.getenv("CONVEX_HTTP_BASE") and LLM_USAGE_FLUSH_SECONDS > 0 else None,
+    resolve=resolve_llm_usage_variants if os.getenv("CONVEX_HTTP_BASE") else None,
+    flush_interval_seconds=LLM_USAGE_FLUSH_SECONDS,
+    flush_batch_size=CONVEX_BULK_CHUNK_SIZE,
+    max_variants=LLM_USAGE_MAX_VARIANTS,
+)
+
+
+def account_llm_call(
+    req: GenerateContentRequest,
+    *,
+    usage: Optional[Dict[str, int]] = None,
+    latency_ms: Optional[float] = None,
+    error: bool = False
+) -> None:
+    if LLM_USAGE_ENABLED:
+        llm_usage.record_call(
+            req.variantId,
+            campaign_id=req.campaignId,
+            agent_type=req.agentType,
+            usage=usage,
+            latency_ms=latency_ms,
+            error=error
+        )
+
+
+def account_cache_hit(req: GenerateContentRequest) -> None:
+    if LLM_USAGE_ENABLED:
+        llm_usage.record_cache_hit(req.variantId, campaign_id=req.campaignId, agent_type=req.agentType)
+
+
+@app.get("/llm-usage")
+async def llm_usage_report(
+    campaignId: Optional[str] = None,
+    agentType: Optional[str] = None,
+    variantId: Optional[str] = None,
+    sort: str = "totalTokens",
+    limit: int = 20
+) -> Dict[str, Any]:
+    """
+    LLM tokens, latency, cache hits and errors since startup: totals, per
+    campaign, per agentType and the top variants by `sort`.
+    """
+    if sort not in SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(SORT_KEYS)}")
+    report = llm_usage.snapshot(
+        campaign_id=campaignId,
+        agent_type=agentType,
+        variant_id=variantId,
+        sort=sort,
+        limit=max(0, min(limit, 500))
+    )
+    return {"enabled": LLM_USAGE_ENABLED, **report, "accounting": llm_usage.stats()}
+
+
+@app.post("/llm-usage/flush")
+async def flush_llm_usage() -> Dict[str, Any]:
+    """Write the usage recorded since the last flush to Convex now."""
+    if llm_usage.persist is None:
+        raise HTTPException(status_code=409, detail="LLM usage flushing is not configured")
+    return await llm_usage.flush()
+
+
+# ============================================
+# Content Pre-generation
+# ============================================
+
+PREGEN_ENABLED = os.getenv("PREGEN_ENABLED", "false").lower() == "true"
+PREGEN_INTERVAL_SECONDS = float(os.getenv("PREGEN_INTERVAL_SECONDS", "900"))
+PREGEN_TOP_K = int(os.getenv("PREGEN_TOP_K", "5"))
+PREGEN_MAX_BUCKETS = int(os.getenv("PREGEN_MAX_BUCKETS", "8"))
+PREGEN_CONCURRENCY = int(os.getenv("PREGEN_CONCURRENCY", "4"))
+PREGEN_TOKEN_BUDGET = int(os.getenv("PREGEN_TOKEN_BUDGET", "200000"))
+PREGEN_BUDGET_WINDOW_SECONDS = float(os.getenv("PREGEN_BUDGET_WINDOW_SECONDS", "3600"))
+# Buckets pre-generated before live traffic has been observed
+PREGEN_DEFAULT_BUCKETS = json.loads(os.getenv(
+    "PREGEN_DEFAULT_BUCKETS",
+    '[{"contentType": "headline", "context": {}}, {"contentType": "subhead", "context": {}}]'
+))
+
+
+def _pregeneration_request(variant: Dict[str, Any], content_type: str, context: Dict[str, Any]) -> GenerateContentRequest:
+    return GenerateContentRequest(
+        variantId=normalize_variant_id(variant),
+        agentConfig=variant["agentConfig"],
+        context=context,
+        contentType=content_type,
+        campaignId=variant.get("campaignId"),
+        agentType=variant.get("agentType")
+    )
+
+
+async def _pregeneration_campaigns() -> List[str]:
+    campaigns = await call_convex_query("queries:getRunningCampaigns", {})
+    return [c["_id"] for c in campaigns or [] if c.get("_id")]
+
+
+async def _pregeneration_top_variants(campaign_id: str, limit: int) -> List[Dict[str, Any]]:
+    return await call_convex_query("queries:getTopVariantsByTraffic", {"campaignId": campaign_id, "limit": limit}) or []
+
+
+async def _pregeneration_needed(variant: Dict[str, Any], content_type: str, context: Dict[str, Any]) -> int:
+    req = _pregeneration_request(variant, content_type, context)
+    # Refresh alternatives that would expire before the next pass
+    return await content_cache.missing(_content_cache_key(req), horizon_seconds=PREGEN_INTERVAL_SECONDS)
+
+
+async def _pregeneration_generate(variant: Dict[str, Any], content_type: str, context: Dict[str, Any]) -> int:
+    req = _pregeneration_request(variant, content_type, context)
+    # Alternatives for one key must be distinct generations, so no dedup here
+    content, usage = await _complete_content(req, priority=PRIORITY_PREGENERATION, dedup=False)
+    if content and check_content(content)["passed"]:
+        await content_cache.add(_content_cache_key(req), content, usage, horizon_seconds=PREGEN_INTERVAL_SECONDS)
+    return usage["totalTokens"]
+
+
+pregeneration_worker = PregenerationWorker(
+    list_campaigns=_pregeneration_campaigns,
+    top_variants=_pregeneration_top_variants,
+    needed=_pregeneration_needed,
+    generate_one=_pregeneration_generate,
+    top_k=PREGEN_TOP_K,
+    max_buckets=PREGEN_MAX_BUCKETS,
+    concurrency=PREGEN_CONCURRENCY,
+    token_budget=PREGEN_TOKEN_BUDGET,
+    budget_window_seconds=PREGEN_BUDGET_WINDOW_SECONDS,
+    interval_seconds=PREGEN_INTERVAL_SECONDS,
+    default_buckets=PREGEN_DEFAULT_BUCKETS,
+)
+
+
+@app.get("/llm-governor")
+async def llm_governor_stats() -> Dict[str, Any]:
+    """Concurrency limit, queue depth and wait times per priority for LLM calls."""
+    return llm_governor.stats()
+
+
+@app.get("/pregeneration")
+async def pregeneration_stats() -> Dict[str, Any]:
+    """Pre-generation worker status, token budget use and the buckets it fills."""
+    return {"enabled": PREGEN_ENABLED and CONTENT_CACHE_ENABLED, **pregeneration_worker.stats()}
+
+
+@app.post("/pregeneration/run")
+async def run_pregeneration() -> Dict[str, Any]:
+    """Run one pre-generation pass now and return its summary."""
+    if not CONTENT_CACHE_ENABLED:
+        raise HTTPException(status_code=409, detail="Content cache is disabled")
+    return await pregeneration_worker.run_once()
+
+
+# Results of /breed-agents calls made with an Idempotency-Key, so a retried
+# call returns the first call's offspring instead of breeding them again
+BREED_IDEMPOTENCY_TTL_SECONDS = float(os.getenv("BREED_IDEMPOTENCY_TTL_SECONDS", "3600"))
+BREED_IDEMPOTENCY_MAX_KEYS = int(os.getenv("BREED_IDEMPOTENCY_MAX_KEYS", "1000"))
+_breed_results: "OrderedDict[str, Tuple[float, asyncio.Task]]" = OrderedDict()
+
+
+async def run_idempotent_breed(key: str, req: BreedAgentsRequest) -> Dict[str, Any]:
+    """Run breed_agents once per key; repeats share the first call's result (or wait for it)."""
+    scoped = f"{req.campaignId}:{key}"
+    entry = _breed_results.get(scoped)
+    if entry is None or time.monotonic() - entry[0] >= BREED_IDEMPOTENCY_TTL_SECONDS:
+        task = asyncio.ensure_future(breed_agents(req))
+        _breed_results[scoped] = (time.monotonic(), task)
+
+        def forget_failure(done: asyncio.Task) -> None:
+            # Only successful breeds are remembered; a failed one may be retried for real
+            if (done.cancelled() or done.exception() is not None) and _breed_results.get(scoped, (0, None))[1] is done:
+                del _breed_results[scoped]
+
+        task.add_done_callback(forget_failure)
+        while len(_breed_results) > BREED_IDEMPOTENCY_MAX_KEYS:
+            _breed_results.popitem(last=False)
+    else:
+        task = entry[1]
+    # A caller that disconnects must not cancel the breed a retry will wait on
+    return await asyncio.shield(task)
+
+
 @app.post("/breed-agents")
+async def breed_agents_endpoint(
+    req: BreedAgentsRequest,
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+) -> Dict[str, Any]:
+    """
+    Breed new generation of agents from top performers. With an
+    Idempotency-Key header, repeating the call returns the first result.
+    """
+    if idempotency_key:
+        return await run_idempotent_breed(idempotency_key, req)
+    return await breed_agents(req)
+
+
 async def breed_agents(req: BreedAgentsRequest) -> Dict[str, Any]:
     """
     Breed new generation of agents from top performers.
@@ -564,28 +1412,33 @@ async def breed_agents(req: BreedAgentsRequest) -> Dict[str, Any]:
     if len(req.parentIds) < 2:
         raise HTTPException(status_code=400, detail="At least two parents are required for breeding")
 
-    try:
-        parent_variants = []
-        for parent_id in req.parentIds:
-            variant = await call_convex_query("queries:getVariantById", {"id": parent_id})
-            if not variant or not variant.get("agentConfig"):
-                raise HTTPException(status_code=404, detail=f"Variant {parent_id} missing agent configuration")
-            parent_variants.append(variant)
-    except HTTPException:
-        raise
-    except Exception as exc:
-        logger.exception("Failed to fetch parent variants: %s", exc)
+    # Parents and campaign stats are independent; load them together
+    parents_result, stats_result = await asyncio.gather(
+        fetch_variants(req.parentIds),
+        get_campaign_stats(req.campaignId),
+        return_exceptions=True,
+    )
+
+    if isinstance(parents_result, HTTPException):
+        raise parents_result
+    if isinstance(parents_result, Exception):
+        logger.error("Failed to fetch parent variants: %s", parents_result)
         raise HTTPException(status_code=500, detail="Failed to load parent variants")
 
+    parent_variants = []
+    for parent_id, variant in zip(req.parentIds, parents_result):
+        if not variant or not variant.get("agentConfig"):
+            raise HTTPException(status_code=404, detail=f"Variant {parent_id} missing agent configuration")
+        parent_variants.append(variant)
+
     if len(parent_variants) < 2:
         raise HTTPException(status_code=400, detail="Not enough valid parent variants found")
 
-    try:
-        campaign_stats = await call_convex_query("queries:getCampaignStats", {"campaignId": req.campaignId})
-        campaign = (campaign_stats or {}).get("campaign")
-    except Exception as exc:
-        logger.warning("Unable to fetch campaign stats for %s: %s", req.campaignId, exc)
+    if isinstance(stats_result, Exception):
+        logger.warning("Unable to fetch campaign stats for %s: %s", req.campaignId, stats_result)
         campaign = None
+    else:
+        campaign = (stats_result or {}).get("campaign")
 
     goal = (campaign or {}).get("goal") or {"type": "conversions", "target": 1}
 
@@ -595,6 +1448,7 @@ async def breed_agents(req: BreedAgentsRequest) -> Dict[str, Any]:
         grouped_parents[(variant["agentType"], variant["segment"])].append(variant)
 
     children: List[Dict[str, Any]] = []
+    child_variants: List[Dict[str, Any]] = []
 
     child_counter = 0
 
@@ -625,7 +1479,7 @@ async def breed_agents(req: BreedAgentsRequest) -> Dict[str, Any]:
                 "features": list(dict.fromkeys((product_info_1.get("features") or []) + (product_info_2.get("features") or []))),
             }
 
-            system_prompt = generate_system_prompt(
+            system_prompt = render_system_prompt(
                 agent_type=agent_type,
                 personality=personality,
                 strategy=strategy,
@@ -636,9 +1490,9 @@ async def breed_agents(req: BreedAgentsRequest) -> Dict[str, Any]:
             avg_temperature = (parent1_cfg.llmConfig.temperature + parent2_cfg.llmConfig.temperature) / 2
             max_tokens = min(parent1_cfg.llmConfig.maxTokens, parent2_cfg.llmConfig.maxTokens)
 
-            llm_config = LLMConfig(
+            llm_config = build_llm_config(
+                system_prompt,
                 model=parent1_cfg.llmConfig.model,
-                systemPrompt=system_prompt,
                 temperature=max(0.1, min(1.5, avg_temperature + random.uniform(-0.1, 0.1))),
                 maxTokens=max_tokens,
             )
@@ -662,22 +1516,18 @@ async def breed_agents(req: BreedAgentsRequest) -> Dict[str, Any]:
 
             payload = build_offspring_payload(parent1_variant, generation, product_info["name"])
 
-            try:
-                child_id = await call_convex_mutation("createVariant", {
-                    "campaignId": req.campaignId,
-                    "segment": segment,
-                    "agentType": agent_type,
-                    "payload": payload,
-                    "agentConfig": offspring_config.model_dump(),
-                    "name": f"{agent_type.title()} Agent Gen{generation}-{child_counter}",
-                    "active": True,
-                })
-            except Exception as exc:
-                logger.exception("Failed to create offspring variant: %s", exc)
-                raise HTTPException(status_code=500, detail="Failed to persist offspring variant")
+            child_variant = {
+                "campaignId": req.campaignId,
+                "segment": segment,
+                "agentType": agent_type,
+                "payload": payload,
+                "agentConfig": offspring_config.model_dump(exclude_none=True),
+                "name": f"{agent_type.title()} Agent Gen{generation}-{child_counter}",
+                "active": True,
+            }
 
+            child_variants.append(child_variant)
             children.append({
-                "variantId": normalize_variant_id(child_id),
                 "agentType": agent_type,
                 "segment": segment,
                 "generation": generation,
@@ -690,11 +1540,71 @@ async def breed_agents(req: BreedAgentsRequest) -> Dict[str, Any]:
     if not children:
         raise HTTPException(status_code=400, detail="No compatible parent pairs available for breeding")
 
+    # One guardrail pass over the whole cycle's copy before anything is written
+    if GUARDRAIL_MODE != "off":
+        issues = guardrails.validate_batch([v["payload"] for v in child_variants])
+    else:
+        issues = [[] for _ in child_variants]
+    rejected_agents = []
+    accepted = []
+    for index, child_issues in enumerate(issues):
+        children[index]["guardrail"] = {"passed": not has_errors(child_issues), "issues": child_issues}
+        if GUARDRAIL_MODE == "block" and has_errors(child_issues):
+            rejected_agents.append({"index": index, "name": child_variants[index]["name"], "issues": child_issues})
+        else:
+            accepted.append(index)
+    if not accepted:
+        raise HTTPException(status_code=422, detail={"message": "All offspring failed guardrails", "rejected": rejected_agents})
+
+    # Crossover with low mutation often reproduces a parent; such children are not new arms
+    verdicts, dedup_keys = await screen_near_duplicates([child_variants[i] for i in accepted])
+    duplicate_agents = []
+    kept = []
+    for index, verdict, key in zip(accepted, verdicts, dedup_keys):
+        if verdict is not None:
+            if "duplicateOfIndex" in verdict:
+                verdict["duplicateOfIndex"] = accepted[verdict["duplicateOfIndex"]]
+            children[index]["duplicate"] = verdict
+            duplicate_agents.append({"index": index, "name": child_variants[index]["name"], **verdict})
+            if NEAR_DUP_MODE == "reject":
+                continue
+        kept.append((index, key))
+
+    # Whole cycle in one bulk write, prompts first
+    to_persist = [child_variants[i] for i, _ in kept]
+    results: Optional[List[Dict[str, Any]]] = None
+    try:
+        await persist_prompts(to_persist)
+        results = await persist_variants(to_persist)
+    finally:
+        settle_near_duplicates(to_persist, [key for _, key in kept], results)
+
+    bred_agents = []
+    failed_agents = []
+    for (index, _), result in zip(kept, results):
+        if "id" in result:
+            bred_agents.append({"variantId": result["id"], **children[index]})
+        else:
+            failed_agents.append({"index": index, "name": child_variants[index]["name"], "error": result.get("error")})
+
+    if rejected_agents:
+        logger.warning("Guardrails rejected %d/%d offspring for %s", len(rejected_agents), len(children), req.campaignId)
+    if duplicate_agents:
+        logger.info("Near-duplicate screening (%s) matched %d/%d offspring for %s",
+                    NEAR_DUP_MODE, len(duplicate_agents), len(children), req.campaignId)
+    if failed_agents:
+        logger.warning("Failed to persist %d/%d offspring for %s", len(failed_agents), len(kept), req.campaignId)
+    if to_persist and not bred_agents:
+        raise HTTPException(status_code=500, detail={"message": "Failed to persist offspring variants", "failed": failed_agents})
+
     return {
         "campaignId": req.campaignId,
         "generation": generation,
-        "bred": len(children),
-        "agents": children,
+        "bred": len(bred_agents),
+        "agents": bred_agents,
+        "failed": failed_agents,
+        "rejected": rejected_agents,
+        "duplicates": duplicate_agents,
     }
 
 
@@ -737,9 +1647,6 @@ class Creative(BaseModel):
 @app.post("/campaigns")
 async def create_campaign(req: CreateCampaignRequest) -> Dict[str, Any]:
     """Create a new campaign."""
-    import time
-    import uuid
-
     # Generate campaign ID
     campaign_id = f"camp_{uuid.uuid4().hex[:12]}"
 
@@ -757,25 +1664,42 @@ async def create_campaign(req: CreateCampaignRequest) -> Dict[str, Any]:
         "agentsActive": 0
     }
 
-    # Store in memory
-    CAMPAIGNS_STORE[campaign_id] = campaign
-    VARIANTS_STORE[campaign_id] = []
+    await asyncio.to_thread(campaign_store.create_campaign, campaign)
 
     logger.info(f"Created campaign: {campaign_id} - {req.name}")
     return campaign
 
 
+def _paged(items: List[Dict[str, Any]], next_cursor: Optional[str], request: Request) -> Response:
+    """JSON array body (as before pagination), with the next page in X-Next-Cursor and Link."""
+    headers = {}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+    return FastJSONResponse(items, headers=headers)
+
+
 @app.get("/campaigns")
-async def list_campaigns() -> List[Dict[str, Any]]:
-    """List all campaigns."""
-    return list(CAMPAIGNS_STORE.values())
+async def list_campaigns(
+    request: Request,
+    status: Optional[str] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> Response:
+    """List campaigns, newest first; follow X-Next-Cursor (or the Link header) for more."""
+    try:
+        campaigns, next_cursor = await asyncio.to_thread(
+            campaign_store.list_campaigns, status, max(1, min(limit, 500)), cursor
+        )
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return _paged(campaigns, next_cursor, request)
 
 
 @app.post("/campaigns/{campaign_id}/deploy")
 async def deploy_campaign(campaign_id: str) -> Dict[str, Any]:
     """Deploy a campaign by creating initial agent variants."""
-    # Get campaign from in-memory store
-    campaign = CAMPAIGNS_STORE.get(campaign_id)
+    campaign = await asyncio.to_thread(campaign_store.get_campaign, campaign_id)
 
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
@@ -788,8 +1712,8 @@ async def deploy_campaign(campaign_id: str) -> Dict[str, Any]:
     }
 
     # Create 3 variants with different personalities
-    import uuid
     variants_created = []
+    created_at = int(time.time() * 1000)
 
     for i, segment in enumerate(campaign.get("segments", ["human"])):
         for j in range(3):  # 3 variants per segment
@@ -804,14 +1728,17 @@ async def deploy_campaign(campaign_id: str) -> Dict[str, Any]:
                 "clicks": 0,
                 "conversions": 0,
                 "ctr": 0.0,
-                "cvr": 0.0
+                "cvr": 0.0,
+                "createdAt": created_at
             }
-            VARIANTS_STORE[campaign_id].append(variant)
             variants_created.append(variant)
 
+    await asyncio.to_thread(campaign_store.add_variants, variants_created)
+
     # Update campaign status
-    campaign["status"] = "running"
-    campaign["agentsActive"] = len(variants_created)
+    await asyncio.to_thread(
+        campaign_store.update_campaign, campaign_id, status="running", agentsActive=len(variants_created)
+    )
 
     logger.info(f"Deployed campaign {campaign_id} with {len(variants_created)} variants")
 
@@ -825,22 +1752,52 @@ async def deploy_campaign(campaign_id: str) -> Dict[str, Any]:
 @app.post("/campaigns/{campaign_id}/pause")
 async def pause_campaign(campaign_id: str) -> Dict[str, bool]:
     """Pause a campaign."""
-    # In production, this would update campaign status in Convex
+    campaign = await asyncio.to_thread(campaign_store.update_campaign, campaign_id, status="paused")
+    if campaign is None:
+        raise HTTPException(status_code=404, detail="Campaign not found")
     return {"success": True}
 
 
 @app.post("/campaigns/{campaign_id}/resume")
 async def resume_campaign(campaign_id: str) -> Dict[str, bool]:
     """Resume a paused campaign."""
-    # In production, this would update campaign status in Convex
+    campaign = await asyncio.to_thread(campaign_store.update_campaign, campaign_id, status="running")
+    if campaign is None:
+        raise HTTPException(status_code=404, detail="Campaign not found")
     return {"success": True}
 
 
+@app.get("/campaigns/{campaign_id}/variants")
+async def list_campaign_variants(
+    campaign_id: str,
+    request: Request,
+    segment: Optional[str] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> Response:
+    """Variants created by deploying a campaign, newest first, with cursor pagination."""
+    try:
+        variants, next_cursor = await asyncio.to_thread(
+            campaign_store.list_variants, campaign_id, segment, max(1, min(limit, 500)), cursor
+        )
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return _paged(variants, next_cursor, request)
+
+
+async def get_campaign_stats(campaign_id: str) -> Optional[Dict[str, Any]]:
+    """queries:getCampaignStats through the campaign metrics cache."""
+    return await campaign_metrics_cache.get(
+        campaign_id,
+        lambda: call_convex_query("queries:getCampaignStats", {"campaignId": campaign_id})
+    )
+
+
 @app.get("/campaigns/{campaign_id}/metrics")
 async def get_campaign_metrics(campaign_id: str) -> Dict[str, Any]:
-    """Get metrics for a campaign."""
+    """Get metrics for a campaign (cached; see campaign_metrics_cache)."""
     try:
-        stats = await call_convex_query("queries:getCampaignStats", {"campaignId": campaign_id})
+        stats = await get_campaign_stats(campaign_id)
 
         if not stats:
             return {
@@ -875,6 +1832,23 @@ async def get_campaign_metrics(campaign_id: str) -> Dict[str, Any]:
         }
 
 
+@app.post("/campaigns/{campaign_id}/metrics/invalidate")
+async def invalidate_campaign_metrics(campaign_id: str) -> Dict[str, bool]:
+    """Drop a campaign's cached stats; called after its metrics are recalculated elsewhere."""
+    return {"invalidated": campaign_metrics_cache.invalidate(campaign_id) > 0}
+
+
+@app.post("/campaigns/{campaign_id}/metrics/recalculate")
+async def recalculate_campaign_metrics(campaign_id: str) -> Dict[str, Any]:
+    """Recalculate a campaign's agent metrics in Convex and drop its cached stats."""
+    try:
+        result = await call_convex_mutation("recalculateMetrics", {"campaignId": campaign_id}, retry=True)
+    finally:
+        # Even a failed call may have recalculated before the response was lost
+        campaign_metrics_cache.invalidate(campaign_id)
+    return result
+
+
 # ============================================
 # Agent Management Endpoints
 # ============================================
@@ -906,7 +1880,6 @@ async def list_agents(campaignId: Optional[str] = None) -> List[Dict[str, Any]]:
 async def create_agent_endpoint(campaignId: str, type: str) -> Dict[str, Any]:
     """Create a new agent for a campaign."""
     # Mock response
-    import time
     return {
         "id": f"agent_{int(time.time())}",
         "campaignId": campaignId,
@@ -936,7 +1909,6 @@ async def list_creatives(campaignId: Optional[str] = None) -> List[Dict[str, Any
     if not campaignId:
         return []
 
-    import time
     return [
         {
             "id": f"creative_{i}",
@@ -959,51 +1931,52 @@ async def list_creatives(campaignId: Optional[str] = None) -> List[Dict[str, Any
     ]
 
 
-async def generate_image_with_nano_banana(prompt: str, aspect_ratio: str = "16:9") -> Dict[str, str]:
-    """Generate image using Google Nano Banana (Gemini 2.5 Flash Image)"""
+async def generate_image_with_nano_banana(prompt: str, aspect_ratio: str = "16:9") -> Dict[str, Any]:
+    """Generate image using Google Nano Banana (Gemini 2.5 Flash Image); returns {"data": bytes, "mimeType"}."""
     import base64
-    import io
+
+    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-image:generateContent?key={GOOGLE_API_KEY}"
 
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-image:generateContent?key={GOOGLE_API_KEY}",
-                headers={"Content-Type": "application/json"},
-                json={
-                    "contents": [{
-                        "parts": [{"text": prompt}]
-                    }],
-                    "generationConfig": {
-                        "responseModalities": ["IMAGE"],
-                        "imageConfig": {
-                            "aspectRatio": aspect_ratio
-                        }
+        response = await get_http_client(url).post(
+            url,
+            timeout=60.0,
+            headers={"Content-Type": "application/json"},
+            json={
+                "contents": [{
+                    "parts": [{"text": prompt}]
+                }],
+                "generationConfig": {
+                    "responseModalities": ["IMAGE"],
+                    "imageConfig": {
+                        "aspectRatio": aspect_ratio
                     }
                 }
-            )
-
-            if response.status_code != 200:
-                logger.error(f"Nano Banana error: {response.text}")
-                raise HTTPException(status_code=500, detail=f"Image generation failed: {response.text}")
-
-            data = response.json()
-
-            # Extract base64 image from response
-            if "candidates" in data and len(data["candidates"]) > 0:
-                candidate = data["candidates"][0]
-                if "content" in candidate and "parts" in candidate["content"]:
-                    for part in candidate["content"]["parts"]:
-                        if "inlineData" in part:
-                            image_b64 = part["inlineData"]["data"]
-                            mime_type = part["inlineData"]["mimeType"]
+            }
+        )
 
-                            # Return as data URL
-                            return {
-                                "url": f"data:{mime_type};base64,{image_b64}",
-                                "mimeType": mime_type
-                            }
+        if response.status_code != 200:
+            logger.error(f"Nano Banana error: {response.text}")
+            raise HTTPException(status_code=500, detail=f"Image generation failed: {response.text}")
+
+        data = response.json()
+
+        # Extract base64 image from response
+        if "candidates" in data and len(data["candidates"]) > 0:
+            candidate = data["candidates"][0]
+            if "content" in candidate and "parts" in candidate["content"]:
+                for part in candidate["content"]["parts"]:
+                    if "inlineData" in part:
+                        image_b64 = part["inlineData"]["data"]
+                        mime_type = part["inlineData"]["mimeType"]
+
+                        # Decode once; the creative store keeps the bytes
+                        return {
+                            "data": base64.b64decode(image_b64),
+                            "mimeType": mime_type
+                        }
 
-            raise HTTPException(status_code=500, detail="No image data in response")
+        raise HTTPException(status_code=500, detail="No image data in response")
 
     except httpx.TimeoutException:
         raise HTTPException(status_code=504, detail="Image generation timed out")
@@ -1012,52 +1985,78 @@ async def generate_image_with_nano_banana(prompt: str, aspect_ratio: str = "16:9
         raise HTTPException(status_code=500, detail=f"Image generation failed: {str(e)}")
 
 
-@app.post("/creatives/generate")
-async def generate_creative(data: Dict[str, Any]) -> Dict[str, Any]:
-    """Generate a new creative using AI (Nano Banana for images)."""
-    import time
-    campaign_id = data.get("campaignId")
-    creative_type = data.get("type", "image")
-    prompt = data.get("prompt", "")
-    segment = data.get("segment", "human")
-    aspect_ratio = data.get("aspectRatio", "16:9")
+async def generate_image(prompt: str, aspect_ratio: str = "16:9") -> Dict[str, Any]:
+    """Generate an image with Nano Banana, or locally when the stub provider is selected."""
+    if isinstance(llm_provider, StubProvider):
+        return await llm_provider.generate_image(prompt, aspect_ratio)
+    return await generate_image_with_nano_banana(prompt, aspect_ratio)
+
+
+def creative_asset_base(request: Request) -> str:
+    return CREATIVE_PUBLIC_BASE_URL or str(request.base_url).rstrip("/")
+
 
-    creative_id = f"creative_{int(time.time())}"
+@app.get("/creatives/assets/{name}")
+async def get_creative_asset(name: str, request: Request) -> Response:
+    """Serve a stored creative by content hash, with ETag revalidation and range requests."""
+    located = creative_store.locate(name)
+    if located is None:
+        raise HTTPException(status_code=404, detail="Creative asset not found")
+    path, mime_type, digest = located
+
+    # Content-addressed, so the hash is a strong validator and the URL never goes stale
+    headers = {"ETag": f'"{digest}"', "Cache-Control": "public, max-age=31536000, immutable"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or headers["ETag"] in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=mime_type, headers=headers)
+
+
+async def build_creative(spec: Dict[str, Any], report: Callable[[int, str], None]) -> Dict[str, Any]:
+    """Generate one creative; runs on a creative job worker."""
+    creative_id = spec["creativeId"]
+    creative_type = spec.get("type", "image")
+    prompt = spec.get("prompt", "")
+    segment = spec.get("segment", "human")
 
     if creative_type == "image":
-        try:
+        aspect_ratio = spec.get("aspectRatio", "16:9")
+
+        async def create_image() -> Dict[str, Any]:
             # Generate real image with Nano Banana
-            image_data = await generate_image_with_nano_banana(prompt, aspect_ratio)
+            report(10, "generating")
+            image_data = await generate_image(prompt, aspect_ratio)
+            # Hashing, disk writes and thumbnailing stay off the event loop
+            report(80, "storing")
+            return await asyncio.to_thread(creative_store.put, image_data["data"], image_data["mimeType"])
+
+        generator = "stub" if isinstance(llm_provider, StubProvider) else "nano-banana"
+        asset, cached = await image_cache.get_or_create(
+            image_cache.make_key(prompt, aspect_ratio, generator),
+            create_image,
+            use_cache=spec.get("useCache", True),
+        )
+        base = spec["assetBaseUrl"]
 
-            return {
-                "id": creative_id,
-                "type": "image",
-                "url": image_data["url"],
-                "thumbnail": image_data["url"],  # Same as full image for now
-                "title": f"Nano Banana: {prompt[:50]}...",
-                "variant": "AI Generated",
-                "status": "ready",
-                "generatedBy": "Nano Banana (Gemini 2.5 Flash Image)",
-                "createdAt": int(time.time() * 1000),
-                "segment": segment,
-                "prompt": prompt
-            }
-        except Exception as e:
-            logger.error(f"Failed to generate image: {e}")
-            # Fall back to placeholder if generation fails
-            return {
-                "id": creative_id,
-                "type": "image",
-                "url": f"https://picsum.photos/seed/{creative_id}/800/450",
-                "thumbnail": f"https://picsum.photos/seed/{creative_id}/400/225",
-                "title": f"Failed: {prompt[:50]}...",
-                "variant": "Fallback",
-                "status": "error",
-                "generatedBy": "Fallback (Nano Banana failed)",
-                "createdAt": int(time.time() * 1000),
-                "segment": segment,
-                "error": str(e)
-            }
+        return {
+            "id": creative_id,
+            "type": "image",
+            "url": f"{base}/creatives/assets/{asset['name']}",
+            "thumbnail": f"{base}/creatives/assets/{asset['thumbnail']}",
+            "sha256": asset["sha256"],
+            "mimeType": asset["mimeType"],
+            "bytes": asset["bytes"],
+            "width": asset["width"],
+            "height": asset["height"],
+            "cached": cached,
+            "title": f"Nano Banana: {prompt[:50]}...",
+            "variant": "AI Generated",
+            "status": "ready",
+            "generatedBy": "Nano Banana (Gemini 2.5 Flash Image)",
+            "createdAt": int(time.time() * 1000),
+            "segment": segment,
+            "prompt": prompt
+        }
 
     # Video generation (placeholder for now - would use Veo2)
     return {
@@ -1074,6 +2073,122 @@ async def generate_creative(data: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
+# Creative generation runs on a bounded worker pool; requests get a job back
+creative_jobs = CreativeJobQueue(
+    build_creative,
+    workers=int(os.getenv("CREATIVE_JOB_WORKERS", "4")),
+    max_pending=int(os.getenv("CREATIVE_JOB_MAX_PENDING", "1000")),
+    retention=int(os.getenv("CREATIVE_JOB_RETENTION", "1000")),
+)
+CREATIVE_SYNC_TIMEOUT_SECONDS = float(os.getenv("CREATIVE_SYNC_TIMEOUT_SECONDS", "90"))
+
+
+def _creative_job_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        **job,
+        "statusUrl": f"/creatives/jobs/{job['id']}",
+        "eventsUrl": f"/creatives/jobs/{job['id']}/events",
+    }
+
+
+@app.post("/creatives/generate")
+async def generate_creative(data: Dict[str, Any], request: Request) -> Any:
+    """
+    Generate a new creative using AI (Nano Banana for images).
+
+    With "async": true the job is returned immediately (202); poll
+    /creatives/jobs/{id} or subscribe to /creatives/jobs/{id}/events. Otherwise
+    the request waits for the job and returns the creative as before.
+    """
+    spec = {
+        "creativeId": f"creative_{uuid.uuid4().hex[:12]}",
+        "campaignId": data.get("campaignId"),
+        "type": data.get("type", "image"),
+        "prompt": data.get("prompt", ""),
+        "segment": data.get("segment", "human"),
+        "aspectRatio": data.get("aspectRatio", "16:9"),
+        "useCache": data.get("useCache", True),
+        "assetBaseUrl": creative_asset_base(request),
+    }
+    try:
+        job = creative_jobs.submit(spec)
+    except QueueFullError as exc:
+        raise HTTPException(status_code=429, detail=str(exc), headers={"Retry-After": "5"})
+
+    if data.get("async"):
+        return FastJSONResponse(_creative_job_view(job), status_code=202)
+
+    try:
+        job = await creative_jobs.wait(job["id"], timeout=CREATIVE_SYNC_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        # The job keeps running; the caller can pick it up by id
+        return FastJSONResponse(_creative_job_view(creative_jobs.get(job["id"]) or job), status_code=202)
+
+    if job["status"] == "succeeded":
+        return job["result"]
+
+    logger.error(f"Failed to generate image: {job['error']}")
+    creative_id = spec["creativeId"]
+    prompt = spec["prompt"]
+    # Fall back to placeholder if generation fails
+    return {
+        "id": creative_id,
+        "type": "image",
+        "url": f"https://picsum.photos/seed/{creative_id}/800/450",
+        "thumbnail": f"https://picsum.photos/seed/{creative_id}/400/225",
+        "title": f"Failed: {prompt[:50]}...",
+        "variant": "Fallback",
+        "status": "error",
+        "generatedBy": "Fallback (Nano Banana failed)",
+        "createdAt": int(time.time() * 1000),
+        "segment": spec["segment"],
+        "error": job["error"]
+    }
+
+
+@app.get("/creatives/jobs")
+async def list_creative_jobs(campaignId: Optional[str] = None, limit: int = 100) -> Dict[str, Any]:
+    """Recent creative jobs, newest first, with worker pool counters."""
+    return {
+        **creative_jobs.stats(),
+        "jobs": [_creative_job_view(job) for job in creative_jobs.recent(campaignId, max(1, min(limit, 1000)))],
+    }
+
+
+@app.get("/creatives/jobs/{job_id}")
+async def get_creative_job(job_id: str) -> Dict[str, Any]:
+    """Current state of a creative job; "result" holds the creative once it succeeds."""
+    job = creative_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Creative job not found")
+    return _creative_job_view(job)
+
+
+@app.get("/creatives/jobs/{job_id}/events")
+async def creative_job_events(job_id: str) -> StreamingResponse:
+    """
+    Server-sent events for a creative job: "progress" on each state change,
+    then "done" (with the creative) or "error", after which the stream ends.
+    """
+    if creative_jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Creative job not found")
+
+    async def event_stream():
+        async for job in creative_jobs.subscribe(job_id):
+            if job["status"] == "succeeded":
+                yield _sse("done", _creative_job_view(job))
+            elif job["status"] == "failed":
+                yield _sse("error", _creative_job_view(job))
+            else:
+                yield _sse("progress", _creative_job_view(job))
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/creatives/{creative_id}/performance")
 async def get_creative_performance(creative_id: str) -> Dict[str, Any]:
     """Get performance metrics for a creative."""
@@ -1099,18 +2214,82 @@ async def chat(message: str, campaignId: Optional[str] = None) -> Dict[str, str]
         "Your human segment is outperforming the AI segment by 12%. Consider allocating more budget there."
     ]
 
-    import random
     return {
         "response": random.choice(responses)
     }
 
 
+@app.get("/prompts/stats")
+async def prompt_store_stats() -> Dict[str, Any]:
+    """Render-cache and interning counters for system prompts."""
+    return {"storePromptRefs": STORE_PROMPT_REFS and _prompt_refs_supported, **prompt_store.stats()}
+
+
+@app.get("/creatives/cache")
+async def image_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters and disk usage of the image dedup cache."""
+    return {"enabled": IMAGE_CACHE_ENABLED, **image_cache.stats(), "store": creative_store.stats()}
+
+
+class CreativeGCRequest(BaseModel):
+    keep: List[str] = []  # sha256 of every creative still referenced by variants or campaigns
+    minAgeSeconds: float = Field(default=7 * 86400, ge=0)
+    dryRun: bool = False
+
+
+@app.post("/creatives/gc")
+async def collect_creative_garbage(req: CreativeGCRequest) -> Dict[str, Any]:
+    """Delete stored creatives nobody references; images the dedup cache can still serve are kept."""
+    keep = set(req.keep) | image_cache.referenced()
+    return await asyncio.to_thread(creative_store.collect_garbage, keep, req.minAgeSeconds, req.dryRun)
+
+
+@app.get("/near-duplicates")
+async def near_duplicate_stats() -> Dict[str, Any]:
+    """Near-duplicate index size, LSH candidates per lookup and matches."""
+    return {"mode": NEAR_DUP_MODE, **near_duplicates.stats()}
+
+
+@app.get("/campaign-metrics/cache")
+async def campaign_metrics_cache_stats() -> Dict[str, Any]:
+    """Hit/miss, coalescing and refresh counters of the campaign stats cache."""
+    return campaign_metrics_cache.stats()
+
+
+@app.get("/content-cache")
+async def content_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters and sizing of the generated-content cache."""
+    return {"enabled": CONTENT_CACHE_ENABLED, **content_cache.stats()}
+
+
+async def startup_event() -> None:
+    """Start the creative job workers, LLM usage flushing, the content cache disk sweep and, when enabled, pre-generation."""
+    creative_jobs.start()
+    llm_usage.start()
+    if CONTENT_CACHE_ENABLED:
+        content_cache.start()
+    if PREGEN_ENABLED and CONTENT_CACHE_ENABLED:
+        pregeneration_worker.start()
+
+
+async def shutdown_event() -> None:
+    """Stop background workers, flush LLM usage and close the LLM provider, pooled connections and the campaign store."""
+    await pregeneration_worker.stop()
+    await content_cache.stop()
+    await creative_jobs.stop()
+    await llm_usage.stop()
+    await llm_provider.aclose()
+    await close_http_clients()
+    campaign_store.close()
+
+
 @app.get("/health")
 async def health() -> Dict[str, Any]:
     """Health check endpoint."""
     return {
         "status": "ok",
         "service": "agent-orchestrator",
+        "llm_provider": llm_provider.name,
         "openai_configured": bool(os.getenv("OPENAI_API_KEY")),
         "convex_configured": bool(os.getenv("CONVEX_HTTP_BASE"))
     }
@@ -0,0 +1,178 @@
+"""
+Persistent campaign and variant store for the orchestrator.
+
+SQLite in WAL mode, so state survives restarts and every worker process on
+a host shares one file: readers never block the writer. Rows keep the full
+record as JSON next to the indexed columns (campaign status and created
+time; variants by campaign, segment and created time). List calls use
+keyset pagination with an opaque cursor, so each page is an index range
+scan no matter how many rows precede it.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS campaigns (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS campaigns_by_created ON campaigns (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS campaigns_by_status_created ON campaigns (status, created_at DESC, id DESC);
+
+CREATE TABLE IF NOT EXISTS variants (
+    id TEXT PRIMARY KEY,
+    campaign_id TEXT NOT NULL,
+    segment TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS variants_by_campaign_created ON variants (campaign_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS variants_by_campaign_segment_created
+    ON variants (campaign_id, segment, created_at DESC, id DESC);
+"""
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at: int, row_id: str) -> str:
+    raw = json.dumps([created_at, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return int(created_at), str(row_id)
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor("Invalid cursor") from exc
+
+
+class CampaignStore:
+    """
+    Campaigns and variants in SQLite. Methods are blocking; the orchestrator
+    calls them through asyncio.to_thread. One connection per store, guarded
+    by a lock; other processes open their own.
+    """
+
+    def __init__(self, path: str, busy_timeout_ms: int = 5000) -> None:
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            # WAL + NORMAL: durable across process crashes, fsync only at checkpoints
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # Campaigns
+
+    def create_campaign(self, campaign: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO campaigns (id, status, created_at, data) VALUES (?, ?, ?, ?)",
+                (campaign["id"], campaign["status"], campaign["createdAt"], json.dumps(campaign)),
+            )
+
+    def get_campaign(self, campaign_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM campaigns WHERE id = ?", (campaign_id,)).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def update_campaign(self, campaign_id: str, **changes: Any) -> Optional[Dict[str, Any]]:
+        """Merge changes into a campaign atomically; returns the updated record, or None if missing."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT data FROM campaigns WHERE id = ?", (campaign_id,)).fetchone()
+                if row is None:
+                    self._conn.execute("ROLLBACK")
+                    return None
+                campaign = {**json.loads(row["data"]), **changes}
+                self._conn.execute(
+                    "UPDATE campaigns SET status = ?, data = ? WHERE id = ?",
+                    (campaign["status"], json.dumps(campaign), campaign_id),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return campaign
+
+    def list_campaigns(
+        self, status: Optional[str] = None, limit: int = 100, cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Newest first; returns (campaigns, next cursor or None)."""
+        where, params = [], []
+        if status is not None:
+            where.append("status = ?")
+            params.append(status)
+        return self._page("campaigns", where, params, limit, cursor)
+
+    # Variants
+
+    def add_variants(self, variants: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO variants (id, campaign_id, segment, created_at, data) VALUES (?, ?, ?, ?, ?)",
+                    [(v["id"], v["campaignId"], v["segment"], v["createdAt"], json.dumps(v)) for v in variants],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def list_variants(
+        self, campaign_id: str, segment: Optional[str] = None, limit: int = 100, cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Newest first; returns (variants, next cursor or None)."""
+        where, params = ["campaign_id = ?"], [campaign_id]
+        if segment is not None:
+            where.append("segment = ?")
+            params.append(segment)
+        return self._page("variants", where, params, limit, cursor)
+
+    def count_variants(self, campaign_id: str) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT COUNT(*) FROM variants WHERE campaign_id = ?", (campaign_id,)).fetchone()
+        return int(row[0])
+
+    # Internals
+
+    def _page(
+        self, table: str, where: List[str], params: List[Any], limit: int, cursor: Optional[str]
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        if cursor:
+            created_at, row_id = decode_cursor(cursor)
+            where = [*where, "(created_at, id) < (?, ?)"]
+            params = [*params, created_at, row_id]
+        sql = f"SELECT id, created_at, data FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        # One extra row tells whether another page exists
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(sql, [*params, limit + 1]).fetchall()
+        next_cursor = encode_cursor(rows[limit - 1]["created_at"], rows[limit - 1]["id"]) if len(rows) > limit else None
+        return [json.loads(row["data"]) for row in rows[:limit]], next_cursor
@@ -0,0 +1,294 @@
+"""
+Generated-content cache for /generate-content.
+
+Entries are keyed on a hash of the system prompt, content type, normalized
+context, temperature bucket and model; callers prompt with the same
+normalized context, so a cached alternative is one the request itself could
+have produced. Each key holds up to N alternatives so repeat requests can be
+served varied copy without calling the LLM. Any fresh alternative is served;
+a key that has fewer than N is topped up by one background generation at a
+time. Entries live in an LRU memory tier with an optional JSON-file disk
+tier behind it, whose expired files a background sweep removes.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("agent_orchestrator.content_cache")
+
+# Context keys that identify a request rather than describe the visitor
+VOLATILE_CONTEXT_KEYS = {"timestamp", "ts", "requestId", "reqId", "sessionId", "visitorId", "assignmentId", "nonce"}
+
+# Generates one more alternative for a key: (content, usage), or None to store nothing
+Refill = Callable[[], Awaitable[Optional[Tuple[str, Dict[str, Any]]]]]
+
+
+def normalize_context(value: Any) -> Any:
+    """Drop per-request keys, round floats and lowercase strings so equivalent contexts hash alike."""
+    if isinstance(value, dict):
+        return {
+            str(k): normalize_context(v)
+            for k, v in value.items()
+            if k not in VOLATILE_CONTEXT_KEYS and v is not None
+        }
+    if isinstance(value, (list, tuple)):
+        return [normalize_context(v) for v in value]
+    if isinstance(value, float):
+        return round(value, 2)
+    if isinstance(value, str):
+        return value.strip().lower()
+    return value
+
+
+def temperature_bucket(temperature: float, step: float) -> int:
+    return int(round(temperature / step)) if step > 0 else int(round(temperature * 100))
+
+
+class ContentCache:
+    """LRU + TTL cache of generated content with a per-key cap on alternatives."""
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        max_alternatives: int = 3,
+        ttl_seconds: float = 6 * 3600,
+        temperature_step: float = 0.1,
+        disk_dir: Optional[str] = None,
+        sweep_interval_seconds: float = 3600,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_alternatives = max(1, max_alternatives)
+        self.ttl_seconds = ttl_seconds
+        self.temperature_step = temperature_step
+        self.disk_dir = disk_dir
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._entries: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._refills: Dict[str, asyncio.Task] = {}
+        self._sweep_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.disk_errors = 0
+        self.refills = 0
+        self.refill_errors = 0
+        self.swept_files = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def make_key(
+        self,
+        system_prompt: str,
+        content_type: str,
+        context: Dict[str, Any],
+        temperature: float,
+        model: str,
+    ) -> str:
+        material = json.dumps(
+            {
+                "systemPrompt": system_prompt,
+                "contentType": content_type.strip().lower(),
+                "context": normalize_context(context or {}),
+                "temperature": temperature_bucket(temperature, self.temperature_step),
+                "model": model,
+            },
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    async def lookup(self, key: str, refill: Optional[Refill] = None) -> Optional[Dict[str, Any]]:
+        """
+        Return a random fresh alternative, or None when the key has none. If the
+        key is short of alternatives, ``refill`` is started in the background to
+        add one (unless a refill for the key is already running).
+        """
+        alternatives = await self._load(key)
+        if not alternatives:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if refill is not None and len(alternatives) < self.max_alternatives and key not in self._refills:
+            self._start_refill(key, refill)
+        return random.choice(alternatives)
+
+    async def missing(self, key: str, horizon_seconds: float = 0.0) -> int:
+        """How many alternatives the key still needs, counting only ones fresh for horizon_seconds."""
+        alternatives = self._fresh(await self._load(key), horizon_seconds)
+        return max(0, self.max_alternatives - len(alternatives))
+
+    async def add(
+        self,
+        key: str,
+        content: str,
+        usage: Optional[Dict[str, Any]] = None,
+        horizon_seconds: float = 0.0,
+    ) -> None:
+        """Store an alternative; with a horizon, ones expiring within it are replaced first."""
+        alternatives = await self._load(key)
+        if horizon_seconds:
+            alternatives = self._fresh(alternatives, horizon_seconds)
+        if len(alternatives) >= self.max_alternatives or any(a["content"] == content for a in alternatives):
+            return
+        alternatives.append({"content": content, "usage": usage or {}, "createdAt": time.time()})
+        self._remember(key, alternatives)
+        if self.disk_dir:
+            # The disk tier is best effort: a failed write must not fail the (paid for) generation
+            try:
+                await asyncio.to_thread(self._write_disk, key, list(alternatives))
+            except (OSError, TypeError, ValueError) as exc:
+                self.disk_errors += 1
+                logger.warning("Content cache disk write failed for %s: %s", key, exc)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def start(self) -> None:
+        """Start sweeping expired files from the disk tier, if there is one."""
+        if self.disk_dir and (self._sweep_task is None or self._sweep_task.done()):
+            self._sweep_task = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self) -> None:
+        """Stop the disk sweep and cancel running refills."""
+        tasks = list(self._refills.values())
+        if self._sweep_task is not None:
+            tasks.append(self._sweep_task)
+            self._sweep_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def sweep_disk(self) -> int:
+        """Delete disk-tier files whose alternatives have all expired; returns files removed."""
+        if not self.disk_dir:
+            return 0
+        # A file is rewritten on every add, so its mtime is its newest alternative's age
+        cutoff = time.time() - self.ttl_seconds
+        removed = 0
+        for shard in os.scandir(self.disk_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    if entry.is_file() and entry.stat().st_mtime < cutoff:
+                        os.unlink(entry.path)
+                        removed += 1
+                except OSError:
+                    continue
+        self.swept_files += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "maxAlternatives": self.max_alternatives,
+            "ttlSeconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "diskHits": self.disk_hits,
+            "diskErrors": self.disk_errors,
+            "refills": self.refills,
+            "refillErrors": self.refill_errors,
+            "refilling": len(self._refills),
+            "sweptFiles": self.swept_files,
+            "hitRate": self.hits / lookups if lookups else 0.0,
+            "diskTier": bool(self.disk_dir),
+        }
+
+    # Internals
+
+    def _start_refill(self, key: str, refill: Refill) -> None:
+        self.refills += 1
+        task = asyncio.create_task(self._refill(key, refill))
+        self._refills[key] = task
+        task.add_done_callback(lambda _: self._refills.pop(key, None))
+
+    async def _refill(self, key: str, refill: Refill) -> None:
+        try:
+            generated = await refill()
+        except Exception as exc:
+            # The request was already served from cache; only the top-up is lost
+            self.refill_errors += 1
+            logger.warning("Content cache refill failed for %s: %s", key, exc)
+            return
+        if generated is not None:
+            content, usage = generated
+            await self.add(key, content, usage)
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval_seconds)
+            try:
+                removed = await asyncio.to_thread(self.sweep_disk)
+                if removed:
+                    logger.info("Content cache swept %d expired files", removed)
+            except Exception as exc:
+                logger.warning("Content cache disk sweep failed: %s", exc)
+
+    def _fresh(self, alternatives: List[Dict[str, Any]], horizon_seconds: float = 0.0) -> List[Dict[str, Any]]:
+        cutoff = time.time() + horizon_seconds - self.ttl_seconds
+        return [a for a in alternatives if a.get("createdAt", 0) >= cutoff]
+
+    def _remember(self, key: str, alternatives: List[Dict[str, Any]]) -> None:
+        self._entries[key] = alternatives
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _load(self, key: str) -> List[Dict[str, Any]]:
+        alternatives = self._entries.get(key)
+        if alternatives is not None:
+            fresh = self._fresh(alternatives)
+            if fresh:
+                if len(fresh) != len(alternatives):
+                    self._entries[key] = fresh
+                self._entries.move_to_end(key)
+                return fresh
+            del self._entries[key]
+        if self.disk_dir:
+            fresh = self._fresh(await asyncio.to_thread(self._read_disk, key))
+            # A concurrent add may have filled the entry while the disk was read
+            current = self._entries.get(key)
+            if current is not None:
+                return self._fresh(current)
+            if fresh:
+                self.disk_hits += 1
+                self._remember(key, fresh)
+                return fresh
+        return []
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir or "", key[:2], f"{key}.json")
+
+    def _read_disk(self, key: str) -> List[Dict[str, Any]]:
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return []
+
+    def _write_disk(self, key: str, alternatives: List[Dict[str, Any]]) -> None:
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # A unique temp file per write, so concurrent writes of one key don't share it
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f"{key}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump(alternatives, fh)
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_path)
+            raise
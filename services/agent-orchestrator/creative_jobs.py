@@ -0,0 +1,180 @@
+"""
+Background job queue for creative generation.
+
+Submitting a creative returns a job immediately; a fixed pool of workers runs
+generation with bounded concurrency, and callers poll the job or subscribe
+to its updates (served as SSE by the orchestrator). Finished jobs are kept
+for a bounded number of entries so late pollers still see the result.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger("agent_orchestrator.creative_jobs")
+
+TERMINAL_STATUSES = {"succeeded", "failed"}
+
+# run(spec, report) -> result; report(progress 0-100, stage) publishes progress
+Report = Callable[[int, str], None]
+RunJob = Callable[[Dict[str, Any], Report], Awaitable[Dict[str, Any]]]
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class CreativeJobQueue:
+    """Bounded worker pool over an asyncio queue, with per-job subscribers."""
+
+    def __init__(self, run: RunJob, *, workers: int = 4, max_pending: int = 1000, retention: int = 1000) -> None:
+        self.run = run
+        self.worker_count = max(1, workers)
+        self.max_pending = max_pending
+        self.retention = retention
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._done_events: Dict[str, asyncio.Event] = {}
+        self.running = 0
+        self.succeeded = 0
+        self.failed = 0
+
+    # Lifecycle
+
+    def start(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < self.worker_count:
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    # Jobs
+
+    def submit(self, spec: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue a job and return its record; raises QueueFullError past max_pending."""
+        self.start()
+        if self._queue.qsize() >= self.max_pending:
+            raise QueueFullError(f"{self._queue.qsize()} creative jobs already pending")
+        job_id = f"job_{uuid.uuid4().hex[:16]}"
+        now = int(time.time() * 1000)
+        job = {
+            "id": job_id,
+            "status": "queued",
+            "stage": "queued",
+            "progress": 0,
+            "campaignId": spec.get("campaignId"),
+            "type": spec.get("type", "image"),
+            "createdAt": now,
+            "updatedAt": now,
+            "result": None,
+            "error": None,
+        }
+        self._jobs[job_id] = job
+        self._done_events[job_id] = asyncio.Event()
+        self._trim()
+        self._queue.put_nowait((job_id, spec))
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._jobs.get(job_id)
+
+    def recent(self, campaign_id: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        jobs = [job for job in reversed(self._jobs.values()) if campaign_id is None or job["campaignId"] == campaign_id]
+        return jobs[:limit]
+
+    async def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Wait for a job to finish and return its record (None if unknown)."""
+        event = self._done_events.get(job_id)
+        if event is not None:
+            await asyncio.wait_for(event.wait(), timeout)
+        return self._jobs.get(job_id)
+
+    async def subscribe(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the job's current state, then each update until it finishes."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        updates: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(updates)
+        try:
+            snapshot = dict(job)
+            yield snapshot
+            while snapshot["status"] not in TERMINAL_STATUSES:
+                snapshot = await updates.get()
+                yield snapshot
+        finally:
+            listeners = self._subscribers.get(job_id)
+            if listeners is not None:
+                listeners.discard(updates)
+                if not listeners:
+                    del self._subscribers[job_id]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.worker_count,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "running": self.running,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "tracked": len(self._jobs),
+        }
+
+    # Internals
+
+    def _update(self, job_id: str, **changes: Any) -> None:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        job.update(changes, updatedAt=int(time.time() * 1000))
+        for listener in self._subscribers.get(job_id, ()):
+            listener.put_nowait(dict(job))
+        if job["status"] in TERMINAL_STATUSES:
+            event = self._done_events.pop(job_id, None)
+            if event is not None:
+                event.set()
+
+    async def _worker(self) -> None:
+        while True:
+            job_id, spec = await self._queue.get()
+            self.running += 1
+            try:
+                self._update(job_id, status="running", stage="starting", progress=5)
+
+                def report(progress: int, stage: str, job_id: str = job_id) -> None:
+                    self._update(job_id, progress=progress, stage=stage)
+
+                result = await self.run(spec, report)
+                self.succeeded += 1
+                self._update(job_id, status="succeeded", stage="done", progress=100, result=result)
+            except asyncio.CancelledError:
+                self._update(job_id, status="failed", stage="cancelled", error="Worker stopped")
+                raise
+            except Exception as exc:
+                self.failed += 1
+                detail = exc.detail if hasattr(exc, "detail") else str(exc)
+                logger.warning("Creative job %s failed: %s", job_id, detail)
+                self._update(job_id, status="failed", stage="failed", error=str(detail) or type(exc).__name__)
+            finally:
+                self.running -= 1
+                self._queue.task_done()
+
+    def _trim(self) -> None:
+        # Drop the oldest finished jobs first; pending ones are never dropped
+        excess = len(self._jobs) - self.retention
+        if excess <= 0:
+            return
+        for job_id in [j for j, job in self._jobs.items() if job["status"] in TERMINAL_STATUSES][:excess]:
+            del self._jobs[job_id]
@@ -0,0 +1,217 @@
+"""
+Content-addressed store for generated creatives.
+
+Image bytes are decoded once and written to disk under their SHA-256, so a
+creative is stored once however often it is generated, and its URL never
+changes: responses carry short URLs instead of base64 data URLs, and the
+asset route can serve them with a strong ETag, range requests and
+immutable caching. Each image gets a downscaled thumbnail, itself stored by
+hash. A small JSON sidecar per image records its type, size and thumbnail.
+Nothing is deleted implicitly: since URLs are immutable, images only go
+through collect_garbage, given the set of images callers still reference.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger("agent_orchestrator.creative_store")
+
+MIME_EXTENSIONS = {
+    "image/png": "png",
+    "image/jpeg": "jpg",
+    "image/webp": "webp",
+    "image/gif": "gif",
+    "video/mp4": "mp4",
+}
+EXTENSION_MIMES = {ext: mime for mime, ext in MIME_EXTENSIONS.items()}
+
+_ASSET_NAME = re.compile(r"^([0-9a-f]{64})\.([a-z0-9]+)$")
+
+
+class CreativeStore:
+    """Creatives on disk by SHA-256, with thumbnails and metadata sidecars."""
+
+    def __init__(self, root: str, thumbnail_size: int = 400, thumbnail_quality: int = 80) -> None:
+        self.root = root
+        self.thumbnail_size = thumbnail_size
+        self.thumbnail_quality = thumbnail_quality
+        self.writes = 0
+        self.dedup_hits = 0
+        self.deletes = 0
+        os.makedirs(root, exist_ok=True)
+
+    # Writing
+
+    def put(self, data: bytes, mime_type: str) -> Dict[str, Any]:
+        """
+        Store bytes (no-op if already present) and return their metadata:
+        sha256, mimeType, bytes, name, width, height and thumbnail (a name).
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        existing = self._read_meta(digest)
+        if existing is not None:
+            self.dedup_hits += 1
+            # A re-stored image counts as new for garbage collection
+            try:
+                os.utime(self._meta_path(digest))
+            except OSError:
+                pass
+            return existing
+
+        name = f"{digest}.{MIME_EXTENSIONS.get(mime_type, 'bin')}"
+        self._write_atomic(self._blob_path(name), data)
+        meta: Dict[str, Any] = {
+            "sha256": digest,
+            "mimeType": mime_type,
+            "bytes": len(data),
+            "name": name,
+            "width": None,
+            "height": None,
+            "thumbnail": name,
+            "thumbnailBytes": 0,
+        }
+        if mime_type.startswith("image/"):
+            meta.update(self._make_thumbnail(data, name))
+        self._write_atomic(self._meta_path(digest), json.dumps(meta).encode("utf-8"))
+        self.writes += 1
+        return meta
+
+    # Reading
+
+    def exists(self, meta: Dict[str, Any]) -> bool:
+        return os.path.exists(self._blob_path(meta["name"]))
+
+    def delete(self, meta: Dict[str, Any], spare: Optional[Set[str]] = None) -> None:
+        """Remove an image, its thumbnail and its sidecar, except asset names in ``spare``."""
+        names = {meta["name"], meta["thumbnail"]} - (spare or set())
+        paths = {self._blob_path(name) for name in names} | {self._meta_path(meta["sha256"])}
+        for path in paths:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        self.deletes += 1
+
+    def collect_garbage(self, keep: Iterable[str], min_age_seconds: float = 7 * 86400, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Delete images whose sha256 is not in ``keep`` and that were last stored
+        more than min_age_seconds ago. Thumbnails a kept image shares are spared.
+        """
+        keep = set(keep)
+        cutoff = time.time() - min_age_seconds
+        kept = 0
+        kept_names: Set[str] = set()
+        doomed = []
+        for meta, mtime in self._sidecars():
+            if meta["sha256"] in keep or mtime > cutoff:
+                kept += 1
+                kept_names.update((meta["name"], meta["thumbnail"]))
+            else:
+                doomed.append(meta)
+        freed = 0
+        for meta in doomed:
+            freed += int(meta.get("bytes", 0)) + int(meta.get("thumbnailBytes", 0))
+            if not dry_run:
+                self.delete(meta, spare=kept_names)
+        return {"deleted": len(doomed), "bytesFreed": freed, "kept": kept, "dryRun": dry_run}
+
+    def locate(self, name: str) -> Optional[Tuple[str, str, str]]:
+        """(path, mime type, sha256) for an asset name like "<sha256>.png", or None."""
+        match = _ASSET_NAME.match(name)
+        if not match:
+            return None
+        path = self._blob_path(name)
+        if not os.path.exists(path):
+            return None
+        return path, EXTENSION_MIMES.get(match.group(2), "application/octet-stream"), match.group(1)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"root": self.root, "writes": self.writes, "dedupHits": self.dedup_hits, "deletes": self.deletes}
+
+    # Internals
+
+    def _make_thumbnail(self, data: bytes, name: str) -> Dict[str, Any]:
+        try:
+            from PIL import Image
+        except ImportError:
+            logger.warning("Pillow not installed; creatives use the full image as thumbnail")
+            return {}
+
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                width, height = image.size
+                image.thumbnail((self.thumbnail_size, self.thumbnail_size))
+                buffer = io.BytesIO()
+                if image.mode in ("RGBA", "LA", "P"):
+                    image.save(buffer, format="PNG", optimize=True)
+                    thumb_ext = "png"
+                else:
+                    image.convert("RGB").save(buffer, format="JPEG", quality=self.thumbnail_quality, optimize=True)
+                    thumb_ext = "jpg"
+        except Exception as exc:
+            logger.warning("Could not thumbnail creative %s: %s", name, exc)
+            return {}
+
+        thumb = buffer.getvalue()
+        # Small originals keep themselves as thumbnail
+        if len(thumb) >= len(data):
+            return {"width": width, "height": height}
+        thumb_name = f"{hashlib.sha256(thumb).hexdigest()}.{thumb_ext}"
+        path = self._blob_path(thumb_name)
+        if not os.path.exists(path):
+            self._write_atomic(path, thumb)
+        return {"width": width, "height": height, "thumbnail": thumb_name, "thumbnailBytes": len(thumb)}
+
+    def _blob_path(self, name: str) -> str:
+        return os.path.join(self.root, name[:2], name)
+
+    def _meta_path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], f"{digest}.json")
+
+    def _sidecars(self) -> Iterable[Tuple[Dict[str, Any], float]]:
+        """(metadata, sidecar mtime) for every stored image."""
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.name.endswith(".json") or entry.name.startswith("."):
+                    continue
+                try:
+                    with open(entry.path, "rb") as handle:
+                        meta = json.loads(handle.read())
+                    yield meta, entry.stat().st_mtime
+                except (OSError, ValueError):
+                    continue
+
+    def _read_meta(self, digest: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._meta_path(digest), "rb") as handle:
+                meta = json.loads(handle.read())
+        except (OSError, ValueError):
+            return None
+        return meta if os.path.exists(self._blob_path(meta["name"])) else None
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes) -> None:
+        # Readers only ever see complete files
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
@@ -0,0 +1,175 @@
+"""
+Guardrail validation for generated and bred copy.
+
+Python counterpart of generators/guardrails/policy.ts, with the same
+matching rule: a banned term is flagged wherever it occurs as a substring of
+the lowercased text, so "guarantee" flags "Results guaranteed" and "cure"
+flags "cured" (and "secure"). Terms are compiled once into an Aho-Corasick
+automaton over characters with fully resolved transitions, so scanning a
+text is one dictionary step per character, however many terms there are.
+Issues use the same {field, message, severity} shape as the TypeScript
+policy, reported on the field a term occurs in.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BANNED_TERMS = ("guarantee", "cure", "free forever")
+
+_HTTP_URL = re.compile(r"^https?://")
+
+Issue = Dict[str, str]
+
+
+class TermAutomaton:
+    """Aho-Corasick matcher over lowercase characters, compiled to a DFA."""
+
+    def __init__(self, terms: Iterable[str]) -> None:
+        self.terms: List[str] = []
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[int]] = [[]]
+        for term in dict.fromkeys(t.lower() for t in terms if t):
+            state = 0
+            for char in term:
+                nxt = goto[state].get(char)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][char] = nxt
+                    goto.append({})
+                    outputs.append([])
+                state = nxt
+            outputs[state].append(len(self.terms))
+            self.terms.append(term)
+
+        # Breadth-first: fold each state's failure transitions and outputs into it
+        fail = [0] * len(goto)
+        delta: List[Dict[str, int]] = [dict(goto[0])] + [{} for _ in range(len(goto) - 1)]
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            outputs[state] = outputs[state] + outputs[fail[state]]
+            delta[state] = {**delta[fail[state]], **goto[state]}
+            for char, nxt in goto[state].items():
+                fail[nxt] = delta[fail[state]].get(char, 0) if state else 0
+                queue.append(nxt)
+        self._delta = delta
+        self._outputs = [tuple((self.terms[i], len(self.terms[i])) for i in out) for out in outputs]
+
+    def find(self, text: str) -> List[Tuple[str, int]]:
+        """(term, index of its first character) for every occurrence in text, in order of where they end."""
+        if not self.terms:
+            return []
+        delta, outputs = self._delta, self._outputs
+        found: List[Tuple[str, int]] = []
+        state = 0
+        for end, char in enumerate(text.lower(), 1):
+            state = delta[state].get(char, 0)
+            if outputs[state]:
+                found.extend((term, end - length) for term, length in outputs[state])
+        return found
+
+
+class GuardrailEngine:
+    """Copy rules from policy.ts, with the banned-term scan done by one automaton."""
+
+    def __init__(
+        self,
+        banned_terms: Iterable[str] = DEFAULT_BANNED_TERMS,
+        *,
+        headline_min_length: int = 4,
+        subhead_max_length: int = 160,
+    ) -> None:
+        self.automaton = TermAutomaton(banned_terms)
+        self.headline_min_length = headline_min_length
+        self.subhead_max_length = subhead_max_length
+
+    def validate_text(self, text: str, field: str = "text") -> List[Issue]:
+        issues: List[Issue] = []
+        seen = set()
+        for term, _ in self.automaton.find(text or ""):
+            if term not in seen:
+                seen.add(term)
+                issues.append({"field": field, "message": f"contains banned term: {term}", "severity": "error"})
+        return issues
+
+    def validate_copy(self, copy: Dict[str, Any], prefix: str = "") -> List[Issue]:
+        """
+        validateCopy from policy.ts; banned terms are reported on the field
+        they occur in. policy.ts scans headline, subhead and bullets joined by
+        spaces, so a term spanning two of them is reported on "text".
+        """
+        issues: List[Issue] = []
+        headline = copy.get("headline")
+        if not isinstance(headline, str) or len(headline.strip()) < self.headline_min_length:
+            issues.append({"field": f"{prefix}headline", "message": "headline too short", "severity": "error"})
+        subhead = copy.get("subhead")
+        if isinstance(subhead, str) and len(subhead) > self.subhead_max_length:
+            issues.append({"field": f"{prefix}subhead", "message": "subhead too long", "severity": "warn"})
+
+        flagged = set()
+        for field, text in self._copy_texts(copy, prefix):
+            field_issues = self.validate_text(text, field)
+            flagged.update(issue["message"] for issue in field_issues)
+            issues.extend(field_issues)
+        joined = " ".join([
+            copy.get("headline") if isinstance(copy.get("headline"), str) else "",
+            copy.get("subhead") if isinstance(copy.get("subhead"), str) else "",
+            " ".join(b for b in copy.get("bullets") or [] if isinstance(b, str)),
+        ])
+        issues.extend(
+            issue for issue in self.validate_text(joined, f"{prefix}text") if issue["message"] not in flagged
+        )
+
+        cta = copy.get("cta")
+        if isinstance(cta, dict) and not _HTTP_URL.match(str(cta.get("url", ""))):
+            issues.append({"field": f"{prefix}cta.url", "message": "cta url must be http(s)", "severity": "error"})
+        return issues
+
+    def validate_agent_payload(self, agent: Any, prefix: str = "") -> List[Issue]:
+        """validateAgentPayload from policy.ts."""
+        if not isinstance(agent, dict):
+            return [{"field": f"{prefix}agent", "message": "missing agent payload", "severity": "error"}]
+        issues: List[Issue] = []
+        jsonld = agent.get("jsonld")
+        # Bred output may carry a string or list here; like policy.ts that is just a wrong context
+        context = jsonld.get("@context") if isinstance(jsonld, dict) else None
+        if jsonld and context != "https://schema.org":
+            issues.append({
+                "field": f"{prefix}agent.jsonld.@context",
+                "message": "jsonld context should be schema.org",
+                "severity": "warn",
+            })
+        return issues
+
+    def validate_variant_payload(self, payload: Dict[str, Any]) -> List[Issue]:
+        """A variant payload: human copy and/or an agent (JSON-LD) block."""
+        issues: List[Issue] = []
+        if isinstance(payload.get("human"), dict):
+            issues.extend(self.validate_copy(payload["human"], prefix="human."))
+        if "agent" in payload:
+            issues.extend(self.validate_agent_payload(payload["agent"]))
+        return issues
+
+    def validate_batch(self, payloads: List[Dict[str, Any]]) -> List[List[Issue]]:
+        return [self.validate_variant_payload(payload) for payload in payloads]
+
+    @staticmethod
+    def _copy_texts(copy: Dict[str, Any], prefix: str) -> List[Tuple[str, str]]:
+        texts = []
+        for field in ("headline", "subhead"):
+            if isinstance(copy.get(field), str):
+                texts.append((f"{prefix}{field}", copy[field]))
+        for index, bullet in enumerate(copy.get("bullets") or []):
+            if isinstance(bullet, str):
+                texts.append((f"{prefix}bullets[{index}]", bullet))
+        cta = copy.get("cta")
+        if isinstance(cta, dict) and isinstance(cta.get("label"), str):
+            texts.append((f"{prefix}cta.label", cta["label"]))
+        return texts
+
+
+def has_errors(issues: Optional[List[Issue]]) -> bool:
+    return any(issue["severity"] == "error" for issue in issues or [])
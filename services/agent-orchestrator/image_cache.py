@@ -0,0 +1,240 @@
+"""
+Prompt-hash dedup cache for generated images.
+
+Keyed on the normalized prompt, aspect ratio and generator. Each key holds
+up to N stored images (creative-store metadata); once a key has its full set,
+requests are served a random one without calling the image model. Identical
+requests arriving while an image is still being generated share it. Keys are
+evicted LRU-first when the cache exceeds its entry count or the byte budget
+of the images it indexes. Eviction only forgets the key: the images stay in
+the creative store, because their URLs were already handed out, and are
+removed by CreativeStore.collect_garbage against the set still referenced.
+The index is saved as JSON next to the images so it survives restarts; the
+save is best effort and a newer snapshot is never overwritten by an older
+one. A disabled cache only passes calls through to ``create``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from creative_store import CreativeStore
+
+logger = logging.getLogger("agent_orchestrator.image_cache")
+
+CreateImage = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+def normalize_prompt(prompt: str) -> str:
+    return re.sub(r"\s+", " ", prompt).strip().lower()
+
+
+class ImageDedupCache:
+    """LRU + byte-budget index from prompt keys to stored images."""
+
+    def __init__(
+        self,
+        store: CreativeStore,
+        *,
+        max_variants: int = 1,
+        max_entries: int = 5000,
+        max_bytes: int = 2 * 1024 ** 3,
+        index_path: Optional[str] = None,
+        enabled: bool = True,
+    ) -> None:
+        self.store = store
+        self.enabled = enabled
+        self.max_variants = max(1, max_variants)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.index_path = index_path
+        self._entries: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._refcounts: Dict[str, int] = {}
+        self._bytes = 0
+        self._pending: Dict[str, List[asyncio.Task]] = {}
+        # Index saves run on worker threads; versions keep an older snapshot from landing last
+        self._version = 0
+        self._saved_version = 0
+        self._save_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.index_errors = 0
+        if enabled:
+            self._load_index()
+
+    @staticmethod
+    def make_key(prompt: str, aspect_ratio: str, generator: str) -> str:
+        material = json.dumps([normalize_prompt(prompt), aspect_ratio.strip(), generator], separators=(",", ":"))
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    async def get_or_create(self, key: str, create: CreateImage, use_cache: bool = True) -> Tuple[Dict[str, Any], bool]:
+        """
+        Return (image metadata, cached). ``create`` generates and stores a new
+        image; it only runs when the key still needs variants or use_cache is off.
+        With use_cache off the new image replaces the key's oldest one.
+        """
+        if not self.enabled:
+            # Never touch the index, so turning the cache off can't evict stored creatives
+            self.misses += 1
+            return await create(), False
+        if use_cache:
+            variants = self._variants(key)
+            if len(variants) >= self.max_variants:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return random.choice(variants), True
+            pending = self._pending.get(key) or []
+            # Enough generations already under way to fill the key: share one
+            if pending and len(variants) + len(pending) >= self.max_variants:
+                self.coalesced += 1
+                return await asyncio.shield(random.choice(pending)), True
+        self.misses += 1
+
+        task = asyncio.ensure_future(create())
+        self._pending.setdefault(key, []).append(task)
+        try:
+            meta = await asyncio.shield(task)
+        finally:
+            pending = self._pending.get(key)
+            if pending is not None:
+                if task in pending:
+                    pending.remove(task)
+                if not pending:
+                    del self._pending[key]
+        # A forced regeneration replaces the key's oldest image
+        await self._add(key, meta, replace=not use_cache)
+        return meta, False
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "maxVariants": self.max_variants,
+            "bytes": self._bytes,
+            "maxBytes": self.max_bytes,
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hitRate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "indexErrors": self.index_errors,
+        }
+
+    def referenced(self) -> Set[str]:
+        """sha256 of every image the index can still serve."""
+        return set(self._refcounts)
+
+    # Internals
+
+    def _variants(self, key: str) -> List[Dict[str, Any]]:
+        variants = self._entries.get(key)
+        if not variants:
+            return []
+        # Images removed behind the cache's back no longer count
+        alive = [meta for meta in variants if self.store.exists(meta)]
+        if len(alive) != len(variants):
+            for meta in variants:
+                if meta not in alive:
+                    self._release(meta)
+            if alive:
+                self._entries[key] = alive
+            else:
+                del self._entries[key]
+        return alive
+
+    async def _add(self, key: str, meta: Dict[str, Any], replace: bool = False) -> None:
+        variants = self._entries.setdefault(key, [])
+        self._entries.move_to_end(key)
+        if any(v["sha256"] == meta["sha256"] for v in variants):
+            return
+        if len(variants) >= self.max_variants:
+            if not replace:
+                return
+            self._release(variants.pop(0))
+        variants.append(meta)
+        self._retain(meta)
+        self._evict()
+        # Snapshot on the loop; the thread only does file I/O
+        self._version += 1
+        snapshot = [(k, list(v)) for k, v in self._entries.items()]
+        await asyncio.to_thread(self._save_index, self._version, snapshot)
+
+    def _retain(self, meta: Dict[str, Any]) -> None:
+        count = self._refcounts.get(meta["sha256"], 0)
+        if count == 0:
+            self._bytes += self._size(meta)
+        self._refcounts[meta["sha256"]] = count + 1
+
+    def _release(self, meta: Dict[str, Any]) -> None:
+        count = self._refcounts.get(meta["sha256"], 0) - 1
+        if count > 0:
+            self._refcounts[meta["sha256"]] = count
+            return
+        self._refcounts.pop(meta["sha256"], None)
+        self._bytes -= self._size(meta)
+
+    def _evict(self) -> None:
+        # Always keep the most recent key, even if it alone exceeds the budget
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, variants = self._entries.popitem(last=False)
+            self.evictions += 1
+            for meta in variants:
+                self._release(meta)
+
+    @staticmethod
+    def _size(meta: Dict[str, Any]) -> int:
+        return int(meta.get("bytes", 0)) + int(meta.get("thumbnailBytes", 0))
+
+    def _load_index(self) -> None:
+        if not self.index_path:
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as handle:
+                saved = json.load(handle)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as exc:
+            logger.warning("Ignoring unreadable image cache index %s: %s", self.index_path, exc)
+            return
+        for key, variants in saved:
+            alive = [meta for meta in variants if self.store.exists(meta)]
+            if alive:
+                self._entries[key] = alive
+                for meta in alive:
+                    self._retain(meta)
+
+    def _save_index(self, version: int, snapshot: List[Tuple[str, List[Dict[str, Any]]]]) -> None:
+        if not self.index_path:
+            return
+        with self._save_lock:
+            if version <= self._saved_version:
+                return
+            tmp_path = None
+            try:
+                directory = os.path.dirname(self.index_path) or "."
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".index-")
+                with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                    json.dump(snapshot, handle)
+                os.replace(tmp_path, self.index_path)
+                self._saved_version = version
+            except (OSError, TypeError, ValueError) as exc:
+                # The image is stored either way; a stale index only costs a regeneration after restart
+                self.index_errors += 1
+                logger.warning("Could not save image cache index %s: %s", self.index_path, exc)
+                if tmp_path is not None:
+                    with contextlib.suppress(OSError):
+                        os.unlink(tmp_path)
@@ -0,0 +1,450 @@
+"""
+Token, latency and cache accounting for LLM calls.
+
+Every upstream LLM call and every content-cache hit is recorded against the
+variant it was made for, along with that variant's campaign and agentType.
+Counters live in memory, in a bounded LRU of variants, and are rolled up per
+campaign and per agentType when read. Deltas since the last flush are kept
+separately. A background task hands them to a persist callable every
+interval, in chunks. Each chunk carries a batch id, and a chunk that fails
+to persist is retried unchanged with the same id on later flushes, so a
+store that skips batch ids it has already applied never counts a delta
+twice, even when the failure came after the write committed. A flush that
+is cancelled (stop() during shutdown) keeps its unsent chunks the same way.
+Variants recorded without a campaign are looked up through a resolve
+callable at flush time, once per variant.
+
+Latency is recorded for successful calls only and kept as a fixed bucket
+histogram. Histograms merge by addition, so roll-ups and the persisted rows
+can report percentiles without keeping samples.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("agent_orchestrator.llm_accounting")
+
+# Upper bounds (ms) of the latency histogram buckets; one overflow bucket follows
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+
+# persist(batch id, rows); must ignore a batch id it has already applied
+Persist = Callable[[str, List[Dict[str, Any]]], Awaitable[None]]
+# variant ids -> {variant id: (campaign id, agentType)} for the ids that were found
+Resolve = Callable[[List[str]], Awaitable[Dict[str, Tuple[Optional[str], Optional[str]]]]]
+
+SORT_KEYS = ("totalTokens", "requests", "errors", "cacheHits", "latencyP95")
+
+# Lookups of a variant's campaign are given up after this many failed flushes
+_MAX_RESOLVE_ATTEMPTS = 3
+
+
+class UsageCounters:
+    """Additive counters for one variant, or a roll-up of several."""
+
+    __slots__ = (
+        "requests",
+        "errors",
+        "cache_hits",
+        "prompt_tokens",
+        "completion_tokens",
+        "latency_samples",
+        "latency_ms_total",
+        "latency_ms_max",
+        "latency_buckets",
+    )
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency_samples = 0
+        self.latency_ms_total = 0.0
+        self.latency_ms_max = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add_call(self, usage: Optional[Dict[str, int]], latency_ms: Optional[float], error: bool) -> None:
+        self.requests += 1
+        if error:
+            self.errors += 1
+        if usage:
+            self.prompt_tokens += usage.get("promptTokens", 0)
+            self.completion_tokens += usage.get("completionTokens", 0)
+        if latency_ms is not None and not error:
+            self.latency_samples += 1
+            self.latency_ms_total += latency_ms
+            self.latency_ms_max = max(self.latency_ms_max, latency_ms)
+            self.latency_buckets[bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+
+    def merge(self, other: "UsageCounters") -> None:
+        self.requests += other.requests
+        self.errors += other.errors
+        self.cache_hits += other.cache_hits
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.latency_samples += other.latency_samples
+        self.latency_ms_total += other.latency_ms_total
+        self.latency_ms_max = max(self.latency_ms_max, other.latency_ms_max)
+        buckets = self.latency_buckets
+        for index, count in enumerate(other.latency_buckets):
+            if count:
+                buckets[index] += count
+
+    def latency_percentile(self, pct: float) -> float:
+        """Upper bound of the bucket holding the percentile, capped at the observed max."""
+        if not self.latency_samples:
+            return 0.0
+        rank = pct / 100 * self.latency_samples
+        seen = 0
+        for index, count in enumerate(self.latency_buckets):
+            seen += count
+            if count and seen >= rank:
+                bound = LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else self.latency_ms_max
+                return round(min(bound, self.latency_ms_max), 2)
+        return round(self.latency_ms_max, 2)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "cacheHits": self.cache_hits,
+            "promptTokens": self.prompt_tokens,
+            "completionTokens": self.completion_tokens,
+            "totalTokens": self.total_tokens,
+            "latencyMs": {
+                "avg": round(self.latency_ms_total / self.latency_samples, 2) if self.latency_samples else 0.0,
+                "p50": self.latency_percentile(50),
+                "p95": self.latency_percentile(95),
+                "max": round(self.latency_ms_max, 2),
+            },
+        }
+
+    def to_row(self) -> Dict[str, Any]:
+        """Flat, additive form written to the metrics store."""
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "cacheHits": self.cache_hits,
+            "promptTokens": self.prompt_tokens,
+            "completionTokens": self.completion_tokens,
+            "totalTokens": self.total_tokens,
+            "latencySamples": self.latency_samples,
+            "latencyMsTotal": round(self.latency_ms_total, 2),
+            "latencyMsMax": round(self.latency_ms_max, 2),
+            "latencyBuckets": list(self.latency_buckets),
+        }
+
+    def sort_value(self, key: str) -> float:
+        if key == "latencyP95":
+            return self.latency_percentile(95)
+        return {
+            "totalTokens": self.total_tokens,
+            "requests": self.requests,
+            "errors": self.errors,
+            "cacheHits": self.cache_hits,
+        }[key]
+
+
+class _Variant:
+    __slots__ = ("campaign_id", "agent_type", "counters", "resolve_attempts")
+
+    def __init__(self, campaign_id: Optional[str], agent_type: Optional[str]) -> None:
+        self.campaign_id = campaign_id
+        self.agent_type = agent_type
+        self.counters = UsageCounters()
+        self.resolve_attempts = 0
+
+    def attribute(self, campaign_id: Optional[str], agent_type: Optional[str]) -> None:
+        if campaign_id:
+            self.campaign_id = campaign_id
+        if agent_type:
+            self.agent_type = agent_type
+
+
+class LLMAccounting:
+    """In-memory LLM usage per variant, with periodic flushes to a metrics store."""
+
+    def __init__(
+        self,
+        *,
+        persist: Optional[Persist] = None,
+        resolve: Optional[Resolve] = None,
+        flush_interval_seconds: float = 60.0,
+        flush_batch_size: int = 100,
+        max_variants: int = 50_000,
+    ) -> None:
+        self.persist = persist
+        self.resolve = resolve
+        self.flush_interval_seconds = flush_interval_seconds
+        self.flush_batch_size = max(1, flush_batch_size)
+        self.max_variants = max_variants
+
+        self._variants: "OrderedDict[str, _Variant]" = OrderedDict()
+        # Deltas not yet persisted; only kept when there is somewhere to persist them
+        self._pending: Dict[str, _Variant] = {}
+        # Chunks whose persist failed, as (batch id, rows); retried unchanged
+        self._unconfirmed: List[Tuple[str, List[Dict[str, Any]]]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self.started_at = time.time()
+
+        self.evictions = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.flush_failures = 0
+        self.flushed_rows = 0
+        self.last_flush_at: Optional[float] = None
+
+    # Recording
+
+    def record_call(
+        self,
+        variant_id: str,
+        *,
+        campaign_id: Optional[str] = None,
+        agent_type: Optional[str] = None,
+        usage: Optional[Dict[str, int]] = None,
+        latency_ms: Optional[float] = None,
+        error: bool = False,
+    ) -> None:
+        """Count one upstream LLM call (a failed one with error=True)."""
+        for entry in self._entries(variant_id, campaign_id, agent_type):
+            entry.counters.add_call(usage, latency_ms, error)
+
+    def record_cache_hit(
+        self,
+        variant_id: str,
+        *,
+        campaign_id: Optional[str] = None,
+        agent_type: Optional[str] = None,
+    ) -> None:
+        """Count a request served from the content cache."""
+        for entry in self._entries(variant_id, campaign_id, agent_type):
+            entry.counters.cache_hits += 1
+
+    def _entries(self, variant_id: str, campaign_id: Optional[str], agent_type: Optional[str]) -> List[_Variant]:
+        entry = self._variants.get(variant_id)
+        if entry is None:
+            entry = self._variants[variant_id] = _Variant(campaign_id, agent_type)
+            while len(self._variants) > self.max_variants:
+                self._variants.popitem(last=False)
+                self.evictions += 1
+        else:
+            entry.attribute(campaign_id, agent_type)
+            self._variants.move_to_end(variant_id)
+        if self.persist is None:
+            return [entry]
+        pending = self._pending.get(variant_id)
+        if pending is None:
+            pending = self._pending[variant_id] = _Variant(entry.campaign_id, entry.agent_type)
+        else:
+            pending.attribute(campaign_id, agent_type)
+        return [entry, pending]
+
+    # Reading
+
+    def snapshot(
+        self,
+        *,
+        campaign_id: Optional[str] = None,
+        agent_type: Optional[str] = None,
+        variant_id: Optional[str] = None,
+        sort: str = "totalTokens",
+        limit: int = 20,
+    ) -> Dict[str, Any]:
+        """
+        Totals, roll-ups per campaign and agentType, and the top `limit`
+        variants by `sort` (one of SORT_KEYS), over the matching variants.
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"sort must be one of {', '.join(SORT_KEYS)}")
+        totals = UsageCounters()
+        campaigns: Dict[Optional[str], UsageCounters] = {}
+        agent_types: Dict[Optional[str], UsageCounters] = {}
+        variants: List[Tuple[str, _Variant]] = []
+        for vid, entry in self._variants.items():
+            if variant_id is not None and vid != variant_id:
+                continue
+            if campaign_id is not None and entry.campaign_id != campaign_id:
+                continue
+            if agent_type is not None and entry.agent_type != agent_type:
+                continue
+            totals.merge(entry.counters)
+            campaigns.setdefault(entry.campaign_id, UsageCounters()).merge(entry.counters)
+            agent_types.setdefault(entry.agent_type, UsageCounters()).merge(entry.counters)
+            variants.append((vid, entry))
+
+        def ranked(groups: Dict[Optional[str], UsageCounters], key: str) -> List[Dict[str, Any]]:
+            ordered = sorted(groups.items(), key=lambda item: item[1].sort_value(sort), reverse=True)
+            return [{key: name, **counters.to_dict()} for name, counters in ordered]
+
+        variants.sort(key=lambda item: item[1].counters.sort_value(sort), reverse=True)
+        return {
+            "since": self.started_at,
+            "variantCount": len(variants),
+            "totals": totals.to_dict(),
+            "byCampaign": ranked(campaigns, "campaignId"),
+            "byAgentType": ranked(agent_types, "agentType"),
+            "variants": [
+                {
+                    "variantId": vid,
+                    "campaignId": entry.campaign_id,
+                    "agentType": entry.agent_type,
+                    **entry.counters.to_dict(),
+                }
+                for vid, entry in variants[:max(0, limit)]
+            ],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "variants": len(self._variants),
+            "pendingVariants": len(self._pending),
+            "unconfirmedBatches": len(self._unconfirmed),
+            "evictions": self.evictions,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "flushFailures": self.flush_failures,
+            "flushedRows": self.flushed_rows,
+            "lastFlushAt": self.last_flush_at,
+            "flushIntervalSeconds": self.flush_interval_seconds,
+        }
+
+    # Flushing
+
+    async def flush(self) -> Dict[str, Any]:
+        """
+        Persist unconfirmed chunks from earlier flushes, then the deltas
+        recorded since the last flush; returns rows written and failed.
+        """
+        async with self._flush_lock:
+            if self.persist is None or not (self._pending or self._unconfirmed):
+                return {"written": 0, "failed": 0}
+            batches, self._unconfirmed = self._unconfirmed, []
+            pending, self._pending = self._pending, {}
+            try:
+                await self._resolve(pending)
+            except BaseException:
+                self._unconfirmed[:0] = batches
+                self._restore(pending)
+                raise
+            items = list(pending.items())
+            for start in range(0, len(items), self.flush_batch_size):
+                rows = [
+                    {
+                        "variantId": vid,
+                        "campaignId": entry.campaign_id,
+                        "agentType": entry.agent_type,
+                        **entry.counters.to_row(),
+                    }
+                    for vid, entry in items[start:start + self.flush_batch_size]
+                ]
+                batches.append((uuid.uuid4().hex, rows))
+            written = failed = done = 0
+            try:
+                for batch_id, rows in batches:
+                    try:
+                        await self.persist(batch_id, rows)
+                        written += len(rows)
+                    except Exception as exc:
+                        # The write may have committed; only a retry with the same batch id is safe
+                        logger.warning("LLM usage flush of batch %s (%d variants) failed, will retry: %s", batch_id, len(rows), exc)
+                        self._unconfirmed.append((batch_id, rows))
+                        failed += len(rows)
+                    done += 1
+            except BaseException:
+                # Cancelled: the chunk in flight and the ones after it are retried like failed ones
+                self._unconfirmed.extend(batches[done:])
+                self.flushed_rows += written
+                raise
+            self._bound_unconfirmed()
+            self.flushes += 1
+            self.flushed_rows += written
+            if failed:
+                self.flush_failures += 1
+            self.last_flush_at = time.time()
+            return {"written": written, "failed": failed}
+
+    def _restore(self, pending: Dict[str, _Variant]) -> None:
+        """Put deltas taken by an interrupted flush back, ahead of what was recorded since."""
+        for vid, entry in pending.items():
+            newer = self._pending.get(vid)
+            if newer is not None:
+                entry.counters.merge(newer.counters)
+                entry.attribute(newer.campaign_id, newer.agent_type)
+            self._pending[vid] = entry
+
+    def _bound_unconfirmed(self) -> None:
+        # Bound what an unreachable store can pile up; the oldest batches go first
+        rows = sum(len(batch) for _, batch in self._unconfirmed)
+        while self._unconfirmed and rows > self.max_variants:
+            _, dropped = self._unconfirmed.pop(0)
+            rows -= len(dropped)
+            self.dropped += len(dropped)
+
+    async def _resolve(self, pending: Dict[str, _Variant]) -> None:
+        if self.resolve is None:
+            return
+        ids = [
+            vid for vid, entry in pending.items()
+            if entry.campaign_id is None and self._resolve_attempts(vid) < _MAX_RESOLVE_ATTEMPTS
+        ]
+        if not ids:
+            return
+        try:
+            found = await self.resolve(ids)
+        except Exception as exc:
+            logger.warning("Could not look up campaigns for %d variants: %s", len(ids), exc)
+            found = {}
+        for vid in ids:
+            campaign_id, agent_type = found.get(vid) or (None, None)
+            pending[vid].attribute(campaign_id, agent_type)
+            tracked = self._variants.get(vid)
+            if tracked is not None:
+                tracked.attribute(campaign_id, agent_type)
+                tracked.resolve_attempts += 1
+
+    def _resolve_attempts(self, variant_id: str) -> int:
+        tracked = self._variants.get(variant_id)
+        return tracked.resolve_attempts if tracked is not None else 0
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.exception("LLM usage flush failed: %s", exc)
+
+    def start(self) -> None:
+        if self.persist is not None and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Stop the flush loop and flush what is left."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as exc:
+            logger.warning("Final LLM usage flush failed: %s", exc)
@@ -0,0 +1,269 @@
+"""
+Concurrency governor for LLM calls.
+
+Sits in front of the LLM client and:
+- admits calls under an adaptive concurrency limit (AIMD: additive increase
+  after a limit's worth of successes, multiplicative decrease on rate limits),
+- pauses dispatch after a rate limit (Retry-After when the provider sends it)
+  and retries rate-limited calls itself instead of letting every caller retry,
+- serves waiters from priority queues so interactive traffic goes first,
+- collapses identical concurrent calls onto one upstream request.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+logger = logging.getLogger("agent_orchestrator.llm_governor")
+
+T = TypeVar("T")
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_PREGENERATION = 1
+PRIORITY_BACKGROUND = 2
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_PREGENERATION: "pregeneration",
+    PRIORITY_BACKGROUND: "background",
+}
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 2)
+
+
+class _Waiter:
+    __slots__ = ("priority", "future", "enqueued_at")
+
+    def __init__(self, priority: int) -> None:
+        self.priority = priority
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.perf_counter()
+
+
+class LLMGovernor:
+    """Adaptive, prioritized admission control for LLM calls."""
+
+    def __init__(
+        self,
+        *,
+        initial_concurrency: int = 8,
+        min_concurrency: int = 1,
+        max_concurrency: int = 64,
+        decrease_factor: float = 0.5,
+        cooldown_seconds: float = 1.0,
+        max_retries: int = 2,
+        is_rate_limited: Callable[[Exception], bool] = lambda exc: getattr(exc, "status_code", None) == 429,
+        retry_after: Callable[[Exception], Optional[float]] = lambda exc: None,
+        wait_window: int = 1000,
+    ) -> None:
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.limit = min(self.max_concurrency, max(self.min_concurrency, initial_concurrency))
+        self.decrease_factor = decrease_factor
+        self.cooldown_seconds = cooldown_seconds
+        self.max_retries = max_retries
+        self.is_rate_limited = is_rate_limited
+        self.retry_after = retry_after
+
+        self.in_flight = 0
+        self._queue: List[Tuple[int, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self._queued: Dict[int, int] = {p: 0 for p in PRIORITY_NAMES}
+        self._successes_since_change = 0
+        self._last_decrease = 0.0
+        self._paused_until = 0.0
+        self._resume_handle: Optional[asyncio.TimerHandle] = None
+        self._inflight_calls: Dict[Any, Tuple[asyncio.Task, List[_Waiter]]] = {}
+        self._waits: Dict[int, Deque[float]] = {p: deque(maxlen=wait_window) for p in PRIORITY_NAMES}
+
+        self.completed = 0
+        self.failed = 0
+        self.rate_limited = 0
+        self.retried = 0
+        self.deduplicated = 0
+
+    # Public API
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[T]],
+        *,
+        priority: int = PRIORITY_INTERACTIVE,
+        dedup_key: Any = None,
+    ) -> T:
+        """
+        Run ``call`` under the governor. Calls sharing a ``dedup_key`` while one
+        is pending share its result; a higher-priority joiner promotes the
+        queued call to its own priority.
+        """
+        if dedup_key is not None:
+            shared = self._inflight_calls.get(dedup_key)
+            if shared is not None:
+                task, waiters = shared
+                self.deduplicated += 1
+                for waiter in waiters:
+                    self._promote(waiter, priority)
+                return await asyncio.shield(task)
+            waiters: List[_Waiter] = []
+            task = asyncio.ensure_future(self._run_with_retries(call, priority, waiters))
+            self._inflight_calls[dedup_key] = (task, waiters)
+            task.add_done_callback(lambda _: self._inflight_calls.pop(dedup_key, None))
+            return await asyncio.shield(task)
+        return await self._run_with_retries(call, priority, [])
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_INTERACTIVE) -> AsyncIterator[None]:
+        """Hold one concurrency slot for a body that cannot be retried (e.g. a stream)."""
+        await self._acquire(priority, [])
+        try:
+            yield
+        except Exception as exc:
+            self._release(exc)
+            raise
+        except BaseException:
+            self._release(None, count=False)
+            raise
+        else:
+            self._release(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "minConcurrency": self.min_concurrency,
+            "maxConcurrency": self.max_concurrency,
+            "inFlight": self.in_flight,
+            "queueDepth": {PRIORITY_NAMES[p]: n for p, n in self._queued.items()},
+            "waitMs": {
+                PRIORITY_NAMES[p]: {
+                    "samples": len(waits),
+                    "p50": _percentile(list(waits), 50),
+                    "p95": _percentile(list(waits), 95),
+                    "p99": _percentile(list(waits), 99),
+                }
+                for p, waits in self._waits.items()
+            },
+            "pausedForMs": max(0.0, round((self._paused_until - time.monotonic()) * 1000, 2)),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rateLimited": self.rate_limited,
+            "retried": self.retried,
+            "deduplicated": self.deduplicated,
+        }
+
+    # Internals
+
+    async def _run_with_retries(self, call: Callable[[], Awaitable[T]], priority: int, waiters: List[_Waiter]) -> T:
+        attempt = 0
+        while True:
+            await self._acquire(priority, waiters)
+            try:
+                result = await call()
+            except Exception as exc:
+                self._release(exc)
+                if self.is_rate_limited(exc) and attempt < self.max_retries:
+                    attempt += 1
+                    self.retried += 1
+                    continue
+                raise
+            except BaseException:
+                self._release(None, count=False)
+                raise
+            self._release(None)
+            return result
+
+    async def _acquire(self, priority: int, waiters: List[_Waiter]) -> None:
+        if not self._queue and self.in_flight < self.limit and not self._paused():
+            self.in_flight += 1
+            self._record_wait(priority, 0.0)
+            return
+        waiter = _Waiter(priority)
+        waiters.append(waiter)
+        self._push(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Slot was granted as we were cancelled; hand it on
+                self.in_flight -= 1
+                self._dispatch()
+            else:
+                self._queued[waiter.priority] -= 1
+            raise
+        finally:
+            waiters.remove(waiter)
+
+    def _push(self, waiter: _Waiter) -> None:
+        self._queued[waiter.priority] += 1
+        heapq.heappush(self._queue, (waiter.priority, next(self._seq), waiter))
+        self._dispatch()
+
+    def _promote(self, waiter: _Waiter, priority: int) -> None:
+        if priority >= waiter.priority or waiter.future.done():
+            return
+        # The old heap entry becomes stale and is skipped when popped
+        self._queued[waiter.priority] -= 1
+        waiter.priority = priority
+        self._push(waiter)
+
+    def _paused(self) -> bool:
+        return time.monotonic() < self._paused_until
+
+    def _dispatch(self) -> None:
+        if self._paused():
+            return
+        while self._queue and self.in_flight < self.limit:
+            priority, _, waiter = heapq.heappop(self._queue)
+            if priority != waiter.priority or waiter.future.done():
+                continue
+            self._queued[priority] -= 1
+            self.in_flight += 1
+            self._record_wait(priority, (time.perf_counter() - waiter.enqueued_at) * 1000)
+            waiter.future.set_result(None)
+
+    def _release(self, exc: Optional[Exception], count: bool = True) -> None:
+        self.in_flight -= 1
+        if exc is None:
+            if count:
+                self.completed += 1
+                self._successes_since_change += 1
+                if self._successes_since_change >= self.limit and self.limit < self.max_concurrency:
+                    self.limit += 1
+                    self._successes_since_change = 0
+        elif self.is_rate_limited(exc):
+            self.rate_limited += 1
+            self._on_rate_limited(exc)
+        else:
+            self.failed += 1
+        self._dispatch()
+
+    def _on_rate_limited(self, exc: Exception) -> None:
+        now = time.monotonic()
+        # One decrease per cooldown: a burst of 429s reflects a single overload
+        if now - self._last_decrease >= self.cooldown_seconds:
+            self.limit = max(self.min_concurrency, int(self.limit * self.decrease_factor))
+            self._last_decrease = now
+            logger.warning("LLM rate limited; concurrency limit now %d", self.limit)
+        self._successes_since_change = 0
+
+        pause = self.retry_after(exc) or self.cooldown_seconds
+        self._paused_until = max(self._paused_until, now + pause)
+        if self._resume_handle is not None:
+            self._resume_handle.cancel()
+        self._resume_handle = asyncio.get_running_loop().call_at(
+            asyncio.get_running_loop().time() + (self._paused_until - now), self._dispatch
+        )
+
+    def _record_wait(self, priority: int, wait_ms: float) -> None:
+        self._waits[priority].append(wait_ms)
@@ -0,0 +1,294 @@
+"""
+LLM provider interface for the orchestrator.
+
+``OpenAIProvider`` talks to the OpenAI API. ``StubProvider`` is a local,
+deterministic stand-in with configurable latency, token counts and error
+rates, so /generate-content, /breed-agents and creative generation can be
+load-tested without a live API. Select with ``LLM_PROVIDER=openai|stub``.
+"""
+
+from __future__ import annotations
+
+import abc
+import asyncio
+import hashlib
+import math
+import os
+import random
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+
+@dataclass
+class Completion:
+    content: str
+    usage: Dict[str, int]
+
+
+@dataclass
+class StreamEvent:
+    """One streamed chunk: a text delta, or the final usage (text is None)."""
+    text: Optional[str] = None
+    usage: Optional[Dict[str, int]] = None
+
+
+def usage_dict(prompt_tokens: int = 0, completion_tokens: int = 0) -> Dict[str, int]:
+    return {
+        "promptTokens": prompt_tokens,
+        "completionTokens": completion_tokens,
+        "totalTokens": prompt_tokens + completion_tokens,
+    }
+
+
+class LLMProvider(abc.ABC):
+    """Chat-completion backend used by the orchestrator."""
+
+    name = "base"
+
+    @abc.abstractmethod
+    async def complete(self, *, model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> Completion:
+        """One full completion with its token usage."""
+
+    @abc.abstractmethod
+    def stream(
+        self, *, model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int
+    ) -> AsyncIterator[StreamEvent]:
+        """Text deltas as they arrive, then one event carrying the usage."""
+
+    async def aclose(self) -> None:
+        return None
+
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+
+    def __init__(self, api_key: Optional[str], max_retries: int = 0) -> None:
+        self.api_key = api_key
+        self.max_retries = max_retries
+        self._client = None
+
+    @property
+    def client(self):
+        # The SDK import is deferred to the first call so replicas start faster
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(api_key=self.api_key, max_retries=self.max_retries)
+        return self._client
+
+    async def complete(self, *, model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> Completion:
+        response = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        usage = response.usage
+        return Completion(
+            content=response.choices[0].message.content,
+            usage=usage_dict(usage.prompt_tokens, usage.completion_tokens) if usage else usage_dict(),
+        )
+
+    async def stream(
+        self, *, model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int
+    ) -> AsyncIterator[StreamEvent]:
+        stream = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        async for chunk in stream:
+            # The final chunk carries usage and no choices
+            if chunk.usage is not None:
+                yield StreamEvent(usage=usage_dict(chunk.usage.prompt_tokens, chunk.usage.completion_tokens))
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield StreamEvent(text=chunk.choices[0].delta.content)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+
+
+class StubProviderError(Exception):
+    """Injected failure; carries a status code like an API error would."""
+
+    def __init__(self, status_code: int) -> None:
+        super().__init__(f"Stub provider injected HTTP {status_code}")
+        self.status_code = status_code
+        self.response = None
+
+
+_STUB_WORDS = (
+    "discover elevate your everyday with crafted quality trusted by thousands "
+    "limited offer save today premium results fast simple proven effortless "
+    "style comfort value bold fresh smart unlock exclusive access now free "
+    "shipping satisfaction love it or return it join the community"
+).split()
+
+
+class StubProvider(LLMProvider):
+    """
+    Deterministic local provider for load tests.
+
+    Output text depends only on the prompt and how many times that prompt has
+    been seen, so runs are reproducible while repeat calls still differ.
+    Latency, completion length and failures are drawn from a seeded RNG.
+    """
+
+    name = "stub"
+
+    def __init__(
+        self,
+        *,
+        latency_ms: float = 800.0,
+        latency_distribution: str = "lognormal",
+        latency_spread: float = 0.5,
+        first_token_ms: float = 250.0,
+        tokens_per_second: float = 60.0,
+        completion_tokens: int = 120,
+        completion_tokens_spread: float = 0.3,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        max_concurrency: int = 0,
+        image_latency_ms: float = 3000.0,
+        seed: int = 0,
+    ) -> None:
+        self.latency_ms = latency_ms
+        self.latency_distribution = latency_distribution
+        self.latency_spread = latency_spread
+        self.first_token_ms = first_token_ms
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.completion_tokens_spread = completion_tokens_spread
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        # Like a provider-side quota: calls beyond this many in flight get a 429 (0 = unlimited)
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.image_latency_ms = image_latency_ms
+        self._rng = random.Random(seed)
+        self._seen: Dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls) -> "StubProvider":
+        return cls(
+            latency_ms=float(os.getenv("STUB_LATENCY_MS", "800")),
+            latency_distribution=os.getenv("STUB_LATENCY_DISTRIBUTION", "lognormal"),
+            latency_spread=float(os.getenv("STUB_LATENCY_SPREAD", "0.5")),
+            first_token_ms=float(os.getenv("STUB_FIRST_TOKEN_MS", "250")),
+            tokens_per_second=float(os.getenv("STUB_TOKENS_PER_SECOND", "60")),
+            completion_tokens=int(os.getenv("STUB_COMPLETION_TOKENS", "120")),
+            completion_tokens_spread=float(os.getenv("STUB_COMPLETION_TOKENS_SPREAD", "0.3")),
+            error_rate=float(os.getenv("STUB_ERROR_RATE", "0")),
+            rate_limit_rate=float(os.getenv("STUB_RATE_LIMIT_RATE", "0")),
+            max_concurrency=int(os.getenv("STUB_MAX_CONCURRENCY", "0")),
+            image_latency_ms=float(os.getenv("STUB_IMAGE_LATENCY_MS", "3000")),
+            seed=int(os.getenv("STUB_SEED", "0")),
+        )
+
+    async def complete(self, *, model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> Completion:
+        self._maybe_fail()
+        content, prompt_tokens, completion_tokens = self._render(model, messages, max_tokens)
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(self._sample_latency(self.latency_ms) / 1000)
+        finally:
+            self.in_flight -= 1
+        return Completion(content=content, usage=usage_dict(prompt_tokens, completion_tokens))
+
+    async def stream(
+        self, *, model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int
+    ) -> AsyncIterator[StreamEvent]:
+        self._maybe_fail()
+        content, prompt_tokens, completion_tokens = self._render(model, messages, max_tokens)
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(self._sample_latency(self.first_token_ms) / 1000)
+            words = content.split(" ")
+            per_word = completion_tokens / max(1, len(words)) / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+            for index, word in enumerate(words):
+                if index:
+                    await asyncio.sleep(per_word)
+                yield StreamEvent(text=word if index == 0 else " " + word)
+        finally:
+            self.in_flight -= 1
+        yield StreamEvent(usage=usage_dict(prompt_tokens, completion_tokens))
+
+    async def generate_image(self, prompt: str, aspect_ratio: str = "16:9") -> Dict[str, Any]:
+        """A small solid-colour PNG whose colour is derived from the prompt."""
+        self._maybe_fail()
+        await asyncio.sleep(self._sample_latency(self.image_latency_ms) / 1000)
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        png = _solid_png(*_aspect_size(aspect_ratio), rgb=digest[:3])
+        return {"data": png, "mimeType": "image/png"}
+
+    # Internals
+
+    def _maybe_fail(self) -> None:
+        if self.max_concurrency and self.in_flight >= self.max_concurrency:
+            raise StubProviderError(429)
+        roll = self._rng.random()
+        if roll < self.rate_limit_rate:
+            raise StubProviderError(429)
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise StubProviderError(500)
+
+    def _sample_latency(self, mean_ms: float) -> float:
+        if mean_ms <= 0:
+            return 0.0
+        spread = self.latency_spread
+        if self.latency_distribution == "fixed":
+            return mean_ms
+        if self.latency_distribution == "uniform":
+            return self._rng.uniform(mean_ms * (1 - spread), mean_ms * (1 + spread))
+        if self.latency_distribution == "normal":
+            return max(0.0, self._rng.gauss(mean_ms, mean_ms * spread))
+        # lognormal with the requested mean: heavy right tail like real APIs
+        sigma = spread
+        return self._rng.lognormvariate(math.log(mean_ms) - sigma * sigma / 2, sigma)
+
+    def _render(self, model: str, messages: List[Dict[str, str]], max_tokens: int) -> Tuple[str, int, int]:
+        prompt = "\n".join(m.get("content", "") for m in messages)
+        prompt_key = hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()
+        occurrence = self._seen.get(prompt_key, 0)
+        self._seen[prompt_key] = occurrence + 1
+
+        text_rng = random.Random(f"{prompt_key}:{occurrence}")
+        spread = self.completion_tokens_spread
+        completion_tokens = int(self.completion_tokens * text_rng.uniform(1 - spread, 1 + spread))
+        completion_tokens = max(1, min(max_tokens, completion_tokens))
+        # Roughly 0.75 words per token, as for English text
+        words = [text_rng.choice(_STUB_WORDS) for _ in range(max(1, int(completion_tokens * 0.75)))]
+        words[0] = words[0].capitalize()
+        prompt_tokens = max(1, len(prompt) // 4)
+        return " ".join(words) + ".", prompt_tokens, completion_tokens
+
+
+def _aspect_size(aspect_ratio: str, width: int = 64) -> Tuple[int, int]:
+    try:
+        w, h = (float(x) for x in aspect_ratio.split(":"))
+        return width, max(1, int(round(width * h / w)))
+    except (ValueError, ZeroDivisionError):
+        return width, width
+
+
+def _solid_png(width: int, height: int, rgb: bytes) -> bytes:
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    raw = b"".join(b"\x00" + rgb * width for _ in range(height))
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b"")
+
+
+def create_provider(name: str, *, openai_api_key: Optional[str] = None, openai_max_retries: int = 0) -> LLMProvider:
+    if name == "stub":
+        return StubProvider.from_env()
+    if name == "openai":
+        return OpenAIProvider(api_key=openai_api_key, max_retries=openai_max_retries)
+    raise ValueError(f"Unknown LLM_PROVIDER {name!r} (expected 'openai' or 'stub')")
@@ -0,0 +1,139 @@
+"""
+Per-campaign cache of Convex campaign stats for dashboard polling.
+
+getCampaignStats reads every variant, metric row and event of a campaign, so
+the orchestrator runs it at most about once per TTL per campaign, however
+many dashboards poll:
+  - an entry younger than ttl_seconds is served as is;
+  - an entry up to stale_seconds past its TTL is still served, while one
+    background refresh replaces it;
+  - without a usable entry the caller loads it, and concurrent callers for
+    the same campaign wait on that one load (single-flight).
+A TTL of 0 or less turns caching off: nothing is stored or served stale,
+but concurrent callers still share one load.
+invalidate() drops a campaign's entry when its metrics are recalculated. A
+load that was already running at that point is detached and not stored, so
+it cannot put pre-recalculation numbers back.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger("agent_orchestrator.metrics_cache")
+
+Loader = Callable[[], Awaitable[Any]]
+
+
+class _Entry:
+    __slots__ = ("value", "loaded_at")
+
+    def __init__(self, value: Any, loaded_at: float) -> None:
+        self.value = value
+        self.loaded_at = loaded_at
+
+
+class CampaignMetricsCache:
+    """TTL + LRU cache with single-flight loads and stale-while-revalidate."""
+
+    def __init__(self, *, ttl_seconds: float = 30.0, stale_seconds: float = 300.0, max_entries: int = 1000) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.loads = 0
+        self.load_errors = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    async def get(self, campaign_id: str, load: Loader) -> Any:
+        """The cached stats for a campaign, calling `load` when they are missing or expired."""
+        entry = self._entries.get(campaign_id) if self.ttl_seconds > 0 else None
+        if entry is not None:
+            age = time.monotonic() - entry.loaded_at
+            if age < self.ttl_seconds:
+                self.hits += 1
+                self._entries.move_to_end(campaign_id)
+                return entry.value
+            if age < self.ttl_seconds + self.stale_seconds:
+                self.stale_hits += 1
+                self._entries.move_to_end(campaign_id)
+                if campaign_id not in self._inflight:
+                    self._start(campaign_id, load)
+                return entry.value
+        self.misses += 1
+        task = self._inflight.get(campaign_id)
+        if task is None:
+            task = self._start(campaign_id, load)
+        else:
+            self.coalesced += 1
+        # A caller that goes away must not cancel the load other callers wait on
+        return await asyncio.shield(task)
+
+    def invalidate(self, campaign_id: Optional[str] = None) -> int:
+        """Drop one campaign's entry (or all of them) and detach running loads; returns entries dropped."""
+        if campaign_id is None:
+            dropped = len(self._entries)
+            self._entries.clear()
+            self._inflight.clear()
+        else:
+            dropped = 1 if self._entries.pop(campaign_id, None) is not None else 0
+            self._inflight.pop(campaign_id, None)
+        self.invalidations += 1
+        return dropped
+
+    def stats(self) -> Dict[str, Any]:
+        served = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "ttlSeconds": self.ttl_seconds,
+            "staleSeconds": self.stale_seconds,
+            "hits": self.hits,
+            "staleHits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "loads": self.loads,
+            "loadErrors": self.load_errors,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "hitRate": (self.hits + self.stale_hits) / served if served else 0.0,
+        }
+
+    def _start(self, campaign_id: str, load: Loader) -> asyncio.Task:
+        task = asyncio.create_task(self._load(campaign_id, load))
+        self._inflight[campaign_id] = task
+        task.add_done_callback(lambda done: self._settle(campaign_id, done))
+        return task
+
+    async def _load(self, campaign_id: str, load: Loader) -> Any:
+        self.loads += 1
+        try:
+            value = await load()
+        except Exception:
+            self.load_errors += 1
+            raise
+        if self.ttl_seconds > 0 and self._inflight.get(campaign_id) is asyncio.current_task():
+            self._entries[campaign_id] = _Entry(value, time.monotonic())
+            self._entries.move_to_end(campaign_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def _settle(self, campaign_id: str, task: asyncio.Task) -> None:
+        if self._inflight.get(campaign_id) is task:
+            del self._inflight[campaign_id]
+        # Background refreshes have no caller to raise to; a stale entry stays until it expires
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Campaign stats refresh failed for %s: %s", campaign_id, task.exception())
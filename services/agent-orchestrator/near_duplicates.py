@@ -0,0 +1,196 @@
+"""
+Near-duplicate detection for variants with MinHash and LSH.
+
+A variant is described by a fixed number of feature sets ("parts"); the
+orchestrator uses two, the inputs its system prompt is rendered from and the
+words of its copy. Each part gets a MinHash signature: every feature is
+hashed once, then through num_perm universal hash permutations (the feature
+sets are small, so one-permutation hashing would be mostly densified bins).
+Signatures are cut into LSH bands that take rows from every part, so two
+variants only become candidates when all their parts agree on some band, and
+a lookup compares against those candidates instead of every variant in the
+scope. A candidate is a near-duplicate when the estimated Jaccard similarity
+of every part reaches the threshold.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import random
+import re
+from array import array
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+Signature = Tuple[array, ...]
+
+_WORD = re.compile(r"\w+")
+_DIGITS = re.compile(r"\d+")
+
+
+def text_features(text: str, size: int = 2) -> Set[str]:
+    """
+    Word shingles of a text. Numbers are folded to "0", so copy that differs
+    only in a counter or figure still matches.
+    """
+    words = _WORD.findall(_DIGITS.sub("0", text.lower()))
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+# Permutations are universal hashes (a * x + b) mod a Mersenne prime
+_PRIME = (1 << 61) - 1
+_EMPTY = _PRIME
+
+
+@lru_cache(maxsize=None)
+def _permutations(num_perm: int) -> Tuple[Tuple[int, int], ...]:
+    rng = random.Random(0x5EED)
+    return tuple((rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm))
+
+
+def _hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big") % _PRIME
+
+
+def minhash(features: Iterable[str], num_perm: int) -> array:
+    """MinHash signature of a feature set; an empty set gets a constant signature."""
+    hashes = [_hash(feature) for feature in set(features)]
+    if not hashes:
+        return array("Q", [_EMPTY] * num_perm)
+    return array("Q", [min([(a * h + b) % _PRIME for h in hashes]) for a, b in _permutations(num_perm)])
+
+
+def similarity(a: array, b: array) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+class _Scope:
+    __slots__ = ("signatures", "buckets")
+
+    def __init__(self) -> None:
+        self.signatures: Dict[str, Signature] = {}
+        self.buckets: Dict[int, Set[str]] = {}
+
+
+class NearDuplicateIndex:
+    """MinHash/LSH index of variants, partitioned into scopes (e.g. a campaign's segment)."""
+
+    def __init__(
+        self,
+        *,
+        parts: int = 2,
+        num_perm: int = 128,
+        bands: int = 16,
+        threshold: float = 0.8,
+        max_scopes: int = 1000,
+    ) -> None:
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.parts = parts
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.max_scopes = max_scopes
+        self._scopes: "OrderedDict[str, _Scope]" = OrderedDict()
+        self.lookups = 0
+        self.compared = 0
+        self.duplicates = 0
+        self.evictions = 0
+
+    def signature(self, parts: Sequence[Iterable[str]]) -> Signature:
+        if len(parts) != self.parts:
+            raise ValueError(f"expected {self.parts} feature sets, got {len(parts)}")
+        return tuple(minhash(features, self.num_perm) for features in parts)
+
+    # Scopes
+
+    def has_scope(self, scope: str) -> bool:
+        return scope in self._scopes
+
+    def add_scope(self, scope: str) -> None:
+        """Create an empty scope; the least recently used scope is dropped past max_scopes."""
+        if scope not in self._scopes:
+            self._scopes[scope] = _Scope()
+            while len(self._scopes) > self.max_scopes:
+                self._scopes.popitem(last=False)
+                self.evictions += 1
+        self._scopes.move_to_end(scope)
+
+    # Items
+
+    def find(self, scope: str, signature: Signature) -> Optional[Tuple[str, float]]:
+        """The most similar near-duplicate in the scope as (item id, similarity), or None."""
+        self.lookups += 1
+        entry = self._scopes.get(scope)
+        if entry is None:
+            return None
+        self._scopes.move_to_end(scope)
+        candidates: Set[str] = set()
+        for key in self._band_keys(signature):
+            candidates.update(entry.buckets.get(key, ()))
+        best: Optional[Tuple[str, float]] = None
+        for item_id in candidates:
+            self.compared += 1
+            # Every part must be similar; the weakest part decides
+            score = min(similarity(a, b) for a, b in zip(signature, entry.signatures[item_id]))
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (item_id, score)
+        if best is not None:
+            self.duplicates += 1
+        return best
+
+    def add(self, scope: str, item_id: str, signature: Signature) -> None:
+        self.add_scope(scope)
+        entry = self._scopes[scope]
+        if item_id in entry.signatures:
+            self.remove(scope, item_id)
+        entry.signatures[item_id] = signature
+        for key in self._band_keys(signature):
+            entry.buckets.setdefault(key, set()).add(item_id)
+
+    def remove(self, scope: str, item_id: str) -> None:
+        entry = self._scopes.get(scope)
+        if entry is None:
+            return
+        signature = entry.signatures.pop(item_id, None)
+        if signature is None:
+            return
+        for key in self._band_keys(signature):
+            bucket = entry.buckets.get(key)
+            if bucket is not None:
+                bucket.discard(item_id)
+                if not bucket:
+                    del entry.buckets[key]
+
+    def rename(self, scope: str, old_id: str, new_id: str) -> None:
+        entry = self._scopes.get(scope)
+        signature = entry.signatures.get(old_id) if entry is not None else None
+        if signature is not None:
+            self.remove(scope, old_id)
+            self.add(scope, new_id, signature)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "scopes": len(self._scopes),
+            "items": sum(len(entry.signatures) for entry in self._scopes.values()),
+            "threshold": self.threshold,
+            "numPerm": self.num_perm,
+            "bands": self.bands,
+            "lookups": self.lookups,
+            "comparedPerLookup": self.compared / self.lookups if self.lookups else 0.0,
+            "duplicates": self.duplicates,
+            "evictions": self.evictions,
+        }
+
+    def _band_keys(self, signature: Signature) -> List[int]:
+        rows = self.rows
+        # A band spans the same rows of every part; the hash only picks the bucket
+        return [
+            hash((band, *(tuple(part[band * rows:(band + 1) * rows]) for part in signature)))
+            for band in range(self.bands)
+        ]
@@ -0,0 +1,255 @@
+"""
+Offline pre-generation of content for high-traffic variants.
+
+A background worker periodically takes the top-K variants per running
+campaign by traffic share and fills the content cache for the most common
+(contentType, context) buckets, so live /generate-content requests are served
+from cache. Generation runs with bounded concurrency and draws from a global
+token budget that resets every budget window.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from content_cache import VOLATILE_CONTEXT_KEYS, normalize_context
+
+logger = logging.getLogger("agent_orchestrator.pregeneration")
+
+ListCampaigns = Callable[[], Awaitable[List[str]]]
+TopVariants = Callable[[str, int], Awaitable[List[Dict[str, Any]]]]
+Needed = Callable[[Dict[str, Any], str, Dict[str, Any]], Awaitable[int]]
+GenerateOne = Callable[[Dict[str, Any], str, Dict[str, Any]], Awaitable[int]]
+
+
+class PregenerationWorker:
+    """Periodic cache filler; the callables decouple it from Convex and the LLM client."""
+
+    def __init__(
+        self,
+        *,
+        list_campaigns: ListCampaigns,
+        top_variants: TopVariants,
+        needed: Needed,
+        generate_one: GenerateOne,
+        top_k: int = 5,
+        max_buckets: int = 8,
+        concurrency: int = 4,
+        token_budget: int = 200_000,
+        budget_window_seconds: float = 3600,
+        interval_seconds: float = 900,
+        default_buckets: Optional[List[Dict[str, Any]]] = None,
+        max_tracked_buckets: int = 1000,
+    ) -> None:
+        self.list_campaigns = list_campaigns
+        self.top_variants = top_variants
+        self.needed = needed
+        self.generate_one = generate_one
+        self.top_k = top_k
+        self.max_buckets = max_buckets
+        self.concurrency = max(1, concurrency)
+        self.token_budget = token_budget
+        self.budget_window_seconds = budget_window_seconds
+        self.interval_seconds = interval_seconds
+        self.default_buckets = default_buckets or []
+        self.max_tracked_buckets = max_tracked_buckets
+
+        # bucket id -> {"contentType", "context", "count"}
+        self._buckets: Dict[str, Dict[str, Any]] = {}
+        self._window_start = time.time()
+        self._tokens_spent = 0
+        self._tokens_reserved = 0
+        self._task: Optional[asyncio.Task] = None
+        self._run_lock = asyncio.Lock()
+
+        self.runs = 0
+        self.generated = 0
+        self.failed = 0
+        self.skipped_for_budget = 0
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    # Context buckets
+
+    def observe(self, content_type: str, context: Dict[str, Any]) -> None:
+        """Count a live request so its context bucket can be pre-generated."""
+        bucket_id = self._bucket_id(content_type, context)
+        bucket = self._buckets.get(bucket_id)
+        if bucket is None:
+            if len(self._buckets) >= self.max_tracked_buckets:
+                self._prune_buckets()
+            representative = {k: v for k, v in (context or {}).items() if k not in VOLATILE_CONTEXT_KEYS}
+            bucket = {"contentType": content_type, "context": representative, "count": 0}
+            self._buckets[bucket_id] = bucket
+        bucket["count"] += 1
+
+    def buckets(self) -> List[Dict[str, Any]]:
+        """Most requested buckets first, topped up with the configured defaults."""
+        ranked = sorted(self._buckets.values(), key=lambda b: b["count"], reverse=True)
+        chosen: List[Dict[str, Any]] = []
+        seen = set()
+        for bucket in [*ranked, *self.default_buckets]:
+            bucket_id = self._bucket_id(bucket["contentType"], bucket.get("context") or {})
+            if bucket_id in seen:
+                continue
+            seen.add(bucket_id)
+            chosen.append({"contentType": bucket["contentType"], "context": bucket.get("context") or {}})
+            if len(chosen) >= self.max_buckets:
+                break
+        return chosen
+
+    # Token budget
+
+    def _roll_window(self) -> None:
+        if time.time() - self._window_start >= self.budget_window_seconds:
+            self._window_start = time.time()
+            self._tokens_spent = 0
+
+    def _reserve(self, tokens: int) -> bool:
+        self._roll_window()
+        if self._tokens_spent + self._tokens_reserved + tokens > self.token_budget:
+            return False
+        self._tokens_reserved += tokens
+        return True
+
+    def _settle(self, reserved: int, spent: int) -> None:
+        self._tokens_reserved -= reserved
+        self._tokens_spent += spent
+
+    # Running
+
+    async def run_once(self) -> Dict[str, Any]:
+        """Run one pre-generation pass over all running campaigns."""
+        async with self._run_lock:
+            started = time.perf_counter()
+            generated_before, failed_before = self.generated, self.failed
+            skipped_before = self.skipped_for_budget
+
+            jobs = await self._plan()
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def run_job(variant: Dict[str, Any], bucket: Dict[str, Any]) -> None:
+                estimate = int(((variant.get("agentConfig") or {}).get("llmConfig") or {}).get("maxTokens", 2000))
+                async with semaphore:
+                    if not self._reserve(estimate):
+                        self.skipped_for_budget += 1
+                        return
+                    spent = 0
+                    try:
+                        spent = await self.generate_one(variant, bucket["contentType"], bucket["context"])
+                        self.generated += 1
+                    except Exception as exc:
+                        self.failed += 1
+                        logger.warning("Pre-generation failed for %s: %s", variant.get("_id"), exc)
+                    finally:
+                        self._settle(estimate, spent)
+
+            await asyncio.gather(*(run_job(variant, bucket) for variant, bucket in jobs))
+
+            self.runs += 1
+            self.last_run = {
+                "finishedAt": time.time(),
+                "durationMs": round((time.perf_counter() - started) * 1000, 2),
+                "jobs": len(jobs),
+                "generated": self.generated - generated_before,
+                "failed": self.failed - failed_before,
+                "skippedForBudget": self.skipped_for_budget - skipped_before,
+            }
+            logger.info("Pre-generation pass: %s", self.last_run)
+            return self.last_run
+
+    async def _plan(self) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """One job per missing alternative, highest traffic share first."""
+        buckets = self.buckets()
+        if not buckets:
+            return []
+
+        try:
+            campaign_ids = await self.list_campaigns()
+        except Exception as exc:
+            logger.warning("Pre-generation could not list campaigns: %s", exc)
+            return []
+
+        variant_lists = await asyncio.gather(
+            *(self.top_variants(campaign_id, self.top_k) for campaign_id in campaign_ids),
+            return_exceptions=True,
+        )
+        variants: List[Dict[str, Any]] = []
+        for campaign_id, result in zip(campaign_ids, variant_lists):
+            if isinstance(result, Exception):
+                logger.warning("Pre-generation could not load top variants for %s: %s", campaign_id, result)
+                continue
+            variants.extend(v for v in result if v.get("agentConfig"))
+        variants.sort(key=lambda v: v.get("trafficShare", 0.0), reverse=True)
+
+        pairs = [(variant, bucket) for variant in variants for bucket in buckets]
+        missing = await asyncio.gather(
+            *(self.needed(variant, bucket["contentType"], bucket["context"]) for variant, bucket in pairs),
+            return_exceptions=True,
+        )
+        jobs: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+        for pair, count in zip(pairs, missing):
+            if isinstance(count, Exception):
+                # One malformed variant must not cost every campaign its pass
+                self.failed += 1
+                logger.warning("Pre-generation skipped %s (%s): %s", pair[0].get("_id"), pair[1]["contentType"], count)
+                continue
+            jobs.extend([pair] * count)
+        return jobs
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.exception("Pre-generation pass failed: %s", exc)
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        self._roll_window()
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "runs": self.runs,
+            "generated": self.generated,
+            "failed": self.failed,
+            "skippedForBudget": self.skipped_for_budget,
+            "tokenBudget": self.token_budget,
+            "tokensSpent": self._tokens_spent,
+            "budgetWindowSeconds": self.budget_window_seconds,
+            "trackedBuckets": len(self._buckets),
+            "buckets": self.buckets(),
+            "lastRun": self.last_run,
+        }
+
+    # Internals
+
+    @staticmethod
+    def _bucket_id(content_type: str, context: Dict[str, Any]) -> str:
+        return json.dumps(
+            [content_type.strip().lower(), normalize_context(context or {})],
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+
+    def _prune_buckets(self) -> None:
+        # Keep the busier half so new contexts can still enter
+        ranked = sorted(self._buckets.items(), key=lambda item: item[1]["count"], reverse=True)
+        self._buckets = dict(ranked[: self.max_tracked_buckets // 2])
@@ -0,0 +1,210 @@
+"""
+Precompiled system-prompt templates and a content-addressed prompt store.
+
+Each agent type's system prompt is compiled once into literal segments and
+field slots, so rendering is a single join. Rendered prompts are cached by a
+hash of their inputs and interned by a content hash (``promptRef``): agents
+with the same personality, strategy and product info share one string in
+memory and one row in Convex, and variants store the short ref instead of
+the multi-kilobyte text. A ref handed out for storage is pinned until it is
+marked persisted, so the LRU never drops a prompt Convex does not have yet.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import string
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+PROMPT_REF_PREFIX = "sp_"
+
+_BASE_TEMPLATE = """You are an AI advertising agent for {product_name}.
+
+PERSONALITY:
+- Tone: {tone}
+- Style: {style}
+- Key Traits: {traits}
+
+GOAL: {goal}
+
+STRATEGY:
+- Objective: {objective}
+- Tactics: {tactics}
+
+PRODUCT INFO:
+{product_info}
+
+"""
+
+_ROLE_SECTIONS = {
+    "landing_page": """
+YOUR ROLE: Generate compelling landing page content that adapts to visitor behavior.
+- Create headlines that grab attention
+- Write persuasive copy that drives action
+- Adapt content based on how users interact with the page
+- Focus on conversion optimization
+""",
+    "social_media": """
+YOUR ROLE: Create engaging social media ad content.
+- Craft attention-grabbing hooks
+- Write concise, shareable copy
+- Include strong CTAs
+- Optimize for platform-specific best practices
+""",
+    "placement": """
+YOUR ROLE: Decide optimal ad placement timing and targeting.
+- Analyze user context (time, location, device, behavior)
+- Recommend when and where to show ads
+- Maximize ROI through smart placement
+""",
+    "visual": """
+YOUR ROLE: Generate specifications for visual content.
+- Describe compelling image/video concepts
+- Specify visual elements that align with brand
+- Optimize for emotional impact
+""",
+    "ai_context": """
+YOUR ROLE: Optimize structured data for AI agents and scrapers.
+- Create semantic, machine-readable content
+- Structure data for AI decision-making
+- Highlight key differentiators for AI comparison
+""",
+}
+
+_CLOSING = "\nALWAYS stay in character and apply your tactics strategically."
+
+
+class CompiledTemplate:
+    """A format string pre-split into literals and field names; values are inserted verbatim."""
+
+    def __init__(self, source: str) -> None:
+        self.segments: List[Tuple[str, Optional[str]]] = [
+            (literal, field) for literal, field, _, _ in string.Formatter().parse(source)
+        ]
+        self.fields = {field for _, field in self.segments if field}
+
+    def render(self, values: Dict[str, str]) -> str:
+        parts: List[str] = []
+        for literal, field in self.segments:
+            parts.append(literal)
+            if field:
+                parts.append(values[field])
+        return "".join(parts)
+
+
+# Literal role text is baked in, so each agent type renders in one pass
+SYSTEM_PROMPT_TEMPLATES: Dict[str, CompiledTemplate] = {
+    agent_type: CompiledTemplate(_BASE_TEMPLATE + role.replace("{", "{{").replace("}", "}}") + _CLOSING)
+    for agent_type, role in _ROLE_SECTIONS.items()
+}
+_DEFAULT_TEMPLATE = CompiledTemplate(_BASE_TEMPLATE + _CLOSING)
+
+
+def prompt_ref(text: str) -> str:
+    return PROMPT_REF_PREFIX + hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+FetchPrompts = Callable[[List[str]], Awaitable[Dict[str, str]]]
+
+
+class PromptStore:
+    """LRU of rendered prompts by input hash, plus interned texts by promptRef and pinned unpersisted ones."""
+
+    def __init__(self, max_entries: int = 4096, fetch: Optional[FetchPrompts] = None) -> None:
+        self.max_entries = max_entries
+        self.fetch = fetch
+        self._by_inputs: "OrderedDict[Tuple[str, Tuple[Tuple[str, str], ...]], str]" = OrderedDict()
+        self._texts: "OrderedDict[str, str]" = OrderedDict()
+        # Pinned outside the LRU until written to Convex
+        self._unpersisted: Dict[str, str] = {}
+        self._persisted: Set[str] = set()
+        self.renders = 0
+        self.render_hits = 0
+        self.fetches = 0
+
+    def render(self, agent_type: str, values: Dict[str, str]) -> Tuple[str, str]:
+        """Return (promptRef, text) for a template's values, rendering only on first sight."""
+        inputs_key = (agent_type, tuple(sorted(values.items())))
+        ref = self._by_inputs.get(inputs_key)
+        if ref is not None:
+            text = self._get(ref)
+            if text is not None:
+                self.render_hits += 1
+                self._by_inputs.move_to_end(inputs_key)
+                return ref, text
+
+        self.renders += 1
+        text = SYSTEM_PROMPT_TEMPLATES.get(agent_type, _DEFAULT_TEMPLATE).render(values)
+        ref = prompt_ref(text)
+        text = self.intern(ref, text)
+        self._by_inputs[inputs_key] = ref
+        while len(self._by_inputs) > self.max_entries:
+            self._by_inputs.popitem(last=False)
+        return ref, text
+
+    def intern(self, ref: str, text: str, persisted: bool = False) -> str:
+        """Keep one shared string per ref."""
+        existing = self._get(ref)
+        if existing is not None:
+            text = existing
+        else:
+            self._texts[ref] = text
+            while len(self._texts) > self.max_entries:
+                evicted, _ = self._texts.popitem(last=False)
+                self._persisted.discard(evicted)
+        if persisted:
+            self._persisted.add(ref)
+        return text
+
+    def pin(self, ref: str, text: str) -> None:
+        """Queue a prompt for persistence; it stays in memory until mark_persisted."""
+        if ref not in self._persisted:
+            self._unpersisted.setdefault(ref, text)
+
+    async def resolve(self, ref: str) -> Optional[str]:
+        return (await self.resolve_many([ref])).get(ref)
+
+    async def resolve_many(self, refs: Iterable[str]) -> Dict[str, str]:
+        """Texts for refs, fetching the ones not in memory in one batch."""
+        found: Dict[str, str] = {}
+        missing: List[str] = []
+        for ref in dict.fromkeys(refs):
+            text = self._get(ref)
+            if text is None:
+                missing.append(ref)
+            else:
+                found[ref] = text
+        if missing and self.fetch is not None:
+            self.fetches += 1
+            for ref, text in (await self.fetch(missing)).items():
+                found[ref] = self.intern(ref, text, persisted=True)
+        return found
+
+    def unpersisted(self, refs: Optional[Iterable[str]] = None) -> List[Dict[str, str]]:
+        """Prompts not yet written to Convex, optionally limited to the given refs."""
+        wanted = self._unpersisted if refs is None else {r: self._unpersisted[r] for r in refs if r in self._unpersisted}
+        return [{"ref": ref, "text": text} for ref, text in wanted.items()]
+
+    def mark_persisted(self, refs: Iterable[str]) -> None:
+        for ref in refs:
+            text = self._unpersisted.pop(ref, None)
+            if text is not None:
+                self.intern(ref, text, persisted=True)
+
+    def _get(self, ref: str) -> Optional[str]:
+        text = self._texts.get(ref)
+        if text is not None:
+            self._texts.move_to_end(ref)
+            return text
+        return self._unpersisted.get(ref)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "prompts": len(self._texts),
+            "inputKeys": len(self._by_inputs),
+            "renders": self.renders,
+            "renderHits": self.render_hits,
+            "fetches": self.fetches,
+            "unpersisted": len(self._unpersisted),
+        }
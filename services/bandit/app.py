@@ -4,7 +4,9 @@ import asyncio
 import json
 import math
 import os
+import pathlib
 import random
+import sys
 from dataclasses import dataclass
 from typing import Dict, List, Optional, Tuple
 
@@ -16,6 +18,9 @@ try:
 except Exception:  # pragma: no cover
     redis = None
 
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent / "common"))
+from fast_json import FastJSONResponse
+
 
 def keyspace(campaign_id: str, segment: str) -> str:
     return f"arms:{campaign_id}:{segment}"
@@ -78,7 +83,7 @@ class Store:
 
 
 store = Store()
-app = FastAPI(title="Ad-Astra Bandit Service", version="0.1.0")
+app = FastAPI(title="Ad-Astra Bandit Service", version="0.1.0", default_response_class=FastJSONResponse)
 
 
 def sample_beta(alpha: float, beta: float) -> float:
@@ -88,39 +93,50 @@ def sample_beta(alpha: float, beta: float) -> float:
     return x / (x + y)
 
 
-@app.post("/select", response_model=SelectResponse)
-async def select(req: SelectRequest) -> SelectResponse:
-    if not req.arms:
-        raise HTTPException(status_code=400, detail="arms list must be non-empty")
-    ks = keyspace(req.campaignId, req.segment)
+async def thompson_select(campaign_id: str, segment: str, arms: List[str]) -> Tuple[str, bool]:
+    """Pick an arm by Thompson sampling. Returns (variantId, explore)."""
+    ks = keyspace(campaign_id, segment)
     params = await store.get_all(ks)
     # Ensure all arms exist with priors
-    for arm in req.arms:
+    for arm in arms:
         if arm not in params:
             params[arm] = ArmParams()
             await store.set_arm(ks, arm, params[arm])
 
     # Thompson sampling
-    scored = [(arm, sample_beta(p.alpha, p.beta)) for arm, p in params.items() if arm in req.arms]
+    scored = [(arm, sample_beta(p.alpha, p.beta)) for arm, p in params.items() if arm in arms]
     if not scored:
         # fallback: pick first
-        return SelectResponse(variantId=req.arms[0], explore=True)
+        return arms[0], True
     scored.sort(key=lambda t: t[1], reverse=True)
-    winner = scored[0][0]
-    return SelectResponse(variantId=winner, explore=True)
+    return scored[0][0], True
 
 
-@app.post("/reward")
-async def reward(req: RewardRequest) -> dict:
-    ks = keyspace(req.campaignId, req.segment)
+async def apply_reward(campaign_id: str, segment: str, variant_id: str, reward: float) -> ArmParams:
+    """Fold a reward into the arm's Beta posterior and persist it."""
+    ks = keyspace(campaign_id, segment)
     params = await store.get_all(ks)
-    arm = params.get(req.variantId, ArmParams())
+    arm = params.get(variant_id, ArmParams())
     # Treat positive reward as success; non-positive as failure
-    if req.reward > 0:
-        arm.alpha += req.reward
+    if reward > 0:
+        arm.alpha += reward
     else:
-        arm.beta += abs(req.reward)
-    await store.set_arm(ks, req.variantId, arm)
+        arm.beta += abs(reward)
+    await store.set_arm(ks, variant_id, arm)
+    return arm
+
+
+@app.post("/select", response_model=SelectResponse)
+async def select(req: SelectRequest) -> SelectResponse:
+    if not req.arms:
+        raise HTTPException(status_code=400, detail="arms list must be non-empty")
+    winner, explore = await thompson_select(req.campaignId, req.segment, req.arms)
+    return SelectResponse(variantId=winner, explore=explore)
+
+
+@app.post("/reward")
+async def reward(req: RewardRequest) -> dict:
+    arm = await apply_reward(req.campaignId, req.segment, req.variantId, req.reward)
     return {"ok": True, "alpha": arm.alpha, "beta": arm.beta}
 
 
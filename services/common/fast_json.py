@@ -0,0 +1,37 @@
+"""
+Shared JSON response class for the Ad-Astra FastAPI services.
+
+Encodes with orjson when it is installed and falls back to the stdlib
+encoder otherwise, so services keep working without the extra dependency.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson  # type: ignore
+except Exception:  # pragma: no cover
+    orjson = None
+
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY if orjson else 0
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse that renders with orjson when available."""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        try:
+            return orjson.dumps(content, option=ORJSON_OPTIONS)
+        except TypeError:
+            # orjson rejects a few values the stdlib accepts (e.g. ints wider than 64 bits)
+            return super().render(content)
+
+
+def encoder_name() -> str:
+    return "orjson" if orjson is not None else "json"
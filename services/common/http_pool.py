@@ -0,0 +1,95 @@
+"""
+Pooled HTTP clients and retrying requests for the Ad-Astra services.
+
+One keep-alive client per upstream origin, opened lazily and closed on
+shutdown. request_with_retry retries with full-jitter exponential backoff:
+failures where the request never left are always retried, ones where it may
+have reached the server only for idempotent methods or when the caller says
+the call is safe to repeat.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.25"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "5"))
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+# Failures where the request never reached the server, so any method may be retried
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# One pooled client per upstream origin; opened lazily, closed on shutdown
+_http_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def get_http_client(url: str) -> httpx.AsyncClient:
+    """Return the shared keep-alive client for the URL's origin."""
+    parts = urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+    client = _http_clients.get(origin)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE),
+        )
+        _http_clients[origin] = client
+    return client
+
+
+async def close_http_clients() -> None:
+    clients = list(_http_clients.values())
+    _http_clients.clear()
+    await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
+
+
+def is_retryable(exc: Exception, may_retry_sent: bool) -> bool:
+    if isinstance(exc, UNSENT_ERRORS):
+        return True
+    if not may_retry_sent:
+        return False
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(exc, httpx.TransportError)
+
+
+async def request_with_retry(
+    method: str,
+    url: str,
+    *,
+    json: Optional[Dict[str, Any]] = None,
+    params: Optional[Dict[str, Any]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    attempts: int = 3,
+    timeout: float = 15.0,
+    retry: Optional[bool] = None,
+) -> httpx.Response:
+    """
+    Send a request over the shared pool, retrying with full-jitter exponential backoff.
+
+    Requests that may have reached the server are only retried for idempotent
+    methods, or when the caller passes retry=True for a call known to be safe.
+    """
+    may_retry_sent = method.upper() in IDEMPOTENT_METHODS if retry is None else retry
+    client = get_http_client(url)
+    last_error: Optional[Exception] = None
+    for attempt in range(1, attempts + 1):
+        try:
+            response = await client.request(method, url, json=json, params=params, headers=headers, timeout=timeout)
+            response.raise_for_status()
+            return response
+        except Exception as exc:
+            last_error = exc
+            if attempt == attempts or not is_retryable(exc, may_retry_sent):
+                break
+            await asyncio.sleep(random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1))))
+    assert last_error is not None
+    raise last_error
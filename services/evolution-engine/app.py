@@ -8,16 +8,41 @@ from __future__ import annotations
 
 import asyncio
 import os
+import pathlib
 import random
+import sys
+import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 import httpx
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from pydantic import BaseModel, Field
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
-app = FastAPI(title="Ad-Astra Evolution Engine", version="0.1.0")
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent / "common"))
+from fast_json import FastJSONResponse
+from http_pool import close_http_clients, request_with_retry
+
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    """See startup_event and shutdown_event."""
+    await startup_event()
+    try:
+        yield
+    finally:
+        await shutdown_event()
+
+
+app = FastAPI(
+    title="Ad-Astra Evolution Engine",
+    version="0.1.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan,
+)
 scheduler = AsyncIOScheduler()
 
 
@@ -72,44 +97,18 @@ class FitnessCalculationRequest(BaseModel):
 # Helper Functions
 # ============================================
 
-async def _request_with_retry(
-    method: str,
-    url: str,
-    *,
-    json: Optional[Dict[str, Any]] = None,
-    params: Optional[Dict[str, Any]] = None,
-    headers: Optional[Dict[str, str]] = None,
-    attempts: int = 3,
-    timeout: float = 15.0,
-) -> httpx.Response:
-    last_error: Optional[Exception] = None
-    for attempt in range(1, attempts + 1):
-        try:
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                response = await client.request(method, url, json=json, params=params, headers=headers)
-                response.raise_for_status()
-                return response
-        except Exception as exc:
-            last_error = exc
-            if attempt == attempts:
-                break
-            await asyncio.sleep(min(2 ** attempt, 5))
-    assert last_error is not None
-    raise last_error
-
-
 async def call_convex_query(endpoint: str, params: Dict[str, Any]) -> Any:
     """Call Convex query endpoint with retry logic."""
     convex_base = os.getenv("CONVEX_HTTP_BASE")
     if not convex_base:
         raise HTTPException(status_code=500, detail="CONVEX_HTTP_BASE not configured")
 
-    response = await _request_with_retry("GET", f"{convex_base}/{endpoint}", params=params)
+    response = await request_with_retry("GET", f"{convex_base}/{endpoint}", params=params)
     return response.json()
 
 
-async def call_convex_mutation(endpoint: str, data: Dict[str, Any]) -> Any:
-    """Call Convex mutation endpoint with retry logic."""
+async def call_convex_mutation(endpoint: str, data: Dict[str, Any], *, retry: bool = False) -> Any:
+    """Call Convex mutation endpoint. Pass retry=True only for mutations that are safe to repeat."""
     convex_base = os.getenv("CONVEX_HTTP_BASE")
     if not convex_base:
         raise HTTPException(status_code=500, detail="CONVEX_HTTP_BASE not configured")
@@ -117,19 +116,31 @@ async def call_convex_mutation(endpoint: str, data: Dict[str, Any]) -> Any:
     admin_secret = os.getenv("ADMIN_SECRET")
     headers = {"x-admin-key": admin_secret} if admin_secret else {}
 
-    response = await _request_with_retry(
+    response = await request_with_retry(
         "POST",
         f"{convex_base}/admin/{endpoint}",
         json=data,
         headers=headers,
+        retry=retry,
     )
     return response.json()
 
 
-async def call_orchestrator(endpoint: str, data: Dict[str, Any]) -> Any:
-    """Call agent orchestrator service with retry logic."""
+async def call_orchestrator(endpoint: str, data: Dict[str, Any], idempotency_key: Optional[str] = None) -> Any:
+    """
+    Call agent orchestrator service. Calls that may have reached it are only
+    retried with an idempotency key, which the orchestrator uses to return
+    the first call's result instead of doing the work twice.
+    """
     orchestrator_url = os.getenv("AGENT_ORCHESTRATOR_URL", "http://localhost:8001")
-    response = await _request_with_retry("POST", f"{orchestrator_url}/{endpoint}", json=data)
+    headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+    response = await request_with_retry(
+        "POST",
+        f"{orchestrator_url}/{endpoint}",
+        json=data,
+        headers=headers,
+        retry=idempotency_key is not None,
+    )
     return response.json()
 
 
@@ -192,10 +203,13 @@ def crossover(parent1: AgentConfig, parent2: AgentConfig) -> AgentConfig:
     # LLM config mostly stays same but temperature can vary
     offspring_llm = {
         "model": parent1.llmConfig["model"],
-        "systemPrompt": parent1.llmConfig["systemPrompt"],  # Will be regenerated
         "temperature": (parent1.llmConfig["temperature"] + parent2.llmConfig["temperature"]) / 2,
         "maxTokens": parent1.llmConfig["maxTokens"]
     }
+    # Parents store either the prompt text or a promptRef; will be regenerated
+    for key in ("systemPrompt", "promptRef"):
+        if parent1.llmConfig.get(key):
+            offspring_llm[key] = parent1.llmConfig[key]
 
     return AgentConfig(
         personality=offspring_personality,
@@ -281,9 +295,15 @@ async def evolve_campaign(campaign_id: str, force: bool = False) -> Dict[str, An
     print(f"[Evolution] Starting evolution for campaign {campaign_id}")
 
     try:
-        await call_convex_mutation("recalculateMetricsForCampaign", {"campaignId": campaign_id})
+        await call_convex_mutation("recalculateMetrics", {"campaignId": campaign_id}, retry=True)
     except Exception as exc:
         print(f"[Evolution] Failed to recalculate metrics for {campaign_id}: {exc}")
+    else:
+        # Dashboards read campaign stats through the orchestrator's cache
+        try:
+            await call_orchestrator(f"campaigns/{campaign_id}/metrics/invalidate", {})
+        except Exception as exc:
+            print(f"[Evolution] Failed to invalidate cached metrics for {campaign_id}: {exc}")
 
     # Fetch agent metrics
     metrics = await fetch_agent_metrics(campaign_id)
@@ -310,7 +330,7 @@ async def evolve_campaign(campaign_id: str, force: bool = False) -> Dict[str, An
             await call_convex_mutation("mutations:updateVariantFitness", {
                 "variantId": metric.variantId,
                 "fitnessScore": fitness
-            })
+            }, retry=True)
         except Exception as e:
             print(f"[Evolution] Error updating fitness for {metric.variantId}: {e}")
 
@@ -392,7 +412,7 @@ async def evolve_campaign(campaign_id: str, force: bool = False) -> Dict[str, An
                 "parentIds": [parent1["_id"], parent2["_id"]],
                 "targetGeneration": target_generation,
                 "mutationRate": MUTATION_RATE
-            })
+            }, idempotency_key=uuid.uuid4().hex)
             offspring_created.append(result)
 
             # Record evolution history
@@ -495,8 +515,7 @@ async def health() -> Dict[str, Any]:
 # Scheduled Jobs
 # ============================================
 
-@app.on_event("startup")
-async def startup_event():
+async def startup_event() -> None:
     """Start the scheduler on app startup."""
     # TODO: Add scheduled evolution jobs
     # scheduler.add_job(
@@ -508,6 +527,11 @@ async def startup_event():
     print(f"[Evolution Engine] Started (evolution frequency: {EVOLUTION_FREQUENCY_HOURS}h)")
 
 
+async def shutdown_event() -> None:
+    """Close pooled upstream connections."""
+    await close_http_clients()
+
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", "8002"))
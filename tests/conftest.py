@@ -0,0 +1,178 @@
+"""
+Shared fixtures for the offline test suite.
+
+Services are loaded from their files under unique module names (three of them
+are called app.py), with the stub LLM provider, an in-memory campaign store
+and every outbound HTTP call answered by an httpx.MockTransport handler.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+from types import ModuleType
+from typing import Callable, Dict, List, Optional
+
+import httpx
+import pytest
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+ORCHESTRATOR_DIR = ROOT / "services" / "agent-orchestrator"
+COMMON_DIR = ROOT / "services" / "common"
+
+_DATA_DIR = tempfile.mkdtemp(prefix="adastra-tests-")
+
+os.environ.update({
+    "LLM_PROVIDER": "stub",
+    "STUB_LATENCY_MS": "0",
+    "STUB_FIRST_TOKEN_MS": "0",
+    "STUB_TOKENS_PER_SECOND": "0",
+    "STUB_IMAGE_LATENCY_MS": "0",
+    "ORCHESTRATOR_DB_PATH": ":memory:",
+    "CONVEX_HTTP_BASE": "http://convex.test",
+    "CONVEX_URL": "http://convex.test",
+    "AGENT_ORCHESTRATOR_URL": "http://orchestrator.test",
+    "BANDIT_SERVICE_URL": "http://bandit.test",
+    "EVOLUTION_SERVICE_URL": "http://evolution.test",
+    "OPENAI_API_KEY": "sk-test",
+    "CREATIVE_STORE_DIR": os.path.join(_DATA_DIR, "creatives"),
+    "REDIS_URL": "",
+    "RETRY_BASE_DELAY": "0",
+    "PREGEN_ENABLED": "false",
+    "LLM_USAGE_FLUSH_SECONDS": "0",
+    "LLM_RATE_LIMIT_COOLDOWN_SECONDS": "0.01",
+})
+
+for path in (COMMON_DIR, ORCHESTRATOR_DIR):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+Handler = Callable[[httpx.Request], httpx.Response]
+
+
+def load_module(name: str, path: pathlib.Path) -> ModuleType:
+    """Import a file as a fresh module called name."""
+    spec = importlib.util.spec_from_file_location(name, path)
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_DATA_DIR, ignore_errors=True)
+
+
+class MockHTTP:
+    """Routes every httpx.AsyncClient created during a test to one handler."""
+
+    def __init__(self) -> None:
+        self.handler: Optional[Handler] = None
+        self.requests: List[httpx.Request] = []
+
+    def __call__(self, handler: Handler) -> "MockHTTP":
+        self.handler = handler
+        return self
+
+    def _dispatch(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if self.handler is None:
+            return httpx.Response(404)
+        return self.handler(request)
+
+    def paths(self, method: Optional[str] = None) -> List[str]:
+        return [r.url.path for r in self.requests if method is None or r.method == method]
+
+
+@pytest.fixture
+def mock_http(monkeypatch) -> MockHTTP:
+    mock = MockHTTP()
+    original = httpx.AsyncClient
+
+    class MockAsyncClient(original):  # type: ignore[misc, valid-type]
+        def __init__(self, *args, **kwargs):
+            kwargs.pop("limits", None)
+            kwargs["transport"] = httpx.MockTransport(mock._dispatch)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(httpx, "AsyncClient", MockAsyncClient)
+    import http_pool
+
+    monkeypatch.setattr(http_pool, "_http_clients", {})
+    return mock
+
+
+@pytest.fixture(scope="session")
+def orchestrator() -> ModuleType:
+    return load_module("orchestrator_app", ORCHESTRATOR_DIR / "app.py")
+
+
+@pytest.fixture
+def load_gateway(monkeypatch) -> Callable[..., ModuleType]:
+    """Load a fresh api-gateway/server.py with the given environment overrides."""
+
+    def load(**env: str) -> ModuleType:
+        for key, value in env.items():
+            monkeypatch.setenv(key, value)
+        return load_module("gateway_server", ROOT / "api-gateway" / "server.py")
+
+    return load
+
+
+@pytest.fixture
+def gateway(load_gateway) -> ModuleType:
+    return load_gateway(BANDIT_MODE="http")
+
+
+@pytest.fixture
+def evolution() -> ModuleType:
+    return load_module("evolution_app", ROOT / "services" / "evolution-engine" / "app.py")
+
+
+def content_request(**overrides: object) -> Dict[str, object]:
+    """A /generate-content body for an agent with an inline system prompt."""
+    body: Dict[str, object] = {
+        "variantId": "v1",
+        "campaignId": "c1",
+        "agentType": "landing_page",
+        "contentType": "headline",
+        "context": {"page": "pricing"},
+        "agentConfig": {
+            "personality": {"tone": "friendly", "style": "direct_sale", "traits": ["creative", "authentic"]},
+            "strategy": {"objective": "maximize_conversions", "tactics": ["social_proof"], "adaptationRate": 0.5},
+            "llmConfig": {"model": "stub-model", "systemPrompt": "You write landing pages.", "temperature": 0.7},
+            "evolution": {"generation": 0},
+        },
+    }
+    body.update(overrides)
+    return body
+
+
+def json_response(payload: object, status_code: int = 200) -> httpx.Response:
+    return httpx.Response(status_code, json=payload)
+
+
+def route(table: Dict[str, object]) -> Handler:
+    """Handler answering exact paths from table; values may be callables taking the request."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        answer = table.get(request.url.path)
+        if answer is None:
+            return httpx.Response(404)
+        if callable(answer):
+            answer = answer(request)
+        if isinstance(answer, httpx.Response):
+            return answer
+        return json_response(answer)
+
+    return handler
@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from starlette.testclient import TestClient
+
+from metrics_cache import CampaignMetricsCache
+from conftest import content_request
+
+BREED = {"campaignId": "c1", "parentIds": ["p1", "p2", "p3", "p4"], "targetGeneration": 3, "mutationRate": 0.0}
+
+
+def parent(variant_id):
+    config = content_request()["agentConfig"]
+    config["strategy"]["tactics"] = ["social_proof", "urgency"]
+    return {
+        "_id": variant_id,
+        "agentType": "landing_page",
+        "segment": "human",
+        "agentConfig": config,
+        "payload": {"human": {"headline": f"Widget {variant_id}", "subhead": "Made well", "bullets": [],
+                              "cta": {"label": "Buy", "url": "https://example.com"}}},
+    }
+
+
+@pytest.fixture
+def orch(orchestrator, monkeypatch):
+    monkeypatch.setattr(orchestrator, "NEAR_DUP_MODE", "off")
+    monkeypatch.setattr(orchestrator, "_bulk_variant_reads_supported", True)
+    monkeypatch.setattr(orchestrator, "_bulk_variants_supported", True)
+    monkeypatch.setattr(orchestrator, "campaign_metrics_cache", CampaignMetricsCache(ttl_seconds=0))
+    return orchestrator
+
+
+def convex(bulk_reads=True, stats=True, missing=()):
+    state = {"active": 0, "peak": 0, "written": []}
+
+    async def handler(request):
+        path = request.url.path
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.01)
+        state["active"] -= 1
+        if path == "/queries:getVariantsByIds" and bulk_reads:
+            ids = request.url.params["ids"].split(",")
+            return httpx.Response(200, json=[None if i in missing else parent(i) for i in ids])
+        if path == "/queries:getVariantById":
+            variant_id = request.url.params["id"]
+            return httpx.Response(200, json=None if variant_id in missing else parent(variant_id))
+        if path == "/queries:getCampaignStats" and stats:
+            return httpx.Response(200, json={"campaign": {"goal": {"type": "revenue", "target": 5}}})
+        if path == "/admin/upsertPrompts":
+            return httpx.Response(200, json={"ok": True})
+        if path == "/admin/createVariants":
+            variants = json.loads(request.content)["variants"]
+            state["written"].extend(variants)
+            return httpx.Response(200, json={"ids": [f"child{i}" for i in range(len(variants))]})
+        return httpx.Response(404 if path != "/queries:getCampaignStats" else 500)
+
+    return handler, state
+
+
+def test_parents_and_stats_load_together_and_offspring_are_written_in_bulk(orch, mock_http):
+    handler, state = convex()
+    mock_http(handler)
+    body = TestClient(orch.app).post("/breed-agents", json=BREED).json()
+
+    assert body["generation"] == 3 and body["bred"] == 2
+    assert all(set(agent["parentIds"]) <= set(BREED["parentIds"]) for agent in body["agents"])
+    reads = mock_http.paths("GET")
+    assert sorted(reads) == ["/queries:getCampaignStats", "/queries:getVariantsByIds"]
+    assert state["peak"] == 2
+    written = state["written"]
+    assert [v["agentConfig"]["evolution"]["generation"] for v in written] == [3, 3]
+    assert all("Gen3" in v["payload"]["human"]["headline"] for v in written)
+
+
+def test_bulk_read_failure_falls_back_to_single_reads(orch, mock_http):
+    handler, _ = convex(bulk_reads=False, stats=False)
+    mock_http(handler)
+    body = TestClient(orch.app).post("/breed-agents", json=BREED).json()
+    assert body["bred"] == 2
+    assert mock_http.paths("GET").count("/queries:getVariantById") == 4
+
+
+def test_missing_parent_is_a_404_and_nothing_is_written(orch, mock_http):
+    handler, state = convex(missing={"p3"})
+    mock_http(handler)
+    response = TestClient(orch.app).post("/breed-agents", json=BREED)
+    assert response.status_code == 404 and "p3" in response.json()["detail"]
+    assert state["written"] == []
+
+
+def test_fewer_than_two_parents_is_rejected_before_any_read(orch, mock_http):
+    handler, _ = convex()
+    mock_http(handler)
+    response = TestClient(orch.app).post("/breed-agents", json={**BREED, "parentIds": ["p1"]})
+    assert response.status_code == 400 and not mock_http.requests
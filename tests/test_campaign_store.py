@@ -0,0 +1,107 @@
+import base64
+import sqlite3
+
+import pytest
+from starlette.testclient import TestClient
+
+from campaign_store import CampaignStore, InvalidCursor, decode_cursor, encode_cursor
+
+
+def campaign(n, status="draft", created_at=None):
+    return {"id": f"camp_{n:02d}", "status": status, "createdAt": created_at if created_at is not None else n, "name": f"c{n}"}
+
+
+def variant(n, segment="human", campaign_id="camp_01"):
+    return {"id": f"var_{n:02d}", "campaignId": campaign_id, "segment": segment, "createdAt": n}
+
+
+def pages(fetch, limit):
+    items, cursor = [], None
+    while True:
+        page, cursor = fetch(limit=limit, cursor=cursor)
+        items.append([item["id"] for item in page])
+        if cursor is None:
+            return items
+
+
+def test_campaigns_persist_across_reopen(tmp_path):
+    path = str(tmp_path / "db" / "orchestrator.db")
+    store = CampaignStore(path)
+    store.create_campaign(campaign(1))
+    store.add_variants([variant(1), variant(2, "agent")])
+    store.close()
+
+    reopened = CampaignStore(path)
+    assert reopened.get_campaign("camp_01")["name"] == "c1"
+    assert reopened.count_variants("camp_01") == 2
+
+
+def test_update_merges_changes_and_misses_unknown_ids():
+    store = CampaignStore(":memory:")
+    store.create_campaign(campaign(1))
+    updated = store.update_campaign("camp_01", status="running", agentsActive=3)
+    assert updated == {**campaign(1), "status": "running", "agentsActive": 3}
+    assert store.get_campaign("camp_01") == updated
+    assert store.list_campaigns(status="running")[0] == [updated]
+    assert store.list_campaigns(status="draft")[0] == []
+    assert store.update_campaign("camp_missing", status="paused") is None
+
+
+def test_keyset_pages_are_newest_first_and_break_ties_by_id():
+    store = CampaignStore(":memory:")
+    for n in range(1, 6):
+        store.create_campaign(campaign(n, created_at=100 if n > 2 else n))
+    assert pages(store.list_campaigns, 2) == [["camp_05", "camp_04"], ["camp_03", "camp_02"], ["camp_01"]]
+
+    store.add_variants([variant(n, "agent" if n % 2 else "human") for n in range(1, 6)])
+    store.add_variants([variant(9, campaign_id="camp_02")])
+    assert pages(lambda **kw: store.list_variants("camp_01", "agent", **kw), 2) == [["var_05", "var_03"], ["var_01"]]
+
+
+def test_failed_bulk_insert_adds_no_variants():
+    store = CampaignStore(":memory:")
+    store.add_variants([variant(1)])
+    with pytest.raises(sqlite3.IntegrityError):
+        store.add_variants([variant(2), variant(1)])
+    assert store.count_variants("camp_01") == 1
+
+
+def test_cursor_round_trips_and_rejects_garbage():
+    assert decode_cursor(encode_cursor(5, "camp_05")) == (5, "camp_05")
+    store = CampaignStore(":memory:")
+    for cursor in ("!!!", base64.urlsafe_b64encode(b"5").decode(), base64.urlsafe_b64encode(b'["x", 1]').decode()):
+        with pytest.raises(InvalidCursor):
+            store.list_campaigns(cursor=cursor)
+
+
+@pytest.fixture
+def client(orchestrator, monkeypatch):
+    monkeypatch.setattr(orchestrator, "campaign_store", CampaignStore(":memory:"))
+    return TestClient(orchestrator.app)
+
+
+def test_campaign_lifecycle_over_http(client):
+    created = [
+        client.post("/campaigns", json={"name": f"c{n}", "goal": {"type": "conversions"}, "segments": ["human", "agent"]}).json()
+        for n in range(3)
+    ]
+    first = client.get("/campaigns", params={"limit": 2})
+    assert len(first.json()) == 2 and 'rel="next"' in first.headers["link"]
+    rest = client.get("/campaigns", params={"limit": 2, "cursor": first.headers["x-next-cursor"]})
+    assert "x-next-cursor" not in rest.headers
+    assert {c["id"] for c in first.json() + rest.json()} == {c["id"] for c in created}
+
+    campaign_id = created[0]["id"]
+    assert client.post(f"/campaigns/{campaign_id}/deploy").json()["agentsCreated"] == 6
+    assert len(client.get(f"/campaigns/{campaign_id}/variants", params={"segment": "agent"}).json()) == 3
+    assert client.post(f"/campaigns/{campaign_id}/pause").json() == {"success": True}
+    assert [c["id"] for c in client.get("/campaigns", params={"status": "paused"}).json()] == [campaign_id]
+    assert client.post(f"/campaigns/{campaign_id}/resume").json() == {"success": True}
+
+
+def test_unknown_campaigns_are_404_and_bad_cursors_400(client):
+    assert client.post("/campaigns/camp_missing/pause").status_code == 404
+    assert client.post("/campaigns/camp_missing/resume").status_code == 404
+    assert client.post("/campaigns/camp_missing/deploy").status_code == 404
+    assert client.get("/campaigns", params={"cursor": "!!!"}).status_code == 400
+    assert client.get("/campaigns/camp_missing/variants", params={"cursor": "!!!"}).status_code == 400
@@ -0,0 +1,144 @@
+import asyncio
+import os
+import time
+
+import pytest
+from starlette.testclient import TestClient
+
+from content_cache import ContentCache, normalize_context
+from conftest import content_request, run
+
+
+def test_equivalent_contexts_share_a_key():
+    cache = ContentCache()
+    key = cache.make_key("prompt", "Headline", {"Page": "Pricing ", "score": 0.501, "ts": 1}, 0.71, "m")
+    assert key == cache.make_key("prompt", "headline", {"Page": "pricing", "score": 0.50, "ts": 2}, 0.69, "m")
+    assert key != cache.make_key("prompt", "headline", {"Page": "home"}, 0.7, "m")
+    assert normalize_context({"q": " Shoes ", "nonce": "x", "n": None}) == {"q": "shoes"}
+
+
+def test_alternatives_are_capped_distinct_and_expire(monkeypatch):
+    cache = ContentCache(max_alternatives=2, ttl_seconds=60)
+
+    async def scenario():
+        assert await cache.lookup("k") is None
+        for content in ("a", "a", "b", "c"):
+            await cache.add("k", content)
+        served = {(await cache.lookup("k"))["content"] for _ in range(20)}
+        assert served == {"a", "b"}
+        assert await cache.missing("k") == 0
+
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now + 61)
+        assert await cache.lookup("k") is None
+
+    run(scenario())
+    assert (cache.hits, cache.misses) == (20, 2)
+
+
+def test_memory_tier_is_lru_bounded():
+    cache = ContentCache(max_entries=2)
+
+    async def scenario():
+        for key in ("a", "b"):
+            await cache.add(key, key)
+        await cache.lookup("a")
+        await cache.add("c", "c")
+        return [await cache.lookup(key) is not None for key in ("a", "b", "c")]
+
+    assert run(scenario()) == [True, False, True]
+
+
+def test_short_key_is_served_and_topped_up_once_in_the_background():
+    cache = ContentCache(max_alternatives=3)
+    calls = []
+
+    async def refill():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return f"refill {len(calls)}", {"totalTokens": 1}
+
+    async def scenario():
+        await cache.add("k", "first")
+        hits = [await cache.lookup("k", refill=refill) for _ in range(5)]
+        assert all(hit["content"] == "first" for hit in hits)
+        await asyncio.gather(*cache._refills.values())
+        await cache.lookup("k", refill=refill)
+        await asyncio.gather(*cache._refills.values())
+        await cache.lookup("k", refill=refill)
+        assert not cache._refills
+        return len(await cache._load("k"))
+
+    assert run(scenario()) == 3
+    assert len(calls) == 2 and cache.refills == 2
+
+
+def test_failed_refill_is_counted_and_does_not_fail_the_hit():
+    cache = ContentCache(max_alternatives=2)
+
+    async def broken():
+        raise RuntimeError("provider down")
+
+    async def scenario():
+        await cache.add("k", "only")
+        hit = await cache.lookup("k", refill=broken)
+        await asyncio.gather(*cache._refills.values())
+        return hit
+
+    assert run(scenario())["content"] == "only"
+    assert cache.refill_errors == 1
+
+
+def test_disk_tier_survives_restart_and_sweep_removes_expired_files(tmp_path):
+    async def scenario():
+        await ContentCache(disk_dir=str(tmp_path), ttl_seconds=60).add("ab12", "stored")
+        restarted = ContentCache(disk_dir=str(tmp_path), ttl_seconds=60)
+        hit = await restarted.lookup("ab12")
+        return restarted, hit
+
+    restarted, hit = run(scenario())
+    assert hit["content"] == "stored" and restarted.disk_hits == 1
+
+    path = tmp_path / "ab" / "ab12.json"
+    assert restarted.sweep_disk() == 0
+    os.utime(path, (time.time() - 120, time.time() - 120))
+    assert restarted.sweep_disk() == 1 and not path.exists()
+
+
+def test_disk_write_failure_keeps_the_memory_entry(tmp_path, monkeypatch):
+    cache = ContentCache(disk_dir=str(tmp_path))
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(cache, "_write_disk", fail)
+    run(cache.add("k", "kept"))
+    assert cache.disk_errors == 1
+    assert run(cache.lookup("k"))["content"] == "kept"
+
+
+@pytest.fixture
+def orch(orchestrator, monkeypatch):
+    monkeypatch.setattr(orchestrator, "content_cache", ContentCache(max_alternatives=2))
+    return orchestrator
+
+
+def test_generate_content_serves_repeat_requests_from_cache(orch):
+    client = TestClient(orch.app)
+    first = client.post("/generate-content", json=content_request()).json()
+    second = client.post("/generate-content", json=content_request(context={"page": "PRICING", "ts": 5})).json()
+
+    assert first["cached"] is False and first["usage"]["totalTokens"] > 0
+    assert second["cached"] is True and second["content"] == first["content"]
+    assert second["usage"]["totalTokens"] == 0
+
+
+def test_generate_content_failure_is_a_500_and_caches_nothing(orch, monkeypatch):
+    async def broken(**kwargs):
+        raise RuntimeError("upstream exploded")
+
+    monkeypatch.setattr(orch.llm_provider, "complete", broken)
+    response = TestClient(orch.app).post("/generate-content", json=content_request(variantId="v-fail"))
+    assert response.status_code == 500
+    assert "upstream exploded" in response.json()["detail"]
+    assert orch.content_cache.stats()["entries"] == 0
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+from starlette.testclient import TestClient
+
+from content_cache import ContentCache
+from llm_providers import StreamEvent, StubProviderError
+from conftest import content_request
+
+
+def sse_events(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        kind, data = block.split("\n", 1)
+        events.append((kind[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+@pytest.fixture
+def orch(orchestrator, monkeypatch):
+    monkeypatch.setattr(orchestrator, "content_cache", ContentCache(max_alternatives=1))
+    return orchestrator
+
+
+def test_stream_relays_deltas_then_done_and_caches_the_result(orch):
+    client = TestClient(orch.app)
+    response = client.post("/generate-content/stream", json=content_request(variantId="s1"))
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = sse_events(response.text)
+    kinds = [kind for kind, _ in events]
+    assert kinds[0] == "meta" and kinds[-1] == "done" and kinds.count("delta") > 1
+    done = events[-1][1]
+    assert done["content"] == "".join(data["text"] for kind, data in events if kind == "delta")
+    assert done["cached"] is False and done["usage"]["completionTokens"] > 0
+    assert done["timing"]["firstTokenMs"] <= done["timing"]["totalMs"]
+
+    replay = sse_events(client.post("/generate-content/stream", json=content_request(variantId="s1")).text)
+    assert [kind for kind, _ in replay] == ["meta", "delta", "done"]
+    assert replay[1][1]["text"] == done["content"] and replay[2][1]["cached"] is True
+
+    stats = client.get("/generate-content/stream/stats").json()
+    assert stats["samples"] >= 1
+
+
+def test_rate_limit_before_the_first_token_is_retried(orch, monkeypatch):
+    original = orch.llm_provider.stream
+    attempts = []
+
+    def stream(**kwargs):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise StubProviderError(429)
+        return original(**kwargs)
+
+    monkeypatch.setattr(orch.llm_provider, "stream", stream)
+    events = sse_events(TestClient(orch.app).post("/generate-content/stream", json=content_request(variantId="s2")).text)
+    assert events[-1][0] == "done" and len(attempts) == 2
+
+
+def test_failure_mid_stream_ends_with_an_error_event(orch, monkeypatch):
+    async def stream(**kwargs):
+        yield StreamEvent(text="Partial")
+        raise StubProviderError(500)
+
+    monkeypatch.setattr(orch.llm_provider, "stream", stream)
+    events = sse_events(TestClient(orch.app).post("/generate-content/stream", json=content_request(variantId="s3")).text)
+    assert [kind for kind, _ in events] == ["meta", "delta", "error"]
+    assert "HTTP 500" in events[-1][1]["detail"]
+    assert orch.content_cache.stats()["entries"] == 0
@@ -0,0 +1,141 @@
+import asyncio
+import json
+
+import pytest
+from starlette.testclient import TestClient
+
+from creative_jobs import CreativeJobQueue, QueueFullError
+from creative_store import CreativeStore
+from image_cache import ImageDedupCache
+from conftest import run
+
+
+def sse_events(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        kind, data = block.split("\n", 1)
+        events.append((kind[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def test_workers_bound_concurrency_and_publish_progress():
+    state = {"active": 0, "peak": 0}
+
+    async def job(spec, report):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        report(50, "halfway")
+        await asyncio.sleep(0.01)
+        state["active"] -= 1
+        return {"n": spec["n"]}
+
+    async def scenario():
+        queue = CreativeJobQueue(job, workers=2)
+        jobs = [queue.submit({"n": n}) for n in range(5)]
+        updates = [update async for update in queue.subscribe(jobs[0]["id"])]
+        finished = [await queue.wait(j["id"], timeout=1) for j in jobs]
+        stats = queue.stats()
+        await queue.stop()
+        return updates, finished, stats
+
+    updates, finished, stats = run(scenario())
+    assert [u["stage"] for u in updates] == ["queued", "starting", "halfway", "done"]
+    assert updates[-1]["progress"] == 100
+    assert [j["result"] for j in finished] == [{"n": n} for n in range(5)]
+    assert state["peak"] == 2
+    assert (stats["succeeded"], stats["failed"], stats["pending"]) == (5, 0, 0)
+
+
+def test_failed_job_records_the_error_and_the_worker_survives():
+    async def job(spec, report):
+        if spec.get("fail"):
+            raise RuntimeError("model unavailable")
+        return {"ok": True}
+
+    async def scenario():
+        queue = CreativeJobQueue(job, workers=1)
+        bad = queue.submit({"fail": True})
+        good = queue.submit({})
+        results = await queue.wait(bad["id"], timeout=1), await queue.wait(good["id"], timeout=1)
+        await queue.stop()
+        return results
+
+    bad, good = run(scenario())
+    assert (bad["status"], bad["error"]) == ("failed", "model unavailable")
+    assert good["status"] == "succeeded"
+
+
+def test_submit_past_max_pending_raises_and_retention_drops_finished_jobs():
+    async def job(spec, report):
+        return {}
+
+    async def scenario():
+        queue = CreativeJobQueue(job, workers=1, max_pending=2, retention=2)
+        first = queue.submit({})
+        queue.submit({})
+        with pytest.raises(QueueFullError):
+            queue.submit({})
+        await queue.wait(first["id"], timeout=1)
+        await asyncio.sleep(0.01)
+        last = queue.submit({})
+        await queue.wait(last["id"], timeout=1)
+        await queue.stop()
+        return queue, first, last
+
+    queue, first, last = run(scenario())
+    assert queue.get(first["id"]) is None
+    assert queue.get(last["id"])["status"] == "succeeded"
+    assert len(queue.recent()) == 2
+
+
+@pytest.fixture
+def orch(orchestrator, monkeypatch, tmp_path):
+    store = CreativeStore(str(tmp_path))
+    monkeypatch.setattr(orchestrator, "creative_store", store)
+    monkeypatch.setattr(orchestrator, "image_cache", ImageDedupCache(store, index_path=str(tmp_path / "index.json")))
+    monkeypatch.setattr(orchestrator, "creative_jobs", CreativeJobQueue(orchestrator.build_creative, workers=2))
+    return orchestrator
+
+
+def test_async_generation_returns_a_job_and_streams_it_to_done(orch):
+    with TestClient(orch.app) as client:
+        response = client.post("/creatives/generate", json={"async": True, "prompt": "a red bicycle", "campaignId": "c1"})
+        assert response.status_code == 202
+        job = response.json()
+        assert job["eventsUrl"] == f"/creatives/jobs/{job['id']}/events"
+
+        events = sse_events(client.get(job["eventsUrl"]).text)
+        assert events[-1][0] == "done"
+        assert all(kind == "progress" for kind, _ in events[:-1])
+        creative = events[-1][1]["result"]
+        assert "/creatives/assets/" in creative["url"]
+        assert client.get(creative["url"]).status_code == 200
+
+        assert client.get(job["statusUrl"]).json()["status"] == "succeeded"
+        listed = client.get("/creatives/jobs", params={"campaignId": "c1"}).json()
+        assert [j["id"] for j in listed["jobs"]] == [job["id"]]
+
+
+def test_sync_generation_waits_for_the_creative(orch):
+    with TestClient(orch.app) as client:
+        creative = client.post("/creatives/generate", json={"prompt": "a blue kite"}).json()
+    assert creative["status"] == "ready" and creative["cached"] is False
+
+
+def test_failed_generation_falls_back_to_a_placeholder(orch, monkeypatch):
+    async def broken(prompt, aspect_ratio):
+        raise RuntimeError("image model down")
+
+    monkeypatch.setattr(orch.llm_provider, "generate_image", broken)
+    with TestClient(orch.app) as client:
+        creative = client.post("/creatives/generate", json={"prompt": "a green boat"}).json()
+    assert creative["status"] == "error" and creative["error"] == "image model down"
+
+
+def test_unknown_job_is_a_404_and_a_full_queue_a_429(orch, monkeypatch):
+    monkeypatch.setattr(orch, "creative_jobs", CreativeJobQueue(orch.build_creative, max_pending=0))
+    with TestClient(orch.app) as client:
+        assert client.get("/creatives/jobs/job_missing").status_code == 404
+        assert client.get("/creatives/jobs/job_missing/events").status_code == 404
+        response = client.post("/creatives/generate", json={"async": True, "prompt": "x"})
+    assert response.status_code == 429 and response.headers["retry-after"] == "5"
@@ -0,0 +1,75 @@
+import io
+import random
+
+import pytest
+from PIL import Image
+from starlette.testclient import TestClient
+
+from creative_store import CreativeStore
+
+
+def noisy_jpeg(width=800, height=400):
+    rng = random.Random(7)
+    image = Image.frombytes("RGB", (width, height), bytes(rng.getrandbits(8) for _ in range(width * height * 3)))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=95)
+    return buffer.getvalue()
+
+
+def test_put_stores_by_hash_once_with_a_thumbnail(tmp_path):
+    store = CreativeStore(str(tmp_path), thumbnail_size=100)
+    data = noisy_jpeg()
+    meta = store.put(data, "image/jpeg")
+
+    assert meta["name"] == f"{meta['sha256']}.jpg" and meta["bytes"] == len(data)
+    assert (meta["width"], meta["height"]) == (800, 400)
+    assert meta["thumbnail"] != meta["name"] and 0 < meta["thumbnailBytes"] < len(data)
+    with Image.open(store.locate(meta["thumbnail"])[0]) as thumb:
+        assert thumb.size == (100, 50)
+
+    assert store.put(data, "image/jpeg") == meta
+    assert (store.writes, store.dedup_hits) == (1, 1)
+    path, mime, digest = store.locate(meta["name"])
+    assert mime == "image/jpeg" and digest == meta["sha256"]
+
+
+def test_small_or_undecodable_images_are_their_own_thumbnail(tmp_path):
+    store = CreativeStore(str(tmp_path))
+    meta = store.put(b"not really a png", "image/png")
+    assert meta["thumbnail"] == meta["name"] and meta["width"] is None
+    assert store.locate(meta["name"]) is not None
+
+
+def test_locate_rejects_unknown_and_malformed_names(tmp_path):
+    store = CreativeStore(str(tmp_path))
+    assert store.locate("0" * 64 + ".png") is None
+    assert store.locate("../../etc/passwd") is None
+    assert store.locate("ABC.png") is None
+
+
+@pytest.fixture
+def served(orchestrator, monkeypatch, tmp_path):
+    store = CreativeStore(str(tmp_path))
+    monkeypatch.setattr(orchestrator, "creative_store", store)
+    meta = store.put(noisy_jpeg(64, 32), "image/jpeg")
+    return TestClient(orchestrator.app), meta
+
+
+def test_assets_are_served_immutable_with_etag_and_ranges(served):
+    client, meta = served
+    url = f"/creatives/assets/{meta['name']}"
+    response = client.get(url)
+    assert response.status_code == 200 and response.headers["content-type"] == "image/jpeg"
+    assert response.headers["etag"] == f'"{meta["sha256"]}"'
+    assert "immutable" in response.headers["cache-control"]
+    assert len(response.content) == meta["bytes"]
+
+    assert client.get(url, headers={"If-None-Match": f'W/"{meta["sha256"]}"'}).status_code == 304
+    partial = client.get(url, headers={"Range": "bytes=0-9"})
+    assert partial.status_code == 206 and partial.content == response.content[:10]
+
+
+def test_unknown_asset_is_a_404(served):
+    client, _ = served
+    assert client.get("/creatives/assets/" + "f" * 64 + ".png").status_code == 404
+    assert client.get("/creatives/assets/not-a-hash.png").status_code == 404
@@ -0,0 +1,152 @@
+import asyncio
+import contextlib
+import itertools
+import json
+
+import httpx
+import pytest
+
+from conftest import ROOT, load_module, run
+
+
+@pytest.fixture(scope="module")
+def crew():
+    return load_module("crew_main", ROOT / "orchestration" / "crew" / "main.py")
+
+
+def offer(crew, n=0, value_props=("Fast", "Cheap", "Reliable")):
+    return crew.Offer(product=f"Product {n}", value_props=list(value_props), pricing={"starter": "$9"})
+
+
+def collect(crew, offers, **options):
+    async def scenario():
+        return [variant async for variant in crew.generate_variants("c1", offers, **options)]
+
+    return run(scenario())
+
+
+def test_each_offer_yields_rotated_human_and_agent_variants(crew):
+    variants = run(crew.trigger_generation("c1", offer(crew)))
+    human = sorted(v["payload"]["human"]["headline"] for v in variants if v["segment"] == "human")
+    assert human == ["Product 0: Cheap", "Product 0: Fast", "Product 0: Reliable"]
+    agents = [v for v in variants if v["segment"] == "agent"]
+    assert len(agents) == 3 and all(v["agentType"] == "ai_context" for v in agents)
+
+
+def test_enrich_runs_with_bounded_concurrency_over_an_async_catalog(crew):
+    state = {"active": 0, "peak": 0}
+
+    async def enrich(item, variant):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.001)
+        state["active"] -= 1
+        return {**variant, "enriched": True}
+
+    async def catalog():
+        for n in range(10):
+            yield offer(crew, n)
+
+    variants = collect(crew, catalog(), variants_per_offer=2, concurrency=3, enrich=enrich)
+    assert len(variants) == 40 and all(v["enriched"] for v in variants)
+    assert state["peak"] == 3
+
+
+def test_offers_are_pulled_lazily(crew):
+    pulled = []
+
+    def catalog():
+        for n in itertools.count():
+            pulled.append(n)
+            yield offer(crew, n)
+
+    async def scenario():
+        async with contextlib.aclosing(crew.generate_variants("c1", catalog(), concurrency=2)) as stream:
+            return [await anext(stream) for _ in range(5)]
+
+    assert len(run(scenario())) == 5
+    assert len(pulled) < 10
+
+
+def test_failed_templates_are_skipped_and_failed_enrich_keeps_the_template(crew):
+    async def enrich(item, variant):
+        raise RuntimeError("rewrite failed")
+
+    variants = collect(crew, [offer(crew, 0, value_props=()), offer(crew, 1)], enrich=enrich)
+    names = sorted(v["name"] for v in variants)
+    # An offer without value props has no human copy, but its agent payload still builds
+    assert names.count("Product 0 agent #1") == 1 and not any(n.startswith("Product 0 human") for n in names)
+    assert sum(n.startswith("Product 1") for n in names) == 6
+
+
+def test_catalog_errors_surface_after_queued_variants(crew):
+    def catalog():
+        yield offer(crew)
+        raise ValueError("bad catalog line")
+
+    seen = []
+
+    async def scenario():
+        async for variant in crew.generate_variants("c1", catalog()):
+            seen.append(variant)
+
+    with pytest.raises(ValueError, match="bad catalog line"):
+        run(scenario())
+    assert len(seen) == 6
+
+
+def test_read_offers_streams_a_jsonl_file(crew, tmp_path):
+    path = tmp_path / "offers.jsonl"
+    path.write_text(json.dumps({"product": "A", "value_props": ["x"], "pricing": {}}) + "\n\n")
+    assert [o.product for o in crew.read_offers(str(path))] == ["A"]
+
+
+def convex(bulk=200, single=200):
+    state = {"bulk": 0, "single": 0, "active": 0, "peak": 0}
+
+    async def handler(request):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.005)
+        state["active"] -= 1
+        if request.url.path == "/admin/createVariants":
+            state["bulk"] += 1
+            variants = json.loads(request.content)["variants"]
+            return httpx.Response(bulk, json={"ids": [f"id{i}" for i in range(len(variants))]})
+        state["single"] += 1
+        return httpx.Response(single, json={"id": "one"})
+
+    return handler, state
+
+
+def push(crew, handler, offers=3, **writer_options):
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            writer = crew.ConvexVariantWriter(client, "http://convex.test/", "secret", **writer_options)
+            return await crew.push_variants("c1", [offer(crew, n) for n in range(offers)], writer)
+
+    return run(scenario())
+
+
+def test_writer_batches_with_bounded_in_flight_writes(crew):
+    handler, state = convex()
+    assert push(crew, handler, batch_size=4, max_in_flight=2) == {"written": 18, "failed": 0, "batches": 5}
+    assert state["bulk"] == 5 and state["single"] == 0 and state["peak"] <= 2
+
+
+def test_rejected_batch_is_retried_as_single_writes(crew):
+    handler, state = convex(bulk=400)
+    assert push(crew, handler, offers=1, batch_size=6) == {"written": 6, "failed": 0, "batches": 1}
+    assert state["single"] == 6
+
+
+def test_missing_bulk_endpoint_switches_to_single_writes(crew):
+    handler, state = convex(bulk=404)
+    assert push(crew, handler, offers=2, batch_size=6, max_in_flight=1)["written"] == 12
+    assert state["bulk"] == 1 and state["single"] == 12
+
+
+def test_batch_with_unknown_outcome_is_not_written_twice(crew):
+    handler, state = convex(bulk=503)
+    assert push(crew, handler, offers=1, batch_size=6) == {"written": 0, "failed": 6, "batches": 1}
+    assert state["single"] == 0
@@ -0,0 +1,41 @@
+import json
+
+import pytest
+from fastapi.responses import JSONResponse
+from starlette.testclient import TestClient
+
+import fast_json
+from fast_json import FastJSONResponse
+from conftest import ROOT, load_module
+
+PAYLOAD = {"variants": [{"_id": "v1", "score": 0.25, "tags": ["a", "é"], "meta": None, "ok": True}]}
+
+
+def test_renders_the_same_bytes_as_the_stdlib_response():
+    assert FastJSONResponse(PAYLOAD).body == JSONResponse(PAYLOAD).body
+
+
+@pytest.mark.skipif(fast_json.orjson is None, reason="orjson not installed")
+def test_uses_orjson_and_accepts_non_string_keys():
+    assert fast_json.encoder_name() == "orjson"
+    assert json.loads(FastJSONResponse({1: "one"}).body) == {"1": "one"}
+
+
+def test_falls_back_for_values_orjson_rejects():
+    huge = 2 ** 70
+    assert json.loads(FastJSONResponse({"n": huge}).body) == {"n": huge}
+
+
+def test_works_without_orjson(monkeypatch):
+    monkeypatch.setattr(fast_json, "orjson", None)
+    assert fast_json.encoder_name() == "json"
+    assert FastJSONResponse(PAYLOAD).body == JSONResponse(PAYLOAD).body
+
+
+def test_services_use_it_as_the_default_response_class():
+    bandit = load_module("bandit_app", ROOT / "services" / "bandit" / "app.py")
+    assert bandit.app.router.default_response_class is FastJSONResponse
+    response = TestClient(bandit.app).post("/select", json={"campaignId": "c", "segment": "s", "arms": ["v1"]})
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == {"variantId": "v1", "explore": True}
+    assert TestClient(bandit.app).post("/select", json={"campaignId": "c", "segment": "s", "arms": []}).status_code == 400
@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+import httpx
+from starlette.testclient import TestClient
+
+CAMPAIGN = {"name": "Spring", "segments": ["human"], "agents_per_type": 3}
+
+
+def orchestrator_handler(state, fail_type=None):
+    async def handler(request):
+        if request.url.path == "/api/campaigns":
+            return httpx.Response(200, json={"campaignId": "c1"})
+        body = json.loads(request.content)
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.01)
+        state["active"] -= 1
+        if body["agentType"] == fail_type:
+            return httpx.Response(500)
+        return httpx.Response(200, json={"agents": [{"id": i} for i in range(body["count"])]})
+
+    return handler
+
+
+def final_event(client, events_url):
+    events = client.get(events_url).text.strip().split("\n\n")
+    kind, data = events[-1].split("\n")
+    assert kind == "event: done"
+    return json.loads(data[len("data: "):])
+
+
+def test_plan_splits_each_type_and_segment_into_bounded_batches(gateway, monkeypatch):
+    monkeypatch.setattr(gateway, "CAMPAIGN_FANOUT_BATCH_SIZE", 10)
+    req = gateway.CreateCampaignRequest(name="x", segments=["human", "agent"], agents_per_type=25)
+    batches = gateway.plan_agent_batches(req)
+    assert len(batches) == 2 * len(gateway.AGENT_TYPES) * 3
+    assert [b["count"] for b in batches[:3]] == [10, 10, 5]
+    assert sum(b["count"] for b in batches) == 2 * len(gateway.AGENT_TYPES) * 25
+
+
+def test_campaign_returns_before_fanout_and_batches_run_concurrently(gateway, mock_http, monkeypatch):
+    monkeypatch.setattr(gateway, "CAMPAIGN_FANOUT_CONCURRENCY", 3)
+    state = {"active": 0, "peak": 0}
+    mock_http(orchestrator_handler(state))
+
+    with TestClient(gateway.app) as client:
+        created = client.post("/api/campaigns", json=CAMPAIGN).json()
+        assert created["status"] == "creating_agents"
+        assert created["agentsRequested"] == 3 * len(gateway.AGENT_TYPES)
+        job = final_event(client, created["eventsUrl"])
+
+    assert job["status"] == "completed"
+    assert job["agentsCreated"] == 3 * len(gateway.AGENT_TYPES)
+    assert state["peak"] == 3
+
+
+def test_failed_batches_leave_a_partial_job(gateway, mock_http):
+    mock_http(orchestrator_handler({"active": 0, "peak": 0}, fail_type="visual"))
+
+    with TestClient(gateway.app) as client:
+        created = client.post("/api/campaigns", json=CAMPAIGN).json()
+        job = final_event(client, created["eventsUrl"])
+        assert client.get(created["statusUrl"]).json() == job
+
+    assert job["status"] == "partial"
+    assert job["errors"] == [{"agentType": "visual", "segment": "human", "error": "orchestrator returned 500"}]
+    assert job["agentsCreated"] == 3 * (len(gateway.AGENT_TYPES) - 1)
+
+
+def test_convex_failure_creates_no_job(gateway, mock_http):
+    mock_http(lambda request: httpx.Response(400))
+    response = TestClient(gateway.app).post("/api/campaigns", json=CAMPAIGN)
+    assert response.status_code == 500
+    assert not gateway.CAMPAIGN_JOBS
+    assert TestClient(gateway.app).get("/api/jobs/job_missing").status_code == 404
@@ -0,0 +1,58 @@
+import sys
+
+import pytest
+from starlette.testclient import TestClient
+
+from conftest import route
+
+CONVEX = {
+    "/api/campaigns/c1/variants": {"variants": [{"_id": "v1"}, {"_id": "v2"}]},
+    "/api/assignments": {"assignmentId": "a1"},
+    "/api/assignments/a1": {"campaignId": "c1", "segment": "human", "variantId": "v1"},
+    "/api/events": {"ok": True},
+}
+
+
+@pytest.fixture
+def embedded(load_gateway):
+    return load_gateway(BANDIT_MODE="embedded")
+
+
+def test_embedded_mode_selects_and_rewards_in_process(embedded, mock_http):
+    mock_http(route(CONVEX))
+    client = TestClient(embedded.app)
+
+    body = client.post("/api/assign", json={"campaignId": "c1"}).json()
+    assert body["variantId"] in {"v1", "v2"} and body["degraded"] is False
+    assert client.post("/api/events", json={"assignmentId": "a1", "eventType": "click"}).json()["ok"]
+
+    assert not [r for r in mock_http.requests if r.url.host == "bandit.test"]
+    arms = embedded.embedded_bandit.store._mem["arms:c1:human"]
+    assert set(arms) == {"v1", "v2"}
+    assert (arms["v1"].alpha, arms["v1"].beta) == (2.0, 1.0)
+
+
+def test_embedded_bandit_failure_falls_back_to_local_sample(embedded, mock_http, monkeypatch):
+    async def broken(*args):
+        raise ConnectionError("store down")
+
+    monkeypatch.setattr(embedded.embedded_bandit, "thompson_select", broken)
+    monkeypatch.setattr(embedded.embedded_bandit, "apply_reward", broken)
+    mock_http(route(CONVEX))
+    client = TestClient(embedded.app)
+
+    body = client.post("/api/assign", json={"campaignId": "c1"}).json()
+    assert body["degraded"] is True and body["explore"] is True
+    response = client.post("/api/events", json={"assignmentId": "a1", "eventType": "convert"})
+    assert response.status_code == 200
+
+
+def test_redis_url_without_redis_package_fails_at_startup(load_gateway, monkeypatch):
+    monkeypatch.setitem(sys.modules, "redis", None)
+    monkeypatch.setitem(sys.modules, "redis.asyncio", None)
+    with pytest.raises(RuntimeError, match="redis package is not installed"):
+        load_gateway(BANDIT_MODE="embedded", REDIS_URL="redis://localhost:6379/0")
+
+
+def test_http_mode_does_not_load_the_bandit(gateway):
+    assert gateway.embedded_bandit is None
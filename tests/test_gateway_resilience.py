@@ -0,0 +1,124 @@
+import asyncio
+
+import httpx
+import pytest
+from starlette.testclient import TestClient
+
+from conftest import route, run
+
+VARIANTS = {"variants": [{"_id": "v1", "headline": "One"}, {"_id": "v2", "headline": "Two"}]}
+
+
+def test_breaker_opens_after_threshold_and_closes_on_probe_success(gateway):
+    breaker = gateway.CircuitBreaker(failure_threshold=2, reset_seconds=0, half_open_probes=1)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    assert breaker.allow()  # reset window elapsed: one probe
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_open_breaker_rejects_without_calling_upstream(gateway, mock_http):
+    mock_http(lambda request: httpx.Response(500))
+    upstream = gateway.Upstream("bandit", max_concurrency=4)
+    upstream.breaker = gateway.CircuitBreaker(failure_threshold=1, reset_seconds=60, half_open_probes=1)
+
+    async def scenario():
+        async with httpx.AsyncClient() as client:
+            await upstream.request(client, "GET", "http://bandit.test/health")
+            with pytest.raises(gateway.UpstreamUnavailable) as excinfo:
+                await upstream.request(client, "GET", "http://bandit.test/health")
+        return excinfo.value
+
+    exc = run(scenario())
+    assert exc.reason == "circuit open" and exc.retry_after > 1
+    assert len(mock_http.requests) == 1
+    assert upstream.rejected == 1
+
+
+def test_full_bulkhead_sheds_instead_of_queueing(gateway, monkeypatch):
+    monkeypatch.setattr(gateway, "UPSTREAM_QUEUE_TIMEOUT", 0.01)
+    upstream = gateway.Upstream("convex", max_concurrency=1)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def slow(request):
+            await release.wait()
+            return httpx.Response(200)
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(slow)) as client:
+            first = asyncio.create_task(upstream.request(client, "GET", "http://convex.test/a"))
+            while upstream.in_flight == 0:
+                await asyncio.sleep(0)
+            with pytest.raises(gateway.UpstreamUnavailable) as excinfo:
+                await upstream.request(client, "GET", "http://convex.test/b")
+            release.set()
+            assert (await first).status_code == 200
+        return excinfo.value
+
+    assert run(scenario()).reason == "concurrency limit reached"
+    assert upstream.shed == 1 and upstream.in_flight == 0
+    assert upstream.breaker.state == "closed"
+
+
+def test_assign_serves_cached_catalog_and_local_sample_when_upstreams_fail(gateway, mock_http):
+    healthy = {
+        "/api/campaigns/c1/variants": VARIANTS,
+        "/select": {"variantId": "v2", "explore": False},
+        "/api/assignments": {"assignmentId": "a1"},
+    }
+    mock_http(route(healthy))
+    client = TestClient(gateway.app)
+    first = client.post("/api/assign", json={"campaignId": "c1"}).json()
+    assert first == {
+        "assignmentId": "a1", "variantId": "v2", "variant": VARIANTS["variants"][1],
+        "explore": False, "degraded": False,
+    }
+
+    mock_http(route({"/api/assignments": {"assignmentId": "a2"}, "/api/campaigns/c1/variants": httpx.Response(503)}))
+    second = client.post("/api/assign", json={"campaignId": "c1"}).json()
+    assert second["degraded"] is True and second["explore"] is True
+    assert second["variantId"] in {"v1", "v2"} and second["assignmentId"] == "a2"
+
+
+def test_assign_without_catalog_returns_503_when_convex_is_down(gateway, mock_http):
+    def refuse(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    mock_http(refuse)
+    response = TestClient(gateway.app).post("/api/assign", json={"campaignId": "c1"})
+    assert response.status_code == 503
+    assert response.json()["detail"] == "Upstream 'convex' unavailable"
+    assert "Retry-After" in response.headers
+
+
+def test_assign_omits_assignment_id_when_the_write_fails(gateway, mock_http):
+    mock_http(route({
+        "/api/campaigns/c1/variants": VARIANTS,
+        "/select": {"variantId": "v1"},
+        "/api/assignments": httpx.Response(500),
+    }))
+    body = TestClient(gateway.app).post("/api/assign", json={"campaignId": "c1"}).json()
+    assert "assignmentId" not in body
+    assert body["variantId"] == "v1" and body["degraded"] is True
+
+
+def test_local_arms_only_learn_while_breaker_is_open_and_stay_bounded(gateway, monkeypatch):
+    monkeypatch.setattr(gateway, "LOCAL_ARMS_MAX_KEYS", 2)
+    gateway.record_local_reward("c0", "human", "v1", 1.0)
+    assert not gateway.LOCAL_ARMS
+
+    gateway.UPSTREAMS["bandit"].breaker.state = "open"
+    for campaign in ("c1", "c2", "c1", "c3"):
+        gateway.record_local_reward(campaign, "human", "v1", 1.0)
+    assert list(gateway.LOCAL_ARMS) == [("c1", "human"), ("c3", "human")]
+    assert gateway.LOCAL_ARMS[("c1", "human")]["v1"] == [3.0, 1.0]
+
+    gateway.record_local_reward("c1", "human", "v1", -1.0)
+    assert gateway.LOCAL_ARMS[("c1", "human")]["v1"] == [3.0, 2.0]
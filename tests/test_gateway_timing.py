@@ -0,0 +1,60 @@
+import re
+
+import httpx
+from starlette.testclient import TestClient
+
+from conftest import route
+
+CONVEX = {
+    "/api/campaigns/c1/variants": {"variants": [{"_id": "v1"}]},
+    "/select": {"variantId": "v1"},
+    "/api/assignments": {"assignmentId": "a1"},
+}
+
+
+def test_debug_timing_header_returns_upstream_breakdown(gateway, mock_http, monkeypatch):
+    monkeypatch.setattr(gateway, "TIMING_SAMPLE_RATE", 0.0)
+    mock_http(route(CONVEX))
+    response = TestClient(gateway.app).post(
+        "/api/assign", json={"campaignId": "c1"}, headers={"X-Debug-Timing": "1"}
+    )
+
+    names = [entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")]
+    assert names == ["convex_variants", "bandit_select", "convex_assignment", "total"]
+    assert all(re.fullmatch(r"[a-z_]+;dur=\d+\.\d", e) for e in response.headers["Server-Timing"].split(", "))
+
+    metrics = TestClient(gateway.app).get("/metrics").text
+    assert 'gateway_request_duration_seconds_count{route="/api/assign"} 1' in metrics
+    assert 'gateway_upstream_duration_seconds_count{route="/api/assign",upstream="bandit",span="bandit_select"} 1' in metrics
+
+
+def test_unsampled_requests_are_not_timed(gateway, mock_http, monkeypatch):
+    monkeypatch.setattr(gateway, "TIMING_SAMPLE_RATE", 0.0)
+    mock_http(route(CONVEX))
+    response = TestClient(gateway.app).post("/api/assign", json={"campaignId": "c1"})
+    assert response.status_code == 200
+    assert "Server-Timing" not in response.headers
+    assert not gateway.REQUEST_HISTOGRAMS
+
+
+def test_failed_upstream_call_still_records_its_span(gateway, mock_http):
+    def refuse(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    mock_http(refuse)
+    response = TestClient(gateway.app).post(
+        "/api/assign", json={"campaignId": "c1"}, headers={"X-Debug-Timing": "1"}
+    )
+    assert response.status_code == 503
+    assert response.headers["Server-Timing"].startswith("convex_variants;dur=")
+
+
+def test_histogram_buckets_are_cumulative(gateway):
+    histogram = gateway.LatencyHistogram()
+    for duration_ms in (0.5, 3, 3, 20000):
+        histogram.observe(duration_ms)
+    lines = histogram.render("h", 'route="/x"')
+    assert 'h_bucket{route="/x",le="0.001"} 1' in lines
+    assert 'h_bucket{route="/x",le="0.005"} 3' in lines
+    assert 'h_bucket{route="/x",le="10"} 3' in lines
+    assert 'h_bucket{route="/x",le="+Inf"} 4' in lines
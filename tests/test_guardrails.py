@@ -0,0 +1,152 @@
+import json
+import random
+import re
+
+import httpx
+import pytest
+from starlette.testclient import TestClient
+
+from guardrails import DEFAULT_BANNED_TERMS, GuardrailEngine, TermAutomaton, has_errors
+from conftest import ROOT, content_request
+
+
+def policy_banned_terms():
+    source = (ROOT / "generators" / "guardrails" / "policy.ts").read_text()
+    match = re.search(r"const BANNED\s*=\s*\[(.*?)\];", source, re.S)
+    assert match, "BANNED list not found in policy.ts"
+    return re.findall(r"\"([^\"]*)\"", match.group(1))
+
+
+def oracle(terms, text):
+    """policy.ts: text.toLowerCase().includes(term)."""
+    return {term for term in terms if term in text.lower()}
+
+
+def flagged(issues):
+    return {issue["message"].removeprefix("contains banned term: ") for issue in issues if "banned" in issue["message"]}
+
+
+def test_python_terms_match_policy_ts():
+    assert list(DEFAULT_BANNED_TERMS) == policy_banned_terms()
+
+
+def test_automaton_agrees_with_the_policy_ts_substring_rule():
+    terms = policy_banned_terms()
+    engine = GuardrailEngine(terms)
+    fixed = [
+        "Results GUARANTEED", "cured overnight", "Secure checkout", "Free  forever", "FREE FOREVER!",
+        "guarante", "a cure-all, guaranteed, free forever", "", "ccure", "free foreverguarantee",
+    ]
+    rng = random.Random(11)
+    alphabet = "guaranteecurfo vGCEF"
+    fuzzed = ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40))) for _ in range(500)]
+    for text in fixed + fuzzed:
+        assert flagged(engine.validate_text(text)) == oracle(terms, text), text
+
+
+def test_find_reports_overlapping_occurrences_with_their_start():
+    automaton = TermAutomaton(["he", "she", "hers", "HE"])
+    assert automaton.terms == ["he", "she", "hers"]
+    assert automaton.find("uSHErs") == [("she", 1), ("he", 2), ("hers", 2)]
+    assert TermAutomaton([]).find("anything") == []
+
+
+def test_copy_issues_are_reported_on_the_field_and_spanning_terms_on_text():
+    engine = GuardrailEngine()
+    copy = {
+        "headline": "Hi",
+        "subhead": "x" * 161,
+        # "free forever" only occurs in the text policy.ts scans: bullets joined by spaces
+        "bullets": ["Guaranteed results", "Free", "forever"],
+        "cta": {"label": "Cure it", "url": "ftp://example.com"},
+    }
+    issues = engine.validate_copy(copy, prefix="human.")
+    assert {(i["field"], i["message"]) for i in issues} == {
+        ("human.headline", "headline too short"),
+        ("human.subhead", "subhead too long"),
+        ("human.bullets[0]", "contains banned term: guarantee"),
+        ("human.cta.label", "contains banned term: cure"),
+        ("human.text", "contains banned term: free forever"),
+        ("human.cta.url", "cta url must be http(s)"),
+    }
+    assert has_errors(issues) and not has_errors([i for i in issues if i["severity"] == "warn"])
+
+
+def test_agent_payload_checks_tolerate_malformed_jsonld():
+    engine = GuardrailEngine()
+    good = {"agent": {"jsonld": {"@context": "https://schema.org"}}}
+    batch = engine.validate_batch([
+        good,
+        {"agent": {"jsonld": "https://schema.org"}},
+        {"agent": {"jsonld": ["x"]}},
+        {"agent": None},
+        {"human": {"headline": "Widgets that last"}},
+    ])
+    assert batch[0] == [] and batch[4] == []
+    assert [i["field"] for i in batch[1] + batch[2]] == ["agent.jsonld.@context"] * 2
+    assert batch[3] == [{"field": "agent", "message": "missing agent payload", "severity": "error"}]
+
+
+BREED = {"campaignId": "c1", "parentIds": ["p1", "p2"], "targetGeneration": 2, "mutationRate": 0.0}
+
+
+def parent(variant_id, headline):
+    config = content_request()["agentConfig"]
+    config["strategy"]["tactics"] = ["social_proof", "urgency"]
+    return {
+        "_id": variant_id,
+        "agentType": "landing_page",
+        "segment": "human",
+        "agentConfig": config,
+        "payload": {
+            "human": {"headline": headline, "bullets": [], "cta": {"label": "Buy", "url": "https://example.com"}},
+            "agent": {"jsonld": "not an object"},
+        },
+    }
+
+
+def convex(headline, written):
+    def handler(request):
+        path = request.url.path
+        if path == "/queries:getVariantsByIds":
+            return httpx.Response(200, json=[parent(i, headline) for i in request.url.params["ids"].split(",")])
+        if path == "/admin/upsertPrompts":
+            return httpx.Response(200, json={"ok": True})
+        if path == "/admin/createVariants":
+            variants = json.loads(request.content)["variants"]
+            written.extend(variants)
+            return httpx.Response(200, json={"ids": [f"child{i}" for i in range(len(variants))]})
+        return httpx.Response(404)
+
+    return handler
+
+
+@pytest.fixture
+def orch(orchestrator, monkeypatch):
+    monkeypatch.setattr(orchestrator, "NEAR_DUP_MODE", "off")
+    monkeypatch.setattr(orchestrator, "_bulk_variant_reads_supported", True)
+    monkeypatch.setattr(orchestrator, "_bulk_variants_supported", True)
+    return orchestrator
+
+
+def test_flag_mode_annotates_offspring_and_still_writes_them(orch, monkeypatch, mock_http):
+    written = []
+    monkeypatch.setattr(orch, "GUARDRAIL_MODE", "flag")
+    mock_http(convex("Results guaranteed", written))
+    response = TestClient(orch.app).post("/breed-agents", json=BREED)
+
+    assert response.status_code == 200 and len(written) == 1
+    guardrail = response.json()["agents"][0]["guardrail"]
+    assert guardrail["passed"] is False
+    assert {i["field"] for i in guardrail["issues"]} == {"human.headline", "agent.jsonld.@context"}
+
+
+def test_block_mode_rejects_offspring_with_errors(orch, monkeypatch, mock_http):
+    written = []
+    monkeypatch.setattr(orch, "GUARDRAIL_MODE", "block")
+    mock_http(convex("Results guaranteed", written))
+    response = TestClient(orch.app).post("/breed-agents", json=BREED)
+
+    assert response.status_code == 422 and written == []
+    rejected = response.json()["detail"]["rejected"]
+    assert [r["index"] for r in rejected] == [0]
@@ -0,0 +1,108 @@
+import asyncio
+
+import httpx
+import pytest
+from starlette.testclient import TestClient
+
+import http_pool
+from conftest import run
+
+BREED = {"campaignId": "c1", "parentIds": ["p1", "p2"], "targetGeneration": 2}
+
+
+def flaky(failures, status=503):
+    state = {"calls": 0}
+
+    def handler(request):
+        state["calls"] += 1
+        if state["calls"] <= failures:
+            if status is None:
+                raise httpx.ConnectError("refused", request=request)
+            return httpx.Response(status)
+        return httpx.Response(200, json={"ok": True})
+
+    return handler, state
+
+
+def test_one_pooled_client_per_origin(mock_http):
+    async def scenario():
+        a = http_pool.get_http_client("http://convex.test/admin/x")
+        b = http_pool.get_http_client("http://convex.test/queries:y?z=1")
+        c = http_pool.get_http_client("http://orchestrator.test/breed-agents")
+        await http_pool.close_http_clients()
+        return a, b, c
+
+    a, b, c = run(scenario())
+    assert a is b and a is not c
+    assert a.is_closed and not http_pool._http_clients
+
+
+def test_unsent_post_is_retried(mock_http):
+    handler, state = flaky(2, status=None)
+    mock_http(handler)
+    response = run(http_pool.request_with_retry("POST", "http://convex.test/admin/x", json={}))
+    assert response.status_code == 200 and state["calls"] == 3
+
+
+def test_post_that_reached_the_server_is_not_retried_unless_safe(mock_http):
+    handler, state = flaky(1)
+    mock_http(handler)
+    with pytest.raises(httpx.HTTPStatusError):
+        run(http_pool.request_with_retry("POST", "http://convex.test/admin/x", json={}))
+    assert state["calls"] == 1
+
+    run(http_pool.request_with_retry("POST", "http://convex.test/admin/x", json={}, retry=True))
+    assert state["calls"] == 2
+
+
+def test_get_gives_up_after_the_last_attempt(mock_http):
+    handler, state = flaky(5)
+    mock_http(handler)
+    with pytest.raises(httpx.HTTPStatusError):
+        run(http_pool.request_with_retry("GET", "http://convex.test/q", attempts=3))
+    assert state["calls"] == 3
+
+
+def test_evolution_retries_breeding_only_with_an_idempotency_key(evolution, mock_http):
+    handler, state = flaky(1)
+    mock_http(handler)
+    assert run(evolution.call_orchestrator("breed-agents", BREED, idempotency_key="k1")) == {"ok": True}
+    assert state["calls"] == 2
+    assert {r.headers["Idempotency-Key"] for r in mock_http.requests} == {"k1"}
+
+    handler, state = flaky(1)
+    mock_http(handler)
+    with pytest.raises(httpx.HTTPStatusError):
+        run(evolution.call_orchestrator("create-agents", {}))
+    assert state["calls"] == 1
+
+
+def test_orchestrator_breeds_once_per_idempotency_key(orchestrator, monkeypatch):
+    calls = []
+
+    async def breed(req):
+        calls.append(req.campaignId)
+        await asyncio.sleep(0)
+        if len(calls) == 1:
+            raise RuntimeError("first attempt fails")
+        return {"campaignId": req.campaignId, "agents": [len(calls)]}
+
+    monkeypatch.setattr(orchestrator, "breed_agents", breed)
+    monkeypatch.setattr(orchestrator, "_breed_results", orchestrator.OrderedDict())
+    with TestClient(orchestrator.app, raise_server_exceptions=False) as client:
+        headers = {"Idempotency-Key": "k1"}
+        assert client.post("/breed-agents", json=BREED, headers=headers).status_code == 500
+        first = client.post("/breed-agents", json=BREED, headers=headers).json()
+        again = client.post("/breed-agents", json=BREED, headers=headers).json()
+        other = client.post("/breed-agents", json={**BREED, "campaignId": "c2"}, headers=headers).json()
+
+    assert first == again == {"campaignId": "c1", "agents": [2]}
+    assert other == {"campaignId": "c2", "agents": [3]}
+    assert calls == ["c1", "c1", "c2"]
+
+
+def test_lifespan_closes_pooled_clients(orchestrator, mock_http):
+    with TestClient(orchestrator.app):
+        http_pool.get_http_client("http://convex.test/x")
+        assert http_pool._http_clients
+    assert not http_pool._http_clients
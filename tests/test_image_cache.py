@@ -0,0 +1,184 @@
+import asyncio
+import io
+import json
+import os
+import time
+
+import pytest
+from PIL import Image
+from starlette.testclient import TestClient
+
+from creative_store import CreativeStore
+from image_cache import ImageDedupCache
+from conftest import run
+
+
+def creator(store, calls):
+    async def create():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return store.put(f"image {len(calls)}".encode(), "image/png")
+
+    return create
+
+
+def age(store, meta, seconds):
+    past = time.time() - seconds
+    os.utime(store._meta_path(meta["sha256"]), (past, past))
+
+
+def solid_jpeg(quality):
+    buffer = io.BytesIO()
+    Image.new("RGB", (800, 400), (200, 30, 30)).save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def test_equivalent_prompts_share_one_generation(tmp_path):
+    store = CreativeStore(str(tmp_path))
+    cache = ImageDedupCache(store)
+    calls = []
+    key = cache.make_key("A  red Bicycle ", "16:9", "stub")
+    assert key == cache.make_key("a red bicycle", "16:9", "stub")
+    assert key != cache.make_key("a red bicycle", "1:1", "stub")
+
+    async def scenario():
+        together = await asyncio.gather(*(cache.get_or_create(key, creator(store, calls)) for _ in range(3)))
+        later = await cache.get_or_create(key, creator(store, calls))
+        return together, later
+
+    together, later = run(scenario())
+    assert len(calls) == 1
+    assert [cached for _, cached in together] == [False, True, True]
+    assert later == (together[0][0], True)
+    assert (cache.misses, cache.coalesced, cache.hits) == (1, 2, 1)
+
+
+def test_eviction_forgets_keys_but_never_deletes_images(tmp_path):
+    store = CreativeStore(str(tmp_path))
+    cache = ImageDedupCache(store, max_entries=2)
+    calls = []
+
+    async def scenario():
+        return [(await cache.get_or_create(f"k{n}", creator(store, calls)))[0] for n in range(4)]
+
+    images = run(scenario())
+    assert cache.evictions == 2 and cache.stats()["entries"] == 2
+    assert all(store.exists(meta) for meta in images)
+    assert cache.referenced() == {images[2]["sha256"], images[3]["sha256"]}
+
+
+def test_forced_regeneration_replaces_the_variant_without_deleting_it(tmp_path):
+    store = CreativeStore(str(tmp_path))
+    cache = ImageDedupCache(store)
+    calls = []
+
+    async def scenario():
+        first, _ = await cache.get_or_create("k", creator(store, calls))
+        second, cached = await cache.get_or_create("k", creator(store, calls), use_cache=False)
+        return first, second, cached
+
+    first, second, cached = run(scenario())
+    assert cached is False and first != second
+    assert store.exists(first)
+    assert cache.referenced() == {second["sha256"]}
+
+
+def test_garbage_collection_keeps_referenced_young_and_shared_images(tmp_path):
+    store = CreativeStore(str(tmp_path), thumbnail_size=100)
+    kept, doomed, young = (store.put(f"image {n}".encode(), "image/png") for n in range(3))
+    shared_a, shared_b = store.put(solid_jpeg(95), "image/jpeg"), store.put(solid_jpeg(90), "image/jpeg")
+    assert shared_a["thumbnail"] == shared_b["thumbnail"]
+    for meta in (kept, doomed, shared_a, shared_b):
+        age(store, meta, 3600)
+
+    keep = {kept["sha256"], shared_b["sha256"]}
+    dry = store.collect_garbage(keep, min_age_seconds=60, dry_run=True)
+    assert (dry["deleted"], dry["kept"], dry["dryRun"]) == (2, 3, True)
+    assert store.exists(doomed)
+
+    report = store.collect_garbage(keep, min_age_seconds=60)
+    assert (report["deleted"], report["kept"]) == (2, 3)
+    assert not store.exists(doomed) and not store.exists(shared_a)
+    assert all(store.exists(meta) for meta in (kept, young, shared_b))
+    assert store.locate(shared_b["thumbnail"]) is not None
+
+
+def test_restoring_an_image_refreshes_its_age(tmp_path):
+    store = CreativeStore(str(tmp_path))
+    meta = store.put(b"image", "image/png")
+    age(store, meta, 3600)
+    store.put(b"image", "image/png")
+    assert store.collect_garbage(set(), min_age_seconds=60)["deleted"] == 0
+
+
+def test_index_survives_a_restart_and_skips_deleted_images(tmp_path):
+    store = CreativeStore(str(tmp_path))
+    index = str(tmp_path / "index.json")
+    calls = []
+
+    async def fill():
+        cache = ImageDedupCache(store, index_path=index)
+        return [(await cache.get_or_create(key, creator(store, calls)))[0] for key in ("a", "b")]
+
+    first, second = run(fill())
+    store.delete(second)
+    restarted = ImageDedupCache(store, index_path=index)
+    assert restarted.referenced() == {first["sha256"]}
+    assert run(restarted.get_or_create("a", creator(store, calls))) == (first, True)
+
+
+def test_index_save_failure_is_counted_not_raised(tmp_path):
+    store = CreativeStore(str(tmp_path))
+    cache = ImageDedupCache(store, index_path=str(tmp_path / "missing" / "index.json"))
+    meta, cached = run(cache.get_or_create("k", creator(store, [])))
+    assert cached is False and store.exists(meta)
+    assert cache.stats()["indexErrors"] == 1
+
+
+def test_an_older_snapshot_never_overwrites_a_newer_one(tmp_path):
+    index = tmp_path / "index.json"
+    cache = ImageDedupCache(CreativeStore(str(tmp_path)), index_path=str(index))
+    cache._save_index(2, [("new", [])])
+    cache._save_index(1, [("old", [])])
+    assert json.loads(index.read_text()) == [["new", []]]
+
+
+def test_disabled_cache_passes_through_without_an_index(tmp_path):
+    store = CreativeStore(str(tmp_path))
+    index = tmp_path / "index.json"
+    cache = ImageDedupCache(store, index_path=str(index), enabled=False)
+    calls = []
+
+    async def scenario():
+        return [await cache.get_or_create("k", creator(store, calls)) for _ in range(2)]
+
+    assert [cached for _, cached in run(scenario())] == [False, False]
+    assert len(calls) == 2 and not index.exists() and not cache.referenced()
+
+
+@pytest.fixture
+def orch(orchestrator, monkeypatch, tmp_path):
+    store = CreativeStore(str(tmp_path))
+    monkeypatch.setattr(orchestrator, "creative_store", store)
+    monkeypatch.setattr(orchestrator, "image_cache", ImageDedupCache(store, max_entries=1))
+    return orchestrator
+
+
+def test_gc_endpoint_keeps_what_the_cache_can_serve(orch):
+    store = orch.creative_store
+    calls = []
+
+    async def scenario():
+        return [(await orch.image_cache.get_or_create(key, creator(store, calls)))[0] for key in ("a", "b", "c")]
+
+    evicted, saved, served = run(scenario())
+    for meta in (evicted, saved, served):
+        age(store, meta, 3600)
+
+    client = TestClient(orch.app)
+    body = {"keep": [saved["sha256"]], "minAgeSeconds": 60}
+    assert client.post("/creatives/gc", json={**body, "dryRun": True}).json()["deleted"] == 1
+    assert store.exists(evicted)
+    assert client.post("/creatives/gc", json=body).json() == {"deleted": 1, "bytesFreed": evicted["bytes"], "kept": 2, "dryRun": False}
+    assert not store.exists(evicted) and store.exists(saved) and store.exists(served)
+    assert client.post("/creatives/gc", json={"minAgeSeconds": -1}).status_code == 422
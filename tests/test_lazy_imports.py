@@ -0,0 +1,42 @@
+import json
+import os
+import subprocess
+import sys
+
+from conftest import COMMON_DIR, ORCHESTRATOR_DIR
+
+PROBE = """
+import json, sys
+sys.path[:0] = [{orchestrator!r}, {common!r}]
+import app
+loaded = {{name: name in sys.modules for name in ("openai", "crewai")}}
+{after}
+print(json.dumps(loaded))
+"""
+
+
+def probe(after=""):
+    code = PROBE.format(orchestrator=str(ORCHESTRATOR_DIR), common=str(COMMON_DIR), after=after)
+    env = {**os.environ, "LLM_PROVIDER": "openai"}
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_orchestrator_import_does_not_load_heavy_sdks():
+    assert probe() == {"openai": False, "crewai": False}
+
+
+def test_openai_client_is_created_on_first_use():
+    after = "app.llm_provider.client\nloaded['openai'] = 'openai' in sys.modules"
+    assert probe(after)["openai"] is True
+
+
+def test_missing_openai_sdk_only_fails_the_first_openai_call():
+    after = """sys.modules["openai"] = None
+try:
+    app.llm_provider.client
+except ImportError:
+    loaded["openai"] = "missing"
+"""
+    assert probe(after)["openai"] == "missing"
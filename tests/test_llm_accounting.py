@@ -0,0 +1,208 @@
+import asyncio
+
+import pytest
+from starlette.testclient import TestClient
+
+from content_cache import ContentCache
+from llm_accounting import LLMAccounting, UsageCounters
+from conftest import content_request, route, run
+
+USAGE = {"promptTokens": 10, "completionTokens": 5}
+
+
+class Store:
+    """persist callable; totals() applies each batch id once, like the Convex mutation."""
+
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+        self.block = None
+        self.entered = asyncio.Event()
+
+    async def __call__(self, batch_id, rows):
+        self.entered.set()
+        if self.block is not None:
+            await self.block.wait()
+        if self.fail:
+            raise RuntimeError("store down")
+        self.batches.append((batch_id, rows))
+
+    def totals(self):
+        applied = {}
+        for batch_id, rows in self.batches:
+            applied[batch_id] = rows
+        per_variant = {}
+        for rows in applied.values():
+            for row in rows:
+                per_variant[row["variantId"]] = per_variant.get(row["variantId"], 0) + row["totalTokens"]
+        return per_variant
+
+
+def test_snapshot_rolls_up_by_campaign_and_agent_type():
+    usage = LLMAccounting()
+    usage.record_call("v1", campaign_id="c1", agent_type="landing_page", usage=USAGE, latency_ms=120)
+    usage.record_call("v1", usage=USAGE, latency_ms=80)
+    usage.record_call("v2", campaign_id="c1", agent_type="email", latency_ms=5000, error=True)
+    usage.record_cache_hit("v3", campaign_id="c2", agent_type="email")
+
+    report = usage.snapshot()
+    assert report["totals"]["totalTokens"] == 30 and report["totals"]["errors"] == 1
+    assert report["totals"]["latencyMs"]["max"] == 120
+    assert [(c["campaignId"], c["requests"]) for c in report["byCampaign"]] == [("c1", 3), ("c2", 0)]
+    assert report["variants"][0]["variantId"] == "v1"
+
+    only_email = usage.snapshot(agent_type="email", sort="cacheHits", limit=1)
+    assert only_email["variantCount"] == 2 and only_email["variants"][0]["variantId"] == "v3"
+    with pytest.raises(ValueError):
+        usage.snapshot(sort="cost")
+
+
+def test_latency_percentiles_come_from_the_histogram():
+    counters = UsageCounters()
+    for latency in [40] * 90 + [900] * 10:
+        counters.add_call(None, latency, error=False)
+    # Bucket upper bounds, capped at the largest latency seen
+    assert counters.latency_percentile(50) == 50
+    assert counters.latency_percentile(95) == 900
+
+
+def test_variants_are_lru_bounded():
+    usage = LLMAccounting(max_variants=2)
+    for vid in ("a", "b", "a", "c"):
+        usage.record_call(vid, usage=USAGE)
+    assert {v["variantId"] for v in usage.snapshot()["variants"]} == {"a", "c"}
+    assert usage.stats()["evictions"] == 1
+
+
+def test_flush_writes_deltas_in_chunks_and_retries_failures_with_the_same_batch_id():
+    store = Store()
+    usage = LLMAccounting(persist=store, flush_batch_size=2)
+
+    async def scenario():
+        for vid in ("a", "b", "c"):
+            usage.record_call(vid, campaign_id="c1", usage=USAGE)
+        store.fail = True
+        failed = await usage.flush()
+        store.fail = False
+        usage.record_call("a", campaign_id="c1", usage=USAGE)
+        retried = await usage.flush()
+        return failed, retried
+
+    failed, retried = run(scenario())
+    assert failed == {"written": 0, "failed": 3}
+    assert retried == {"written": 4, "failed": 0}
+    assert len({batch_id for batch_id, _ in store.batches}) == 3
+    assert store.totals() == {"a": 30, "b": 15, "c": 15}
+    assert usage.stats()["pendingVariants"] == 0 and usage.stats()["flushFailures"] == 1
+
+
+def test_cancelled_persist_keeps_unsent_chunks_for_the_next_flush():
+    store = Store()
+    usage = LLMAccounting(persist=store, flush_batch_size=1)
+
+    async def scenario():
+        for vid in ("a", "b"):
+            usage.record_call(vid, campaign_id="c1", usage=USAGE)
+        store.block = asyncio.Event()
+        flush = asyncio.create_task(usage.flush())
+        await store.entered.wait()
+        flush.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await flush
+        assert usage.stats()["unconfirmedBatches"] == 2
+        store.block = None
+        return await usage.flush()
+
+    assert run(scenario()) == {"written": 2, "failed": 0}
+    assert store.totals() == {"a": 15, "b": 15}
+
+
+def test_cancelled_resolve_restores_deltas_ahead_of_newer_ones():
+    store = Store()
+    gate = asyncio.Event()
+    entered = asyncio.Event()
+
+    async def resolve(ids):
+        entered.set()
+        await gate.wait()
+        return {vid: ("c9", "email") for vid in ids}
+
+    usage = LLMAccounting(persist=store, resolve=resolve)
+
+    async def scenario():
+        usage.record_call("a", usage=USAGE)
+        flush = asyncio.create_task(usage.flush())
+        await entered.wait()
+        usage.record_call("a", usage=USAGE)
+        flush.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await flush
+        gate.set()
+        return await usage.flush()
+
+    assert run(scenario()) == {"written": 1, "failed": 0}
+    (_, rows), = store.batches
+    assert (rows[0]["totalTokens"], rows[0]["campaignId"]) == (30, "c9")
+    assert usage.snapshot(campaign_id="c9")["variantCount"] == 1
+
+
+def test_unresolvable_variants_are_looked_up_a_bounded_number_of_times():
+    store = Store()
+    lookups = []
+
+    async def resolve(ids):
+        lookups.append(ids)
+        raise RuntimeError("convex down")
+
+    usage = LLMAccounting(persist=store, resolve=resolve)
+
+    async def scenario():
+        for _ in range(5):
+            usage.record_call("a", usage=USAGE)
+            await usage.flush()
+
+    run(scenario())
+    assert len(lookups) == 3
+    assert len(store.batches) == 5 and all(rows[0]["campaignId"] is None for _, rows in store.batches)
+
+
+def test_stop_flushes_what_is_left():
+    store = Store()
+    usage = LLMAccounting(persist=store, flush_interval_seconds=3600)
+
+    async def scenario():
+        usage.start()
+        usage.record_call("a", campaign_id="c1", usage=USAGE)
+        await usage.stop()
+
+    run(scenario())
+    assert store.totals() == {"a": 15} and not usage.stats()["running"]
+
+
+@pytest.fixture
+def orch(orchestrator, monkeypatch):
+    monkeypatch.setattr(orchestrator, "content_cache", ContentCache(max_alternatives=1))
+    monkeypatch.setattr(orchestrator, "llm_usage", LLMAccounting())
+    return orchestrator
+
+
+def test_generated_and_cached_content_is_reported(orch):
+    client = TestClient(orch.app)
+    client.post("/generate-content", json=content_request(variantId="u1", campaignId="cu"))
+    client.post("/generate-content", json=content_request(variantId="u1", campaignId="cu"))
+
+    report = client.get("/llm-usage", params={"campaignId": "cu"}).json()
+    assert report["totals"]["requests"] == 1 and report["totals"]["cacheHits"] == 1
+    assert report["totals"]["totalTokens"] > 0
+    assert client.get("/llm-usage", params={"sort": "cost"}).status_code == 400
+    assert client.post("/llm-usage/flush").status_code == 409
+
+
+def test_flush_endpoint_writes_to_convex(orch, monkeypatch, mock_http):
+    monkeypatch.setattr(orch, "llm_usage", LLMAccounting(persist=orch.persist_llm_usage))
+    monkeypatch.setattr(orch, "_llm_usage_supported", True)
+    mock_http(route({"/admin/recordLlmUsage": {"ok": True}}))
+    orch.llm_usage.record_call("u2", campaign_id="cu", usage=USAGE)
+
+    assert TestClient(orch.app).post("/llm-usage/flush").json() == {"written": 1, "failed": 0}
+    assert mock_http.paths("POST") == ["/admin/recordLlmUsage"]
@@ -0,0 +1,151 @@
+import asyncio
+
+import pytest
+
+from llm_governor import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, PRIORITY_PREGENERATION, LLMGovernor
+from conftest import run
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+def test_concurrency_limit_is_enforced():
+    governor = LLMGovernor(initial_concurrency=2, max_concurrency=2)
+    state = {"active": 0, "peak": 0}
+
+    async def call():
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.001)
+        state["active"] -= 1
+        return "ok"
+
+    async def scenario():
+        return await asyncio.gather(*(governor.run(call) for _ in range(6)))
+
+    assert run(scenario()) == ["ok"] * 6
+    assert state["peak"] == 2
+    assert governor.stats()["completed"] == 6
+
+
+def test_limit_grows_by_one_per_limit_worth_of_successes():
+    governor = LLMGovernor(initial_concurrency=1, max_concurrency=3)
+
+    async def call():
+        return None
+
+    async def scenario():
+        limits = []
+        for _ in range(6):
+            await governor.run(call)
+            limits.append(governor.limit)
+        return limits
+
+    assert run(scenario()) == [2, 2, 3, 3, 3, 3]
+
+
+def test_queued_calls_are_served_by_priority():
+    governor = LLMGovernor(initial_concurrency=1, max_concurrency=1)
+    order = []
+
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def blocker():
+            await gate.wait()
+
+        def record(name):
+            async def call():
+                order.append(name)
+            return call
+
+        first = asyncio.create_task(governor.run(blocker))
+        await asyncio.sleep(0)
+        queued = [
+            asyncio.create_task(governor.run(record("background"), priority=PRIORITY_BACKGROUND)),
+            asyncio.create_task(governor.run(record("pregeneration"), priority=PRIORITY_PREGENERATION)),
+            asyncio.create_task(governor.run(record("interactive"), priority=PRIORITY_INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)
+        assert governor.stats()["queueDepth"] == {"interactive": 1, "pregeneration": 1, "background": 1}
+        gate.set()
+        await asyncio.gather(first, *queued)
+
+    run(scenario())
+    assert order == ["interactive", "pregeneration", "background"]
+
+
+def test_identical_concurrent_calls_share_one_upstream_request():
+    governor = LLMGovernor()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.001)
+        return "shared"
+
+    async def scenario():
+        return await asyncio.gather(*(governor.run(call, dedup_key="same") for _ in range(4)))
+
+    assert run(scenario()) == ["shared"] * 4
+    assert len(calls) == 1 and governor.deduplicated == 3
+
+
+def test_rate_limit_shrinks_the_limit_and_is_retried():
+    # One decrease per cooldown; the short Retry-After keeps the retries quick
+    governor = LLMGovernor(initial_concurrency=8, cooldown_seconds=60, max_retries=2, retry_after=lambda exc: 0.001)
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RateLimited()
+        return "done"
+
+    assert run(governor.run(call)) == "done"
+    assert governor.limit == 4
+    assert (governor.rate_limited, governor.retried) == (2, 2)
+
+
+def test_rate_limit_beyond_the_retry_budget_is_raised():
+    governor = LLMGovernor(cooldown_seconds=0.01, max_retries=1)
+
+    async def call():
+        raise RateLimited()
+
+    with pytest.raises(RateLimited):
+        run(governor.run(call))
+    assert governor.rate_limited == 2 and governor.in_flight == 0
+
+
+def test_other_errors_are_not_retried_and_cancelled_waiters_free_their_place():
+    governor = LLMGovernor(initial_concurrency=1, max_concurrency=1)
+
+    async def broken():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        run(governor.run(broken))
+    assert governor.failed == 1 and governor.retried == 0
+
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def blocker():
+            await gate.wait()
+            return "first"
+
+        first = asyncio.create_task(governor.run(blocker))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(governor.run(blocker))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        gate.set()
+        assert await first == "first"
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        return await governor.run(blocker)
+
+    assert run(scenario()) == "first"
+    assert governor.in_flight == 0 and governor.stats()["queueDepth"]["interactive"] == 0
@@ -0,0 +1,72 @@
+import asyncio
+import struct
+
+import pytest
+
+from llm_providers import OpenAIProvider, StubProvider, StubProviderError, create_provider
+from conftest import run
+
+MESSAGES = [{"role": "system", "content": "You write ads."}, {"role": "user", "content": "A headline"}]
+
+
+def fast_stub(**kwargs):
+    return StubProvider(latency_ms=0, first_token_ms=0, tokens_per_second=0, image_latency_ms=0, **kwargs)
+
+
+def complete(provider, messages=MESSAGES):
+    return run(provider.complete(model="m", messages=messages, temperature=0.7, max_tokens=500))
+
+
+def test_create_provider_selects_by_name(monkeypatch):
+    monkeypatch.setenv("STUB_COMPLETION_TOKENS", "40")
+    stub = create_provider("stub")
+    assert isinstance(stub, StubProvider) and stub.completion_tokens == 40
+    assert isinstance(create_provider("openai", openai_api_key="sk-test"), OpenAIProvider)
+    with pytest.raises(ValueError, match="Unknown LLM_PROVIDER"):
+        create_provider("anthropomorphic")
+
+
+def test_stub_output_is_reproducible_but_repeat_calls_differ():
+    first, second = fast_stub(), fast_stub()
+    a1, a2 = complete(first), complete(first)
+    assert complete(second).content == a1.content
+    assert a1.content != a2.content
+    assert a1.usage["totalTokens"] == a1.usage["promptTokens"] + a1.usage["completionTokens"]
+    assert complete(fast_stub(), [{"role": "user", "content": "Other"}]).content != a1.content
+
+
+def test_stream_yields_the_same_text_as_complete_then_usage():
+    async def collect():
+        return [event async for event in fast_stub().stream(model="m", messages=MESSAGES, temperature=0.7, max_tokens=500)]
+
+    events = run(collect())
+    assert events[-1].text is None and events[-1].usage is not None
+    assert "".join(e.text for e in events[:-1]) == complete(fast_stub()).content
+
+
+def test_injected_errors_and_provider_side_concurrency_cap():
+    with pytest.raises(StubProviderError) as excinfo:
+        complete(fast_stub(error_rate=1.0))
+    assert excinfo.value.status_code == 500
+    with pytest.raises(StubProviderError) as excinfo:
+        complete(fast_stub(rate_limit_rate=1.0))
+    assert excinfo.value.status_code == 429
+
+    capped = StubProvider(latency_ms=20, latency_distribution="fixed", max_concurrency=1)
+
+    async def scenario():
+        return await asyncio.gather(
+            *(capped.complete(model="m", messages=MESSAGES, temperature=0.7, max_tokens=50) for _ in range(2)),
+            return_exceptions=True,
+        )
+
+    results = run(scenario())
+    assert [getattr(r, "status_code", 200) for r in results] == [200, 429]
+
+
+def test_stub_images_are_pngs_sized_by_aspect_ratio():
+    image = run(fast_stub().generate_image("a red bicycle", aspect_ratio="2:1"))
+    data = image["data"]
+    assert image["mimeType"] == "image/png" and data.startswith(b"\x89PNG")
+    assert struct.unpack(">II", data[16:24]) == (64, 32)
+    assert run(fast_stub().generate_image("a red bicycle"))["data"] != run(fast_stub().generate_image("blue"))["data"]
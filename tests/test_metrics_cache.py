@@ -0,0 +1,165 @@
+import asyncio
+
+import httpx
+import pytest
+from starlette.testclient import TestClient
+
+from metrics_cache import CampaignMetricsCache
+from conftest import route, run
+
+
+def loader(values, delay=0.01):
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        value = values[min(len(calls), len(values)) - 1]
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    return load, calls
+
+
+def expire(cache, campaign_id, seconds):
+    cache._entries[campaign_id].loaded_at -= seconds
+
+
+def test_concurrent_misses_share_one_load_and_fresh_entries_are_hits():
+    cache = CampaignMetricsCache(ttl_seconds=30)
+    load, calls = loader([{"n": 1}])
+
+    async def scenario():
+        first = await asyncio.gather(*(cache.get("c1", load) for _ in range(5)))
+        return first, await cache.get("c1", load)
+
+    first, again = run(scenario())
+    assert first == [{"n": 1}] * 5 and again == {"n": 1}
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"], stats["hits"]) == (5, 4, 1)
+
+
+def test_stale_entry_is_served_while_one_refresh_runs():
+    cache = CampaignMetricsCache(ttl_seconds=30, stale_seconds=60)
+    load, calls = loader([{"n": 1}, {"n": 2}])
+
+    async def scenario():
+        await cache.get("c1", load)
+        expire(cache, "c1", 31)
+        stale = [await cache.get("c1", load) for _ in range(3)]
+        await asyncio.gather(*cache._inflight.values())
+        return stale, await cache.get("c1", load)
+
+    stale, fresh = run(scenario())
+    assert stale == [{"n": 1}] * 3 and fresh == {"n": 2}
+    assert len(calls) == 2 and cache.stats()["staleHits"] == 3
+
+
+def test_entries_past_the_stale_window_are_reloaded():
+    cache = CampaignMetricsCache(ttl_seconds=30, stale_seconds=60)
+    load, calls = loader([{"n": 1}, {"n": 2}])
+
+    async def scenario():
+        await cache.get("c1", load)
+        expire(cache, "c1", 91)
+        return await cache.get("c1", load)
+
+    assert run(scenario()) == {"n": 2} and len(calls) == 2
+
+
+def test_failed_load_raises_to_every_waiter_and_caches_nothing():
+    cache = CampaignMetricsCache(ttl_seconds=30)
+    load, calls = loader([RuntimeError("convex down"), {"n": 2}])
+
+    async def scenario():
+        results = await asyncio.gather(*(cache.get("c1", load) for _ in range(3)), return_exceptions=True)
+        return results, await cache.get("c1", load)
+
+    results, retried = run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert retried == {"n": 2} and len(calls) == 2 and cache.stats()["loadErrors"] == 1
+
+
+def test_failed_background_refresh_keeps_the_stale_entry():
+    cache = CampaignMetricsCache(ttl_seconds=30, stale_seconds=60)
+    load, calls = loader([{"n": 1}, RuntimeError("convex down")])
+
+    async def scenario():
+        await cache.get("c1", load)
+        expire(cache, "c1", 31)
+        stale = await cache.get("c1", load)
+        await asyncio.gather(*cache._inflight.values(), return_exceptions=True)
+        return stale, await cache.get("c1", load)
+
+    assert run(scenario()) == ({"n": 1}, {"n": 1})
+    assert cache.stats()["loadErrors"] == 1
+
+
+def test_invalidate_drops_the_entry_and_detaches_a_running_load():
+    cache = CampaignMetricsCache(ttl_seconds=30)
+    load, calls = loader([{"n": "old"}, {"n": "new"}], delay=0.02)
+
+    async def scenario():
+        running = asyncio.create_task(cache.get("c1", load))
+        await asyncio.sleep(0)
+        assert cache.invalidate("c1") == 0
+        old = await running
+        return old, await cache.get("c1", load)
+
+    assert run(scenario()) == ({"n": "old"}, {"n": "new"})
+    assert len(calls) == 2
+
+
+def test_zero_ttl_stores_nothing_and_entries_are_lru_bounded():
+    off = CampaignMetricsCache(ttl_seconds=0)
+    load, calls = loader([{"n": 1}])
+
+    async def uncached():
+        await off.get("c1", load)
+        await off.get("c1", load)
+
+    run(uncached())
+    assert len(calls) == 2 and off.stats()["entries"] == 0
+
+    bounded = CampaignMetricsCache(max_entries=2)
+
+    async def fill():
+        for campaign_id in ("a", "b", "a", "c"):
+            await bounded.get(campaign_id, loader([campaign_id], delay=0)[0])
+
+    run(fill())
+    assert set(bounded._entries) == {"a", "c"} and bounded.stats()["evictions"] == 1
+
+
+@pytest.fixture
+def orch(orchestrator, monkeypatch):
+    monkeypatch.setattr(orchestrator, "campaign_metrics_cache", CampaignMetricsCache(ttl_seconds=30))
+    return orchestrator
+
+
+STATS = {"totalImpressions": 200, "totalClicks": 10, "totalConversions": 2, "overallCTR": 0.05, "overallCVR": 0.2}
+
+
+def test_metrics_endpoint_queries_convex_once_per_ttl(orch, mock_http):
+    mock_http(route({"/queries:getCampaignStats": STATS, "/admin/recalculateMetrics": {"ok": True}}))
+    client = TestClient(orch.app)
+
+    first = client.get("/campaigns/c1/metrics").json()
+    assert client.get("/campaigns/c1/metrics").json() == first
+    assert (first["impressions"], first["ctr"]) == (200, 5.0)
+    assert mock_http.paths("GET") == ["/queries:getCampaignStats"]
+
+    assert client.post("/campaigns/c1/metrics/recalculate").json() == {"ok": True}
+    client.get("/campaigns/c1/metrics")
+    assert mock_http.paths("GET").count("/queries:getCampaignStats") == 2
+    assert client.post("/campaigns/c1/metrics/invalidate").json() == {"invalidated": True}
+    assert client.post("/campaigns/c1/metrics/invalidate").json() == {"invalidated": False}
+
+
+def test_metrics_endpoint_falls_back_to_zeros_when_convex_fails(orch, mock_http):
+    mock_http(route({"/queries:getCampaignStats": httpx.Response(500)}))
+    body = TestClient(orch.app).get("/campaigns/c1/metrics").json()
+    assert body["impressions"] == 0 and body["ctr"] == 0.0
+    assert orch.campaign_metrics_cache.stats()["entries"] == 0
@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+from conftest import ROOT, load_module
+
+CREW_DIR = ROOT / "orchestration" / "crew"
+
+
+@pytest.fixture(scope="module")
+def morphlm():
+    return load_module("morphlm_adapter", CREW_DIR / "morphlm_adapter.py")
+
+
+EDITS = [
+    {"op": "replace", "target": "cheap", "value": "affordable"},
+    {"op": "replace", "target": "fast", "value": "fast"},
+    {"op": "strengthen_claim", "target": "affordable", "constraint": "from $9"},
+    {"op": "prepend", "value": "New:"},
+    {"op": "append", "value": "Try it today."},
+]
+
+
+def test_compiled_plan_drops_no_ops_and_groups_replaces(morphlm):
+    plan = morphlm.compile_edits(EDITS + [{"op": "strengthen_claim", "target": ""}, {"op": "unknown"}])
+    assert plan.steps == (
+        ("replace", (("cheap", "affordable"), ("affordable", "affordable (from $9)"))),
+        ("prepend", "New:"),
+        ("append", "Try it today."),
+    )
+    assert plan.apply("cheap and fast") == "New: affordable (from $9) and fast Try it today."
+
+
+def test_plan_matches_apply_edits_on_random_edit_lists(morphlm):
+    rng = random.Random(3)
+    words = ["", "a", "ab", "b", "sale", "ab (x)"]
+    ops = ["replace", "strengthen_claim", "prepend", "append", "bogus"]
+    for _ in range(300):
+        edits = [
+            {"op": rng.choice(ops), "target": rng.choice(words), "value": rng.choice(words), "constraint": "x"}
+            for _ in range(rng.randint(0, 5))
+        ]
+        texts = ["".join(rng.choice("ab ") for _ in range(rng.randint(0, 12))) for _ in range(4)]
+        expected = [morphlm.apply_edits(text, edits) for text in texts]
+        assert morphlm.apply_edits_batch(texts, edits) == expected, edits
+
+
+def test_unknown_ops_and_missing_fields_are_ignored_or_defaulted(morphlm):
+    edits = [{"op": "delete", "target": "x"}, {"target": "x"}, {"op": "append"}, {"op": "strengthen_claim"}]
+    assert morphlm.apply_edits(" copy ", edits) == "copy"
+    assert morphlm.apply_edits_batch([" copy "], edits) == ["copy"]
+    assert morphlm.compile_edits([]).apply_many([]) == []
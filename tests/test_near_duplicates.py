@@ -0,0 +1,139 @@
+import json
+
+import httpx
+import pytest
+from starlette.testclient import TestClient
+
+from near_duplicates import NearDuplicateIndex, minhash, similarity, text_features
+from conftest import route
+
+PROMPT = {"tone:friendly", "style:direct_sale", "tactic:urgency"}
+
+
+def copy(text):
+    return text_features(text)
+
+
+def test_text_features_are_word_shingles_with_numbers_folded():
+    assert text_features("Save 20% on Widgets") == {"save 0", "0 on", "on widgets"}
+    assert text_features("Variant 7") == text_features("variant 12") == {"variant 0"}
+    assert text_features("") == set()
+
+
+def test_minhash_estimates_jaccard_similarity():
+    a = {f"f{i}" for i in range(100)}
+    b = {f"f{i}" for i in range(20, 120)}  # Jaccard 80 / 120
+    estimate = similarity(minhash(a, 256), minhash(b, 256))
+    assert abs(estimate - 2 / 3) < 0.1
+    assert similarity(minhash(a, 64), minhash(set(a), 64)) == 1.0
+    assert similarity(minhash([], 64), minhash([], 64)) == 1.0
+
+
+def test_find_needs_every_part_to_be_similar():
+    index = NearDuplicateIndex(threshold=0.8)
+    index.add("c1:human", "v1", index.signature([PROMPT, copy("Fast reliable widgets for every team")]))
+
+    same_copy = index.signature([PROMPT, copy("fast reliable widgets for every team!")])
+    match = index.find("c1:human", same_copy)
+    assert match is not None and match[0] == "v1" and match[1] >= 0.8
+
+    other_prompt = index.signature([{"tone:formal", "style:story"}, copy("Fast reliable widgets for every team")])
+    assert index.find("c1:human", other_prompt) is None
+    assert index.find("c1:agent", same_copy) is None
+    assert index.stats()["duplicates"] == 1
+
+
+def test_remove_rename_and_scope_eviction():
+    index = NearDuplicateIndex(max_scopes=2)
+    signature = index.signature([PROMPT, copy("Widgets")])
+    index.add("a", "pending:1", signature)
+    index.rename("a", "pending:1", "v1")
+    assert index.find("a", signature)[0] == "v1"
+    index.remove("a", "v1")
+    assert index.find("a", signature) is None
+
+    index.add("a", "v1", signature)
+    index.add_scope("b")
+    index.add_scope("c")
+    assert not index.has_scope("a") and index.stats()["evictions"] == 1
+
+
+def test_bad_configuration_and_part_counts_are_rejected():
+    with pytest.raises(ValueError):
+        NearDuplicateIndex(num_perm=100, bands=16)
+    with pytest.raises(ValueError):
+        NearDuplicateIndex().signature([PROMPT])
+
+
+REQUEST = {
+    "campaignId": "c1",
+    "agentType": "landing_page",
+    "segment": "human",
+    "assets": [],
+    "productInfo": {"name": "Widget"},
+    "goal": {"type": "conversions", "target": 100},
+    "count": 4,
+}
+
+
+@pytest.fixture
+def orch(orchestrator, monkeypatch):
+    monkeypatch.setattr(orchestrator, "NEAR_DUP_MODE", "reject")
+    monkeypatch.setattr(orchestrator, "near_duplicates", NearDuplicateIndex())
+    monkeypatch.setattr(orchestrator, "_bulk_variants_supported", True)
+    # Every seed agent gets the same configuration, so only the first is new
+    monkeypatch.setattr(orchestrator, "random_personality", lambda: orchestrator.PersonalityConfig(
+        tone="friendly", style="direct_sale", traits=["creative", "authentic"]))
+    monkeypatch.setattr(orchestrator, "random_strategy", lambda goal: orchestrator.StrategyConfig(
+        objective="maximize_conversions", tactics=["social_proof", "urgency"], adaptationRate=0.3))
+    return orchestrator
+
+
+def existing_arm():
+    return {
+        "_id": "arm1",
+        "agentConfig": {
+            "personality": {"tone": "friendly", "style": "direct_sale", "traits": ["creative", "authentic"]},
+            "strategy": {"objective": "maximize_conversions", "tactics": ["social_proof", "urgency"]},
+        },
+        "payload": {"human": {"headline": "Widget - Variant 9", "subhead": "Loading optimized content...",
+                              "bullets": [], "cta": {"label": "Learn More", "url": "https://example.com"}}},
+    }
+
+
+def bulk_ids(request):
+    variants = json.loads(request.content)["variants"]
+    return {"ids": [f"id-{v['name'].rsplit('-', 1)[1]}" for v in variants]}
+
+
+def test_reject_mode_creates_one_of_several_identical_agents(orch, mock_http):
+    mock_http(route({"/admin/upsertPrompts": {"ok": True}, "/admin/createVariants": bulk_ids}))
+    body = TestClient(orch.app).post("/create-agents", json=REQUEST).json()
+
+    assert [a["id"] for a in body["agents"]] == ["id-1"]
+    assert [(d["index"], d["duplicateOfIndex"]) for d in body["duplicates"]] == [(1, 0), (2, 0), (3, 0)]
+    assert orch.near_duplicates.stats()["items"] == 1
+
+    again = TestClient(orch.app).post("/create-agents", json=REQUEST).json()
+    assert again["count"] == 0 and {d["duplicateOf"] for d in again["duplicates"]} == {"id-1"}
+
+
+def test_scope_is_seeded_from_active_arms_and_flag_mode_still_creates(orch, monkeypatch, mock_http):
+    monkeypatch.setattr(orch, "NEAR_DUP_MODE", "flag")
+    mock_http(route({
+        "/queries:getActiveVariantsByCampaignSegment": [existing_arm()],
+        "/admin/upsertPrompts": {"ok": True},
+        "/admin/createVariants": bulk_ids,
+    }))
+    body = TestClient(orch.app).post("/create-agents", json=REQUEST).json()
+    assert body["count"] == 4
+    assert body["duplicates"][0] == {"index": 0, "name": "Landing_Page Agent Gen0-1", "duplicateOf": "arm1", "similarity": 1.0}
+
+
+def test_failed_persist_forgets_provisional_keys(orch, mock_http):
+    mock_http(route({"/admin/upsertPrompts": {"ok": True}, "/admin/createVariants": httpx.Response(500)}))
+    assert TestClient(orch.app).post("/create-agents", json=REQUEST).status_code == 502
+    assert orch.near_duplicates.stats()["items"] == 0
+
+    mock_http(route({"/admin/upsertPrompts": {"ok": True}, "/admin/createVariants": bulk_ids}))
+    assert TestClient(orch.app).post("/create-agents", json=REQUEST).json()["count"] == 1
@@ -0,0 +1,81 @@
+import json
+
+import httpx
+import pytest
+from starlette.testclient import TestClient
+
+from conftest import route
+
+REQUEST = {
+    "campaignId": "c1",
+    "agentType": "landing_page",
+    "segment": "human",
+    "assets": [],
+    "productInfo": {"name": "Widget"},
+    "goal": {"type": "conversions", "target": 100},
+    "count": 5,
+}
+
+
+@pytest.fixture
+def orch(orchestrator, monkeypatch):
+    monkeypatch.setattr(orchestrator, "NEAR_DUP_MODE", "off")
+    monkeypatch.setattr(orchestrator, "CONVEX_BULK_CHUNK_SIZE", 2)
+    monkeypatch.setattr(orchestrator, "_bulk_variants_supported", True)
+    return orchestrator
+
+
+def bulk_ids(request):
+    variants = json.loads(request.content)["variants"]
+    return {"ids": [f"id-{v['name'].rsplit('-', 1)[1]}" for v in variants]}
+
+
+def test_agents_are_written_in_bulk_chunks_in_order(orch, mock_http):
+    mock_http(route({"/admin/upsertPrompts": {"ok": True}, "/admin/createVariants": bulk_ids}))
+    body = TestClient(orch.app).post("/create-agents", json=REQUEST).json()
+
+    assert [a["id"] for a in body["agents"]] == ["id-1", "id-2", "id-3", "id-4", "id-5"]
+    assert body["count"] == 5 and body["failed"] == []
+    assert mock_http.paths().count("/admin/createVariants") == 3
+    assert "/admin/createVariant" not in mock_http.paths()
+
+
+def test_rejected_chunk_falls_back_to_single_writes(orch, mock_http):
+    def single(request):
+        name = json.loads(request.content)["name"]
+        return httpx.Response(400) if name.endswith("-2") else httpx.Response(200, json=f"one-{name[-1]}")
+
+    mock_http(route({
+        "/admin/upsertPrompts": {"ok": True},
+        "/admin/createVariants": httpx.Response(400),
+        "/admin/createVariant": single,
+    }))
+    body = TestClient(orch.app).post("/create-agents", json=REQUEST).json()
+
+    assert [a["id"] for a in body["agents"]] == ["one-1", "one-3", "one-4", "one-5"]
+    assert [f["index"] for f in body["failed"]] == [1]
+
+
+def test_unknown_bulk_outcome_is_not_retried_and_fails_the_request(orch, mock_http):
+    mock_http(route({
+        "/admin/upsertPrompts": {"ok": True},
+        "/admin/createVariants": httpx.Response(500),
+        "/admin/createVariant": {"id": "never"},
+    }))
+    response = TestClient(orch.app).post("/create-agents", json=REQUEST)
+
+    assert response.status_code == 502
+    failed = response.json()["detail"]["failed"]
+    assert len(failed) == 5 and all(f["error"].startswith("Bulk write outcome unknown") for f in failed)
+    assert "/admin/createVariant" not in mock_http.paths()
+
+
+def test_missing_bulk_endpoint_switches_to_single_writes(orch, mock_http):
+    mock_http(route({
+        "/admin/upsertPrompts": {"ok": True},
+        "/admin/createVariants": httpx.Response(404),
+        "/admin/createVariant": lambda request: {"id": "x" + json.loads(request.content)["name"][-1]},
+    }))
+    body = TestClient(orch.app).post("/create-agents", json=REQUEST).json()
+    assert body["count"] == 5
+    assert orch._bulk_variants_supported is False
@@ -0,0 +1,110 @@
+import pytest
+from starlette.testclient import TestClient
+
+from content_cache import ContentCache
+from pregeneration import PregenerationWorker
+from conftest import content_request, route, run
+
+
+def make_worker(variants_by_campaign, needed=None, **kwargs):
+    generated = []
+
+    async def list_campaigns():
+        return list(variants_by_campaign)
+
+    async def top_variants(campaign_id, limit):
+        result = variants_by_campaign[campaign_id]
+        if isinstance(result, Exception):
+            raise result
+        return result[:limit]
+
+    async def default_needed(variant, content_type, context):
+        return 1
+
+    async def generate_one(variant, content_type, context):
+        generated.append((variant["_id"], content_type))
+        return 100
+
+    worker = PregenerationWorker(
+        list_campaigns=list_campaigns,
+        top_variants=top_variants,
+        needed=needed or default_needed,
+        generate_one=generate_one,
+        default_buckets=[{"contentType": "headline", "context": {}}],
+        **kwargs,
+    )
+    return worker, generated
+
+
+def variant(variant_id, share):
+    return {"_id": variant_id, "trafficShare": share, "agentConfig": {"llmConfig": {"maxTokens": 100}}}
+
+
+def test_pass_fills_top_variants_for_observed_buckets_by_traffic_share():
+    worker, generated = make_worker(
+        {"c1": [variant("low", 0.1)], "c2": [variant("high", 0.6), variant("mid", 0.3)]},
+        top_k=2, concurrency=1,
+    )
+    for _ in range(3):
+        worker.observe("subhead", {"page": "Pricing", "ts": 1})
+
+    summary = run(worker.run_once())
+    assert summary["generated"] == 6 and summary["failed"] == 0
+    assert [variant_id for variant_id, _ in generated[::2]] == ["high", "mid", "low"]
+    assert worker.buckets()[0] == {"contentType": "subhead", "context": {"page": "Pricing"}}
+    assert worker.stats()["tokensSpent"] == 600
+
+
+def test_token_budget_stops_generation():
+    worker, generated = make_worker({"c1": [variant("a", 0.5), variant("b", 0.4)]}, token_budget=150, concurrency=1)
+    summary = run(worker.run_once())
+    assert summary["generated"] == 1 and summary["skippedForBudget"] == 1
+
+
+def test_failing_campaign_or_variant_is_skipped_not_fatal():
+    async def needed(variant, content_type, context):
+        if variant["_id"] == "bad":
+            raise KeyError("agentConfig")
+        return 1
+
+    worker, generated = make_worker(
+        {"broken": RuntimeError("convex down"), "c1": [variant("bad", 0.9), variant("good", 0.1)]},
+        needed=needed,
+    )
+    summary = run(worker.run_once())
+    assert generated == [("good", "headline")]
+    assert summary["generated"] == 1 and summary["failed"] == 1
+
+
+@pytest.fixture
+def orch(orchestrator, monkeypatch):
+    monkeypatch.setattr(orchestrator, "content_cache", ContentCache(max_alternatives=2))
+    worker = PregenerationWorker(
+        list_campaigns=orchestrator._pregeneration_campaigns,
+        top_variants=orchestrator._pregeneration_top_variants,
+        needed=orchestrator._pregeneration_needed,
+        generate_one=orchestrator._pregeneration_generate,
+        default_buckets=[{"contentType": "headline", "context": {}}],
+    )
+    monkeypatch.setattr(orchestrator, "pregeneration_worker", worker)
+    return orchestrator
+
+
+def test_run_endpoint_prefills_the_cache_for_live_requests(orch, mock_http):
+    request = content_request(variantId="pg1", context={})
+    mock_http(route({
+        "/queries:getRunningCampaigns": [{"_id": "c1"}],
+        "/queries:getTopVariantsByTraffic": [{**variant("pg1", 1.0), "agentConfig": request["agentConfig"]}],
+    }))
+    client = TestClient(orch.app)
+    summary = client.post("/pregeneration/run").json()
+    assert summary["generated"] == 2
+
+    assert client.post("/generate-content", json=request).json()["cached"] is True
+    assert client.post("/pregeneration/run").json()["jobs"] == 0
+
+
+def test_run_endpoint_with_convex_down_generates_nothing(orch, mock_http):
+    mock_http(route({}))
+    summary = TestClient(orch.app).post("/pregeneration/run").json()
+    assert summary["jobs"] == 0 and summary["generated"] == 0
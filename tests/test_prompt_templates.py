@@ -0,0 +1,119 @@
+import json
+
+import httpx
+import pytest
+from starlette.testclient import TestClient
+
+from prompt_templates import _BASE_TEMPLATE, _CLOSING, _ROLE_SECTIONS, PromptStore, prompt_ref
+from conftest import content_request, route, run
+
+REQUEST = {
+    "campaignId": "c1",
+    "agentType": "landing_page",
+    "segment": "human",
+    "assets": [],
+    "productInfo": {"name": "Widget"},
+    "goal": {"type": "conversions", "target": 100},
+}
+VALUES = {
+    "product_name": "Widget", "tone": "bold", "style": "urgency", "traits": "creative, authentic",
+    "goal": "conversions with target of 100", "objective": "maximize_conversions",
+    "tactics": "social_proof", "product_info": "- name: {not a field}",
+}
+
+
+def test_compiled_template_matches_format_and_keeps_braces_in_values():
+    ref, text = PromptStore().render("landing_page", VALUES)
+    expected = (_BASE_TEMPLATE + _ROLE_SECTIONS["landing_page"] + _CLOSING).format(**VALUES)
+    assert text == expected and ref == prompt_ref(expected)
+
+
+def test_same_inputs_render_once_and_share_one_string():
+    store = PromptStore()
+    ref1, text1 = store.render("visual", VALUES)
+    ref2, text2 = store.render("visual", dict(reversed(list(VALUES.items()))))
+    assert (ref1, text1) == (ref2, text2) and text1 is text2
+    assert store.stats()["renders"] == 1 and store.stats()["renderHits"] == 1
+    assert store.render("social_media", VALUES)[0] != ref1
+
+
+def test_pinned_prompts_survive_eviction_until_persisted():
+    store = PromptStore(max_entries=1)
+    pinned = []
+    for tone in ("a", "b", "c"):
+        ref, text = store.render("placement", {**VALUES, "tone": tone})
+        store.pin(ref, text)
+        pinned.append(ref)
+
+    assert [p["ref"] for p in store.unpersisted()] == pinned
+    assert all(run(store.resolve(ref)) for ref in pinned)
+
+    store.mark_persisted(pinned[:2])
+    assert [p["ref"] for p in store.unpersisted()] == pinned[2:]
+    assert store.stats()["prompts"] == 1
+    store.pin(pinned[1], "ignored")
+    assert len(store.unpersisted()) == 1
+
+
+def test_resolve_many_fetches_missing_refs_in_one_batch():
+    calls = []
+
+    async def fetch(refs):
+        calls.append(refs)
+        return {ref: f"text for {ref}" for ref in refs if ref != "sp_unknown"}
+
+    store = PromptStore(fetch=fetch)
+    store.intern("sp_local", "local text")
+    found = run(store.resolve_many(["sp_local", "sp_a", "sp_b", "sp_a", "sp_unknown"]))
+    assert found == {"sp_local": "local text", "sp_a": "text for sp_a", "sp_b": "text for sp_b"}
+    assert calls == [["sp_a", "sp_b", "sp_unknown"]]
+    assert run(store.resolve("sp_a")) == "text for sp_a" and len(calls) == 1
+
+
+@pytest.fixture
+def orch(orchestrator, monkeypatch):
+    monkeypatch.setattr(orchestrator, "NEAR_DUP_MODE", "off")
+    monkeypatch.setattr(orchestrator, "prompt_store", PromptStore(max_entries=2, fetch=orchestrator._fetch_prompts))
+    monkeypatch.setattr(orchestrator, "_prompt_refs_supported", True)
+    return orchestrator
+
+
+def created_variants(request):
+    return {"ids": [f"id{i}" for i, _ in enumerate(json.loads(request.content)["variants"])]}
+
+
+def test_variants_store_refs_and_failed_prompt_writes_inline_the_text(orch, mock_http):
+    upserts = []
+
+    def upsert(request):
+        upserts.append([p["ref"] for p in json.loads(request.content)["prompts"]])
+        return httpx.Response(503 if len(upserts) <= 3 else 200, json={"ok": True})
+
+    variants = []
+
+    def create(request):
+        variants.extend(json.loads(request.content)["variants"])
+        return created_variants(request)
+
+    mock_http(route({"/admin/upsertPrompts": upsert, "/admin/createVariants": create}))
+    client = TestClient(orch.app)
+    assert client.post("/create-agents", json={**REQUEST, "count": 3}).status_code == 200
+
+    # Three 503s exhaust the retries: the text is inlined and the prompts stay pinned
+    assert all(v["agentConfig"]["llmConfig"].get("systemPrompt") for v in variants)
+    pinned = {p["ref"] for p in orch.prompt_store.unpersisted()}
+    assert pinned and pinned == {v["agentConfig"]["llmConfig"]["promptRef"] for v in variants}
+
+    variants.clear()
+    assert client.post("/create-agents", json={**REQUEST, "count": 3}).status_code == 200
+    assert pinned <= set(upserts[-1])
+    assert not orch.prompt_store.unpersisted()
+    assert not any(v["agentConfig"]["llmConfig"].get("systemPrompt") for v in variants)
+
+
+def test_unknown_prompt_ref_is_a_404(orch, mock_http):
+    mock_http(route({"/queries:getPromptsByRefs": []}))
+    request = content_request(variantId="ref-missing")
+    request["agentConfig"]["llmConfig"] = {"model": "stub-model", "promptRef": "sp_missing"}
+    response = TestClient(orch.app).post("/generate-content", json={**request, "useCache": False})
+    assert response.status_code == 404 and "sp_missing" in response.json()["detail"]